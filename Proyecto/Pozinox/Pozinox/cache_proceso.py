@@ -0,0 +1,52 @@
+"""
+Valores cacheados en memoria del proceso con versión en la caché compartida
+
+Cada proceso guarda el valor junto a la versión con que lo cargó. La versión
+vive en la caché compartida y cambia al invalidar, de modo que los demás
+procesos recargan en su siguiente lectura sin consultar la base de datos
+mientras no cambie.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class CacheProceso:
+    """
+    Valor de `cargar()` cacheado por proceso bajo la versión `clave_version`.
+    `caducado(valor)`, si se indica, obliga a recargar aunque la versión no cambie.
+    """
+
+    def __init__(self, clave_version, cargar, caducado=None):
+        self.clave_version = clave_version
+        self.cargar = cargar
+        self.caducado = caducado
+        # (versión, valor) cargado por este proceso; se reemplaza completo
+        self._local = (None, None)
+
+    def version(self):
+        version = cache.get(self.clave_version)
+        if version is None:
+            cache.add(self.clave_version, uuid.uuid4().hex, None)
+            version = cache.get(self.clave_version)
+        return version
+
+    def obtener(self):
+        version = self.version()
+        local_version, valor = self._local
+        if valor is None or version != local_version or (self.caducado and self.caducado(valor)):
+            valor = self.cargar()
+            self._local = (version, valor)
+        return valor
+
+    def invalidar(self):
+        """Obliga a todos los procesos a recargar"""
+        self._local = (None, None)
+        cache.set(self.clave_version, uuid.uuid4().hex, None)
+
+    def invalidar_al_confirmar(self):
+        """Para receptores post_save/post_delete: invalida al confirmar la transacción"""
+        self._local = (None, None)
+        # Otro proceso que recargara antes del commit volvería a cachear el valor anterior
+        transaction.on_commit(self.invalidar)
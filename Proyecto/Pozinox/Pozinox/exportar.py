@@ -0,0 +1,286 @@
+"""
+Exportación de listados a CSV y XLSX en memoria constante
+
+Las filas se leen con QuerySet.iterator() y se escriben a medida que se
+generan, tanto hacia una respuesta StreamingHttpResponse como hacia un archivo.
+El XLSX se arma con zipfile en modo flujo (sin retroceder en la salida) y con
+textos en línea, de modo que no se acumula la hoja ni una tabla de textos.
+"""
+import csv
+import datetime
+import os
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import router
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from Pozinox.routers import usar_replica
+
+TAMANO_LOTE = 2000
+# Textos que Excel interpretaría como fórmula (inyección en CSV)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Exportaciones disponibles: nombre -> función(parametros) que devuelve una Exportacion
+EXPORTACIONES = {
+    'cotizaciones': 'apps.tienda.exportaciones.exportar_cotizaciones',
+    'productos': 'apps.tienda.exportaciones.exportar_productos',
+    'movimientos': 'apps.inventario.exportaciones.exportar_movimientos',
+    'usuarios': 'apps.usuarios.exportaciones.exportar_usuarios',
+}
+
+
+class Exportacion:
+    """Encabezados y filas de un listado filtrado"""
+
+    def __init__(self, titulo, encabezados, queryset, fila):
+        self.titulo = titulo
+        self.encabezados = encabezados
+        self.queryset = queryset
+        self.fila = fila
+
+    def total(self):
+        return self.queryset.count()
+
+    def filas(self):
+        # La base se elige ahora: el iterador se recorre después, mientras se envía la respuesta
+        with usar_replica():
+            alias = router.db_for_read(self.queryset.model)
+        return map(self.fila, self.queryset.using(alias).iterator(chunk_size=TAMANO_LOTE))
+
+
+def obtener_exportacion(nombre, parametros):
+    return import_string(EXPORTACIONES[nombre])(parametros)
+
+
+class _Eco:
+    """Archivo que devuelve lo escrito en vez de guardarlo (para csv.writer)"""
+
+    def write(self, valor):
+        return valor
+
+
+def texto_seguro(valor):
+    """Antepone un apóstrofo a los textos que una planilla tomaría como fórmula"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def filas_csv(encabezados, filas):
+    """Fragmentos de bytes del CSV; con BOM para que Excel reconozca UTF-8"""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff'.encode()
+    yield escritor.writerow(encabezados).encode()
+    lote = []
+    for fila in filas:
+        lote.append(escritor.writerow([texto_seguro(valor) for valor in fila]))
+        if len(lote) >= TAMANO_LOTE:
+            yield ''.join(lote).encode()
+            lote = []
+    if lote:
+        yield ''.join(lote).encode()
+
+
+class BufferSalida:
+    """Salida de solo escritura que se vacía después de cada fragmento"""
+
+    def __init__(self):
+        self.datos = bytearray()
+
+    def write(self, datos):
+        self.datos += datos
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = bytes(self.datos)
+        self.datos.clear()
+        return datos
+
+
+# Caracteres que XML 1.0 no admite
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# Día cero de las fechas de Excel
+_EPOCA = datetime.datetime(1899, 12, 30)
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Estilos: 0 general, 1 fecha, 2 fecha y hora, 3 encabezado en negrita
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+def celda_xlsx(valor, estilo=0):
+    """XML de una celda; las fechas se guardan como número de serie de Excel"""
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, datetime.datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.make_naive(valor)
+        return f'<c s="2"><v>{(valor - _EPOCA).total_seconds() / 86400:.6f}</v></c>'
+    if isinstance(valor, datetime.date):
+        return f'<c s="1"><v>{(valor - _EPOCA.date()).days}</v></c>'
+    texto = escape(_NO_XML.sub('', texto_seguro(str(valor))))
+    estilo = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def filas_xlsx(encabezados, filas, hoja='Datos'):
+    """Fragmentos de bytes de un libro XLSX de una hoja, escrito a medida que llegan las filas"""
+    salida = BufferSalida()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        libro.writestr('_rels/.rels', _RELS)
+        libro.writestr('xl/workbook.xml', _WORKBOOK.format(hoja=escape(hoja[:31], {'"': '&quot;'})))
+        libro.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        libro.writestr('xl/styles.xml', _STYLES)
+        yield salida.vaciar()
+
+        # force_zip64: el tamaño de la hoja no se conoce de antemano
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as xml:
+            xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+                b'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews><sheetData>'
+            )
+            xml.write(('<row>' + ''.join(celda_xlsx(e, 3) for e in encabezados) + '</row>').encode())
+            lote = []
+            for fila in filas:
+                lote.append('<row>' + ''.join(map(celda_xlsx, fila)) + '</row>')
+                if len(lote) >= TAMANO_LOTE:
+                    xml.write(''.join(lote).encode())
+                    lote = []
+                    yield salida.vaciar()
+            xml.write((''.join(lote) + '</sheetData></worksheet>').encode())
+    yield salida.vaciar()
+
+
+def zip_en_flujo(archivos):
+    """Fragmentos de bytes de un ZIP con los (nombre, contenido) a medida que llegan"""
+    salida = BufferSalida()
+    # Sin compresión: pensado para contenidos ya comprimidos, como PDF
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as archivo:
+        for nombre, contenido in archivos:
+            archivo.writestr(nombre, contenido)
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def generar(formato, encabezados, filas, hoja='Datos'):
+    if formato == 'xlsx':
+        return filas_xlsx(encabezados, filas, hoja)
+    return filas_csv(encabezados, filas)
+
+
+def nombre_archivo(nombre, formato, sufijo=''):
+    sufijo = f'_{sufijo}' if sufijo else ''
+    return f'{nombre}_{timezone.localtime():%Y%m%d_%H%M}{sufijo}.{formato}'
+
+
+class AlmacenamientoPrivado(FileSystemStorage):
+    """
+    Archivos en EXPORTACIONES_ROOT, fuera de MEDIA_ROOT: no tienen URL pública y
+    solo se descargan desde la vista, que comprueba los permisos.
+    """
+
+    @property
+    def base_location(self):
+        return settings.EXPORTACIONES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError('Los archivos privados no tienen URL pública')
+
+
+def almacenamiento_exportaciones():
+    """Bucket S3 privado si está configurado; si no, el disco local privado"""
+    if settings.EXPORTACIONES_BUCKET:
+        return S3Boto3Storage(
+            bucket_name=settings.EXPORTACIONES_BUCKET, default_acl='private', querystring_auth=True,
+            custom_domain=None, file_overwrite=False,
+        )
+    return AlmacenamientoPrivado()
+
+
+def respuesta_exportacion(nombre, formato, exportacion):
+    """Descarga de la exportación generada mientras se envía"""
+    respuesta = StreamingHttpResponse(
+        generar(formato, exportacion.encabezados, exportacion.filas(), exportacion.titulo),
+        content_type=FORMATOS[formato],
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo(nombre, formato)}"'
+    return respuesta
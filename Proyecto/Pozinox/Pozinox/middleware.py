@@ -0,0 +1,34 @@
+"""
+Middlewares del proyecto Pozinox
+"""
+from django.conf import settings
+
+from .routers import fijar_base_principal, replica_configurada
+
+COOKIE_PRINCIPAL = 'leer_principal'
+
+
+class ReplicaStickinessMiddleware:
+    """Después de un POST el cliente lee desde la base principal durante unos segundos"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configurada():
+            return self.get_response(request)
+
+        escritura = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        if not escritura and not request.COOKIES.get(COOKIE_PRINCIPAL):
+            return self.get_response(request)
+
+        with fijar_base_principal():
+            response = self.get_response(request)
+
+        if escritura:
+            response.set_cookie(
+                COOKIE_PRINCIPAL, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,62 @@
+"""
+Enrutamiento de base de datos con réplica de solo lectura
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+
+# Estado por request/hilo: fijar la base principal o forzar la réplica
+_fijar_principal = ContextVar('fijar_principal', default=False)
+_forzar_replica = ContextVar('forzar_replica', default=False)
+
+
+def replica_configurada():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def fijar_base_principal():
+    """Todas las lecturas dentro del bloque van a la base principal (read-your-writes)"""
+    token = _fijar_principal.set(True)
+    try:
+        yield
+    finally:
+        _fijar_principal.reset(token)
+
+
+@contextmanager
+def usar_replica():
+    """Envía a la réplica todas las lecturas del bloque (reportes pesados)"""
+    token = _forzar_replica.set(True)
+    try:
+        yield
+    finally:
+        _forzar_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Lecturas de catálogo y reportes a la réplica; escrituras siempre a default"""
+
+    def db_for_read(self, model, **hints):
+        if not replica_configurada() or _fijar_principal.get():
+            return 'default'
+        # Dentro de una transacción se debe leer lo que se acaba de escribir
+        if connections['default'].in_atomic_block:
+            return 'default'
+        if _forzar_replica.get() or model._meta.label_lower in settings.REPLICA_READ_MODELS:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica contiene los mismos datos que la base principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
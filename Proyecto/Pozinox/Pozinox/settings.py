@@ -3,6 +3,7 @@ Django settings for Pozinox project.
 """
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -42,10 +43,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Pozinox.middleware.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.usuarios.auditoria.AuditoriaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.usuarios.context_processors.configuracion',
             ],
         },
     },
@@ -77,14 +81,29 @@ WSGI_APPLICATION = 'Pozinox.wsgi.application'
 # Si existe DATABASE_URL (Supabase), úsala. Si no, usa SQLite como fallback
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Pool nativo de psycopg 3 (reemplaza las conexiones persistentes por hilo)
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+}
+
+
+def configurar_postgres(url):
+    """Construye la configuración de una base PostgreSQL a partir de su URL"""
+    if DB_POOL:
+        # El pool no admite conexiones persistentes (CONN_MAX_AGE debe ser 0)
+        config = dj_database_url.parse(url, conn_max_age=0)
+        config.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+        return config
+    return dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+
+
 if DATABASE_URL:
     # Usar PostgreSQL de Supabase
     DATABASES = {
-        'default': dj_database_url.parse(
-            DATABASE_URL,
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
+        'default': configurar_postgres(DATABASE_URL)
     }
 else:
     # Fallback a SQLite para desarrollo local
@@ -95,6 +114,99 @@ else:
         }
     }
 
+# Réplica de solo lectura opcional (catálogo y reportes)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = configurar_postgres(DATABASE_REPLICA_URL)
+elif 'test' in sys.argv:
+    # En tests la réplica se simula con una segunda conexión espejo de default
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['Pozinox.routers.ReplicaRouter']
+
+# Modelos cuyas lecturas pueden ir a la réplica
+REPLICA_READ_MODELS = [
+    'tienda.producto',
+    'tienda.categoriaacero',
+]
+
+# Segundos que un cliente lee desde la base principal después de un POST
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
+
+
+# Cache
+# Con REDIS_URL la caché se comparte entre procesos; si no, memoria local
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Segundos que se cachean los KPIs del panel de administración
+KPI_CACHE_TTL = int(os.getenv('KPI_CACHE_TTL', '60'))
+
+# Segundos que se cachea la estimación de planchas de un mismo pedido de piezas
+PLANCHAS_CACHE_TTL = int(os.getenv('PLANCHAS_CACHE_TTL', '86400'))
+
+# Reposición: costo de emitir una orden de compra (CLP) y costo anual de
+# mantener una unidad en bodega como fracción de su precio de compra
+COSTO_EMISION_PEDIDO = int(os.getenv('COSTO_EMISION_PEDIDO', '15000'))
+TASA_COSTO_MANTENCION = float(os.getenv('TASA_COSTO_MANTENCION', '0.25'))
+
+# Mantenimiento: días sin cambios tras los que se elimina una cotización en borrador
+DIAS_RETENCION_BORRADORES = int(os.getenv('DIAS_RETENCION_BORRADORES', '30'))
+
+# Exportaciones: sobre este número de filas se generan en segundo plano
+# (comando procesar_exportaciones) y sus archivos se eliminan tras unos días
+EXPORTACION_MAX_FILAS_DIRECTA = int(os.getenv('EXPORTACION_MAX_FILAS_DIRECTA', '50000'))
+DIAS_RETENCION_EXPORTACIONES = int(os.getenv('DIAS_RETENCION_EXPORTACIONES', '7'))
+# Una exportación en 'procesando' por más de estos minutos se da por interrumpida
+EXPORTACION_MINUTOS_MAXIMOS = int(os.getenv('EXPORTACION_MINUTOS_MAXIMOS', '60'))
+EXPORTACION_MAX_INTENTOS = int(os.getenv('EXPORTACION_MAX_INTENTOS', '3'))
+# Las exportaciones contienen datos personales: nunca en MEDIA_ROOT (se sirve sin autenticación)
+EXPORTACIONES_ROOT = os.getenv('EXPORTACIONES_ROOT', str(BASE_DIR / 'privado' / 'exportaciones'))
+EXPORTACIONES_BUCKET = os.getenv('EXPORTACIONES_BUCKET', '')
+
+# PDF por lote: procesos que generan las cotizaciones y máximo de cotizaciones por descarga
+PDF_PROCESOS = int(os.getenv('PDF_PROCESOS', str(os.cpu_count() or 1)))
+PDF_LOTE_MAX = int(os.getenv('PDF_LOTE_MAX', '200'))
+
+# Registro de actividad: los eventos se escriben por lotes de AUDITORIA_LOTE o cada
+# AUDITORIA_INTERVALO segundos desde un hilo del proceso. En tests está desactivado.
+AUDITORIA_ACTIVA = os.getenv('AUDITORIA_ACTIVA', '0' if 'test' in sys.argv else '1') == '1'
+AUDITORIA_LOTE = int(os.getenv('AUDITORIA_LOTE', '200'))
+AUDITORIA_INTERVALO = float(os.getenv('AUDITORIA_INTERVALO', '5'))
+AUDITORIA_MAX_PENDIENTES = int(os.getenv('AUDITORIA_MAX_PENDIENTES', '10000'))
+AUDITORIA_MESES_RETENCION = int(os.getenv('AUDITORIA_MESES_RETENCION', '12'))
+# Modelos cuyos cambios desde el panel quedan registrados
+AUDITORIA_MODELOS = [
+    'auth.User',
+    'usuarios.ConfiguracionSistema',
+    'tienda.Producto',
+    'tienda.CategoriaAcero',
+    'tienda.ReglaDescuento',
+    'tienda.TransferenciaBancaria',
+    'inventario.Proveedor',
+    'inventario.Compra',
+]
+
+# Sesiones en caché con respaldo en base de datos
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# El usuario autenticado se carga junto a su perfil (select_related)
+AUTHENTICATION_BACKENDS = ['apps.usuarios.backends.PerfilModelBackend']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -10,6 +10,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('apps.tienda.urls')),
     path('usuarios/', include('apps.usuarios.urls')),
+    path('inventario/', include('apps.inventario.urls')),
 ]
 
 # Serve media files in development
@@ -1,3 +1,43 @@
 from django.contrib import admin
+from .models import Proveedor, ProductoProveedor, Compra, DetalleCompra, ReservaStock
 
-# Register your models here.
+
+class ProductoProveedorInline(admin.TabularInline):
+    model = ProductoProveedor
+    extra = 0
+    autocomplete_fields = ['producto']
+
+
+@admin.register(Proveedor)
+class ProveedorAdmin(admin.ModelAdmin):
+    """Administración de proveedores"""
+    list_display = ['nombre', 'rut', 'email', 'plazo_entrega_dias', 'activo']
+    list_filter = ['activo']
+    search_fields = ['nombre', 'razon_social', 'rut']
+    inlines = [ProductoProveedorInline]
+
+
+class DetalleCompraInline(admin.TabularInline):
+    model = DetalleCompra
+    extra = 0
+    autocomplete_fields = ['producto']
+    readonly_fields = ['subtotal']
+
+
+@admin.register(Compra)
+class CompraAdmin(admin.ModelAdmin):
+    """Administración de órdenes de compra"""
+    list_display = ['numero_orden', 'proveedor', 'estado', 'fecha_orden', 'fecha_esperada', 'total']
+    list_filter = ['estado', 'proveedor']
+    search_fields = ['numero_orden', 'proveedor__nombre']
+    inlines = [DetalleCompraInline]
+
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    """Consulta de reservas de stock de cotizaciones"""
+    list_display = ['producto', 'cotizacion', 'cantidad', 'estado', 'fecha_creacion', 'fecha_expiracion']
+    list_filter = ['estado']
+    search_fields = ['producto__codigo_producto', 'cotizacion__numero_cotizacion']
+    list_select_related = ['producto', 'cotizacion']
+    readonly_fields = ['producto', 'cotizacion', 'cantidad', 'fecha_expiracion', 'fecha_cierre']
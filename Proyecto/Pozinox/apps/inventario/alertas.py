@@ -0,0 +1,94 @@
+"""
+Motor de alertas de stock: se evalúa solo para los productos cuyo stock cambió
+"""
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+
+from Pozinox.routers import fijar_base_principal
+from apps.tienda.models import Producto
+from apps.usuarios.configuracion import obtener_configuracion
+from apps.usuarios.models import Notificacion
+from .models import AlertaInventario
+from .stock import stock_actualizado
+
+TIPOS_ALERTA_STOCK = ['sin_stock', 'stock_critico', 'stock_bajo']
+
+MENSAJES_ALERTA = {
+    'sin_stock': 'El producto {producto} se quedó sin stock.',
+    'stock_critico': 'El producto {producto} tiene stock crítico: {stock} de un mínimo de {minimo}.',
+    'stock_bajo': 'El producto {producto} tiene stock bajo: {stock} de un mínimo de {minimo}.',
+}
+
+
+def tipo_alerta_stock(producto, config):
+    """Alerta más severa que corresponde al stock del producto, o None"""
+    stock, minimo = producto.stock_actual, producto.stock_minimo
+    if stock == 0:
+        return 'sin_stock'
+    if config.alerta_stock_critico and stock <= minimo // 2:
+        return 'stock_critico'
+    if config.alerta_stock_bajo and stock <= minimo:
+        return 'stock_bajo'
+    return None
+
+
+def evaluar_alertas_stock(producto_ids):
+    """
+    Crea las alertas de stock de los productos indicados en consultas constantes.
+    No duplica alertas abiertas (no leídas) del mismo tipo y notifica en bloque
+    a los usuarios con rol de inventario.
+    """
+    config = obtener_configuracion()
+    # El stock recién escrito podría no haber llegado aún a la réplica
+    with fijar_base_principal():
+        productos = list(Producto.objects.filter(id__in=producto_ids, activo=True).only(
+            'id', 'codigo_producto', 'nombre', 'stock_actual', 'stock_minimo'
+        ))
+    candidatas = [
+        (producto, tipo) for producto in productos
+        if (tipo := tipo_alerta_stock(producto, config))
+    ]
+    if not candidatas:
+        return []
+
+    abiertas = set(
+        AlertaInventario.objects.filter(
+            producto_id__in=[producto.id for producto, _ in candidatas],
+            tipo_alerta__in=TIPOS_ALERTA_STOCK, leida=False,
+        ).values_list('producto_id', 'tipo_alerta')
+    )
+    alertas = AlertaInventario.objects.bulk_create([
+        AlertaInventario(
+            producto=producto, tipo_alerta=tipo,
+            mensaje=MENSAJES_ALERTA[tipo].format(
+                producto=producto, stock=producto.stock_actual, minimo=producto.stock_minimo
+            ),
+        )
+        for producto, tipo in candidatas
+        if (producto.id, tipo) not in abiertas
+    ])
+    if alertas:
+        notificar_alertas(alertas)
+    return alertas
+
+
+def notificar_alertas(alertas):
+    """Una notificación por alerta y usuario de inventario, escritas en un solo INSERT por lote"""
+    destinatarios = list(
+        User.objects.filter(is_active=True, perfil__tipo_usuario='inventario').values_list('id', flat=True)
+    )
+    Notificacion.objects.bulk_create([
+        Notificacion(
+            usuario_id=usuario_id, tipo='stock_bajo',
+            titulo=f'{alerta.get_tipo_alerta_display()}: {alerta.producto.codigo_producto}',
+            mensaje=alerta.mensaje,
+            modelo_relacionado='AlertaInventario', objeto_id=alerta.id,
+        )
+        for alerta in alertas
+        for usuario_id in destinatarios
+    ], batch_size=500)
+
+
+@receiver(stock_actualizado)
+def evaluar_alertas_al_actualizar_stock(sender, producto_ids, **kwargs):
+    evaluar_alertas_stock(producto_ids)
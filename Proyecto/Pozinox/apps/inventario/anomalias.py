@@ -0,0 +1,115 @@
+"""
+Detección de movimientos de inventario anómalos con estadística robusta vectorizada
+"""
+import datetime
+
+import numpy as np
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from Pozinox.routers import usar_replica
+from .alertas import notificar_alertas
+from .models import AlertaInventario, MovimientoInventario
+
+# Umbral de Iglewicz-Hoaglin para el z-score modificado
+UMBRAL_Z = 3.5
+# Bajo este número de movimientos la mediana y el MAD no son representativos
+MINIMO_MOVIMIENTOS = 10
+
+TIPO_HISTORIAL = np.dtype([
+    ('id', np.int64), ('producto_id', np.int64), ('delta', np.int64), ('reciente', np.bool_),
+])
+
+
+def _mediana_por_segmento(valores, inicios, tamanos):
+    """Mediana de segmentos contiguos ya ordenados"""
+    return (valores[inicios + (tamanos - 1) // 2] + valores[inicios + tamanos // 2]) / 2
+
+
+def z_robustos(grupos, valores):
+    """
+    Z-score modificado (mediana/MAD) de cada valor respecto de su grupo,
+    calculado para todos los grupos a la vez. Devuelve los z y el tamaño
+    del grupo de cada fila, en el orden original.
+    """
+    orden = np.lexsort((valores, grupos))
+    grupos_ord = grupos[orden]
+    valores_ord = valores[orden].astype(np.float64)
+
+    inicios = np.flatnonzero(np.r_[True, grupos_ord[1:] != grupos_ord[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(grupos_ord)])
+    segmento = np.repeat(np.arange(len(inicios)), tamanos)
+
+    mediana = _mediana_por_segmento(valores_ord, inicios, tamanos)
+    desvio = np.abs(valores_ord - mediana[segmento])
+    mad = _mediana_por_segmento(desvio[np.lexsort((desvio, segmento))], inicios, tamanos)
+
+    # Con MAD nulo (la mayoría de movimientos iguales) se usa la desviación media absoluta
+    escala = 1.4826 * mad
+    sin_mad = escala == 0
+    escala[sin_mad] = 1.2533 * (np.add.reduceat(desvio, inicios)[sin_mad] / tamanos[sin_mad])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_ord = np.where(escala[segmento] > 0, (valores_ord - mediana[segmento]) / escala[segmento], 0.0)
+
+    z = np.empty_like(z_ord)
+    z[orden] = z_ord
+    tamano = np.empty_like(tamanos, shape=len(orden))
+    tamano[orden] = tamanos[segmento]
+    return z, tamano
+
+
+def marcar_atipicos(historial, umbral=UMBRAL_Z, minimo=MINIMO_MOVIMIENTOS):
+    """
+    Máscara de movimientos recientes anormalmente grandes. Entradas y salidas
+    de cada producto se comparan por separado.
+    """
+    grupos = historial['producto_id'] * 2 + (historial['delta'] > 0)
+    z, tamano = z_robustos(grupos, np.abs(historial['delta']))
+    return historial['reciente'] & (tamano >= minimo) & (z > umbral)
+
+
+def cargar_historial(desde, revisar_desde):
+    """Historial de movimientos desde una fecha como arreglo estructurado de NumPy"""
+    movimientos = MovimientoInventario.objects.filter(fecha_movimiento__gte=desde).annotate(
+        delta=F('cantidad_nueva') - F('cantidad_anterior'),
+        reciente=ExpressionWrapper(Q(fecha_movimiento__gte=revisar_desde), output_field=BooleanField()),
+    ).order_by().values_list('id', 'producto_id', 'delta', 'reciente')
+    with usar_replica():
+        return np.fromiter(movimientos.iterator(chunk_size=20000), dtype=TIPO_HISTORIAL)
+
+
+def detectar_movimientos_anomalos(dias_historia=365, dias_revision=1, umbral=UMBRAL_Z):
+    """
+    Compara los movimientos de los últimos `dias_revision` días contra el historial
+    de cada producto y crea una alerta de movimiento anómalo por cada atípico nuevo.
+    """
+    ahora = timezone.now()
+    historial = cargar_historial(
+        ahora - datetime.timedelta(days=dias_historia),
+        ahora - datetime.timedelta(days=dias_revision),
+    )
+    if not len(historial):
+        return []
+
+    atipicos = historial['id'][marcar_atipicos(historial, umbral)].tolist()
+    ya_alertados = set(
+        AlertaInventario.objects.filter(movimiento_id__in=atipicos).values_list('movimiento_id', flat=True)
+    )
+    nuevos = MovimientoInventario.objects.filter(
+        id__in=[mid for mid in atipicos if mid not in ya_alertados]
+    ).select_related('producto')
+
+    alertas = AlertaInventario.objects.bulk_create([
+        AlertaInventario(
+            producto=mov.producto, movimiento=mov, tipo_alerta='movimiento_anomalo',
+            mensaje=(
+                f'{mov.get_tipo_movimiento_display()} inusual de {mov.cantidad} unidades '
+                f'({mov.cantidad_anterior} → {mov.cantidad_nueva}) en {mov.producto}.'
+            ),
+        )
+        for mov in nuevos
+    ])
+    if alertas:
+        notificar_alertas(alertas)
+    return alertas
@@ -5,3 +5,9 @@ class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.inventario'
     verbose_name = 'Gestión de Inventario'
+
+    def ready(self):
+        # Registrar el motor de alertas sobre los cambios de stock
+        from . import alertas  # noqa: F401
+        # Reservas de stock según el estado de las cotizaciones
+        from . import reservas  # noqa: F401
@@ -0,0 +1,148 @@
+"""
+Etiquetas QR de productos e ingesta por lotes de escaneos de bodega
+"""
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from reportlab.graphics import renderSVG
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing, String
+
+from apps.tienda.models import Producto
+from .models import EscaneoStock, MovimientoInventario
+from .stock import aplicar_movimientos
+
+TAMANO_ETIQUETA = 160
+MAX_ESCANEOS_POR_LOTE = 5000
+
+
+class LoteEscaneoInvalido(Exception):
+    """El lote de escaneos no se puede interpretar"""
+
+
+# ============================================
+# ETIQUETAS QR
+# ============================================
+
+def ruta_etiqueta(codigo_producto):
+    # Hash del código exacto: 'TUB-1.5' y 'TUB-15' no comparten archivo
+    huella = hashlib.sha1(codigo_producto.encode('utf-8')).hexdigest()[:16]
+    return f'etiquetas_qr/{huella}.svg'
+
+
+def generar_etiqueta_svg(codigo_producto):
+    """Etiqueta SVG con el QR del código de producto y el código legible debajo"""
+    qr = QrCodeWidget(codigo_producto, barWidth=TAMANO_ETIQUETA, barHeight=TAMANO_ETIQUETA)
+    dibujo = Drawing(TAMANO_ETIQUETA, TAMANO_ETIQUETA + 20)
+    qr.y = 20
+    dibujo.add(qr)
+    dibujo.add(String(TAMANO_ETIQUETA / 2, 6, codigo_producto, textAnchor='middle', fontSize=12))
+    return renderSVG.drawToString(dibujo)
+
+
+def obtener_etiqueta(codigo_producto):
+    """Ruta de la etiqueta en el almacenamiento; se genera solo la primera vez"""
+    ruta = ruta_etiqueta(codigo_producto)
+    if not default_storage.exists(ruta):
+        ruta = default_storage.save(ruta, ContentFile(generar_etiqueta_svg(codigo_producto).encode('utf-8')))
+    return ruta
+
+
+# ============================================
+# ESCANEOS
+# ============================================
+
+def normalizar_escaneo(escaneo):
+    """Valida una lectura {id, codigo, delta, fecha} del dispositivo"""
+    try:
+        id_cliente = str(escaneo['id']).strip()
+        codigo = str(escaneo['codigo']).strip()
+        delta = int(escaneo['delta'])
+    except (KeyError, TypeError, ValueError):
+        raise LoteEscaneoInvalido(f'Escaneo inválido: {escaneo!r}')
+    if not id_cliente or not codigo or len(id_cliente) > 64:
+        raise LoteEscaneoInvalido(f'Escaneo inválido: {escaneo!r}')
+
+    fecha = parse_datetime(escaneo.get('fecha') or '') or timezone.now()
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return id_cliente, codigo, delta, fecha
+
+
+def ids_recibidos(ids_cliente):
+    return set(EscaneoStock.objects.filter(id_cliente__in=ids_cliente).values_list('id_cliente', flat=True))
+
+
+def procesar_escaneos(escaneos, usuario):
+    """
+    Aplica un lote de escaneos en una sola transacción del libro de inventario.
+    Descarta los ids de cliente ya recibidos (reintentos del dispositivo), suma
+    las lecturas por producto y registra un movimiento de ajuste por producto.
+    """
+    if len(escaneos) > MAX_ESCANEOS_POR_LOTE:
+        raise LoteEscaneoInvalido(f'El lote supera el máximo de {MAX_ESCANEOS_POR_LOTE} escaneos')
+
+    lecturas = {}
+    for escaneo in escaneos:
+        id_cliente, codigo, delta, fecha = normalizar_escaneo(escaneo)
+        # Un id repetido dentro del mismo lote se cuenta una vez
+        lecturas.setdefault(id_cliente, (codigo, delta, fecha))
+
+    if not lecturas:
+        return {'aplicados': 0, 'duplicados': [], 'desconocidos': [], 'stock': {}}
+    try:
+        return aplicar_lecturas(lecturas, usuario)
+    except IntegrityError:
+        # Un reenvío simultáneo guardó los mismos ids antes: al repetir quedan como duplicados
+        return aplicar_lecturas(lecturas, usuario)
+
+
+def aplicar_lecturas(lecturas, usuario):
+    """Aplica las lecturas {id_cliente: (codigo, delta, fecha)} no recibidas antes"""
+    resultado = {'aplicados': 0, 'duplicados': [], 'desconocidos': [], 'stock': {}}
+    with transaction.atomic():
+        productos = dict(
+            Producto.objects.filter(codigo_producto__in={codigo for codigo, _, _ in lecturas.values()})
+            .values_list('codigo_producto', 'id')
+        )
+        recibidos = ids_recibidos(list(lecturas))
+        resultado['duplicados'] = sorted(recibidos)
+
+        nuevas, deltas = [], {}
+        for id_cliente, (codigo, delta, fecha) in lecturas.items():
+            if id_cliente in recibidos:
+                continue
+            if codigo not in productos:
+                resultado['desconocidos'].append(codigo)
+                continue
+            producto_id = productos[codigo]
+            deltas[producto_id] = deltas.get(producto_id, 0) + delta
+            nuevas.append(EscaneoStock(
+                id_cliente=id_cliente, producto_id=producto_id, delta=delta, fecha_escaneo=fecha, usuario=usuario,
+            ))
+
+        cantidad_lecturas = {}
+        for escaneo in nuevas:
+            cantidad_lecturas[escaneo.producto_id] = cantidad_lecturas.get(escaneo.producto_id, 0) + 1
+        movimientos = aplicar_movimientos(
+            MovimientoInventario(
+                producto_id=producto_id, tipo_movimiento='ajuste', cantidad=abs(delta), usuario=usuario,
+                observaciones=f'Escaneo QR ({cantidad_lecturas[producto_id]} lecturas)',
+                **{'motivo_entrada' if delta > 0 else 'motivo_salida': 'ajuste_inventario'},
+            )
+            for producto_id, delta in deltas.items() if delta
+        )
+        por_producto = {movimiento.producto_id: movimiento for movimiento in movimientos}
+        for escaneo in nuevas:
+            escaneo.movimiento = por_producto.get(escaneo.producto_id)
+        EscaneoStock.objects.bulk_create(nuevas, batch_size=1000)
+
+    codigo_de = {producto_id: codigo for codigo, producto_id in productos.items()}
+    resultado['aplicados'] = len(nuevas)
+    resultado['desconocidos'] = sorted(set(resultado['desconocidos']))
+    resultado['stock'] = {codigo_de[m.producto_id]: m.cantidad_nueva for m in movimientos}
+    return resultado
@@ -0,0 +1,51 @@
+"""
+Exportación del libro de movimientos de inventario
+"""
+from django.db.models import Q
+
+from Pozinox.exportar import Exportacion
+from apps.tienda.filtros import leer_fecha
+from .models import MovimientoInventario
+
+
+def filtrar_movimientos(parametros):
+    """Movimientos por producto, tipo, rango de fechas y búsqueda por código o documento"""
+    movimientos = MovimientoInventario.objects.all()
+    if str(parametros.get('producto') or '').isdigit():
+        movimientos = movimientos.filter(producto_id=parametros['producto'])
+    if parametros.get('tipo'):
+        movimientos = movimientos.filter(tipo_movimiento=parametros['tipo'])
+
+    desde, hasta = leer_fecha(parametros.get('desde')), leer_fecha(parametros.get('hasta'))
+    if desde:
+        movimientos = movimientos.filter(fecha_movimiento__date__gte=desde)
+    if hasta:
+        movimientos = movimientos.filter(fecha_movimiento__date__lte=hasta)
+
+    busqueda = parametros.get('q')
+    if busqueda:
+        movimientos = movimientos.filter(
+            Q(producto__codigo_producto__icontains=busqueda) | Q(numero_documento__icontains=busqueda)
+        )
+    return movimientos
+
+
+def exportar_movimientos(parametros):
+    movimientos = filtrar_movimientos(parametros).select_related(
+        'producto', 'proveedor', 'usuario',
+    ).order_by('fecha_movimiento', 'id')
+
+    def fila(movimiento):
+        return [
+            movimiento.fecha_movimiento, movimiento.producto.codigo_producto, movimiento.producto.nombre,
+            movimiento.get_tipo_movimiento_display(),
+            movimiento.get_motivo_entrada_display() or movimiento.get_motivo_salida_display(),
+            movimiento.cantidad, movimiento.cantidad_anterior, movimiento.cantidad_nueva,
+            movimiento.numero_documento, movimiento.proveedor.nombre if movimiento.proveedor else '',
+            movimiento.usuario.username, movimiento.observaciones,
+        ]
+
+    return Exportacion('Movimientos', [
+        'Fecha', 'Código', 'Producto', 'Tipo', 'Motivo', 'Cantidad', 'Stock anterior', 'Stock nuevo',
+        'Documento', 'Proveedor', 'Usuario', 'Observaciones',
+    ], movimientos, fila)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventario.pronostico import recalcular_pronosticos
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el pronóstico de demanda y el punto de reorden de los productos activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde-cero', action='store_true', help='Ignora el estado guardado y recalcula el último año')
+        parser.add_argument('--aplicar-stock-minimo', action='store_true', help='Usa el punto de reorden como stock mínimo')
+
+    def handle(self, *args, **options):
+        pronosticos = recalcular_pronosticos(
+            desde_cero=options['desde_cero'],
+            aplicar_stock_minimo=options['aplicar_stock_minimo'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{len(pronosticos)} pronósticos actualizados'))
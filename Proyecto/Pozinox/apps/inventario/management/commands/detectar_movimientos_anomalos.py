@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventario.anomalias import UMBRAL_Z, detectar_movimientos_anomalos
+
+
+class Command(BaseCommand):
+    help = 'Crea alertas para los movimientos recientes que se salen del historial de cada producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-historia', type=int, default=365, help='Días de historial usados como referencia')
+        parser.add_argument('--dias-revision', type=int, default=1, help='Días recientes que se revisan')
+        parser.add_argument('--umbral', type=float, default=UMBRAL_Z, help='Z-score robusto a partir del cual se alerta')
+
+    def handle(self, *args, **options):
+        alertas = detectar_movimientos_anomalos(
+            dias_historia=options['dias_historia'],
+            dias_revision=options['dias_revision'],
+            umbral=options['umbral'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{len(alertas)} movimientos anómalos detectados'))
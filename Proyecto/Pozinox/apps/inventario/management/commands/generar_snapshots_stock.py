@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventario.snapshots import generar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Guarda el stock de cada producto al cierre del día (por defecto, ayer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Día a registrar en formato AAAA-MM-DD')
+
+    def handle(self, *args, **options):
+        fecha = None
+        if options['fecha']:
+            try:
+                fecha = datetime.date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD')
+
+        total = generar_snapshots(fecha)
+        self.stdout.write(self.style.SUCCESS(f'{total} snapshots de stock guardados'))
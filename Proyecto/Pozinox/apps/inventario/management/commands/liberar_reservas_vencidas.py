@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventario.reservas import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas de stock vencidas, canceladas o con la transferencia expirada'
+
+    def handle(self, *args, **options):
+        total = liberar_reservas_vencidas()
+        self.stdout.write(self.style.SUCCESS(f'{total} reservas de stock liberadas'))
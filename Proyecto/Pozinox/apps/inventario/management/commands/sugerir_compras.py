@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventario.reposicion import crear_compras_sugeridas, sugerir_compras
+
+
+class Command(BaseCommand):
+    help = 'Genera órdenes de compra pendientes para los productos bajo su punto de reorden'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', required=True, help='Usuario que queda como autor de las órdenes')
+        parser.add_argument('--simular', action='store_true', help='Muestra las sugerencias sin crear órdenes')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario "{options["usuario"]}"')
+
+        if options['simular']:
+            for proveedor_id, lineas in sugerir_compras().items():
+                self.stdout.write(f'Proveedor {proveedor_id}:')
+                for linea in lineas:
+                    self.stdout.write(f'  {linea["producto"]}: {linea["cantidad"]}')
+            return
+
+        compras = crear_compras_sugeridas(usuario)
+        self.stdout.write(self.style.SUCCESS(f'{len(compras)} órdenes de compra creadas'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_snapshot_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertainventario',
+            name='movimiento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventario.movimientoinventario'),
+        ),
+    ]
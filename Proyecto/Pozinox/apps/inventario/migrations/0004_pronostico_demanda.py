@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_alerta_movimiento'),
+        ('tienda', '0005_transferencia_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(choices=[('ses', 'Suavizamiento Exponencial'), ('croston', 'Croston (demanda intermitente)')], default='ses', max_length=10)),
+                ('demanda_diaria', models.FloatField(default=0)),
+                ('desviacion_diaria', models.FloatField(default=0)),
+                ('plazo_entrega_dias', models.PositiveIntegerField(default=7)),
+                ('stock_seguridad', models.PositiveIntegerField(default=0)),
+                ('punto_reorden', models.PositiveIntegerField(default=0)),
+                ('fecha_hasta', models.DateField(help_text='Último día de demanda incorporado')),
+                ('nivel', models.FloatField(default=0)),
+                ('error_cuadratico', models.FloatField(default=0)),
+                ('croston_demanda', models.FloatField(blank=True, null=True)),
+                ('croston_intervalo', models.FloatField(blank=True, null=True)),
+                ('dias_sin_demanda', models.PositiveIntegerField(default=0)),
+                ('dias_observados', models.PositiveIntegerField(default=0)),
+                ('dias_con_demanda', models.PositiveIntegerField(default=0)),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pronostico', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de Demanda',
+                'verbose_name_plural': 'Pronósticos de Demanda',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_pronostico_demanda'),
+        ('tienda', '0005_transferencia_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoProveedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preferido', models.BooleanField(default=False)),
+                ('precio_compra', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad_minima', models.PositiveIntegerField(default=1, help_text='Cantidad mínima por pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proveedores', to='tienda.producto')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productos', to='inventario.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Producto de Proveedor',
+                'verbose_name_plural': 'Productos de Proveedores',
+                'unique_together': {('producto', 'proveedor')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_producto_proveedor'),
+        ('tienda', '0005_transferencia_estado_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscaneoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_cliente', models.CharField(help_text='Identificador generado por el dispositivo', max_length=64, unique=True)),
+                ('delta', models.IntegerField()),
+                ('fecha_escaneo', models.DateTimeField()),
+                ('fecha_recepcion', models.DateTimeField(auto_now_add=True)),
+                ('movimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventario.movimientoinventario')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tienda.producto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Escaneo de Stock',
+                'verbose_name_plural': 'Escaneos de Stock',
+                'ordering': ['-fecha_escaneo'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_escaneo_stock'),
+        ('tienda', '0005_transferencia_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('activa', 'Activa'), ('consumida', 'Consumida'), ('liberada', 'Liberada')], default='activa', max_length=10)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_expiracion', models.DateTimeField()),
+                ('fecha_cierre', models.DateTimeField(blank=True, help_text='Fecha en que se consumió o liberó', null=True)),
+                ('cotizacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.cotizacion')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'activa')), fields=['producto', 'cantidad'], name='reserva_activa_producto_idx'), models.Index(condition=models.Q(('estado', 'activa')), fields=['fecha_expiracion'], name='reserva_activa_expira_idx')],
+            },
+        ),
+    ]
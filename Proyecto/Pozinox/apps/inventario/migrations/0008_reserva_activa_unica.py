@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:44
+
+from django.db import migrations, models
+
+
+def liberar_duplicadas(apps, schema_editor):
+    # Reservas repetidas por un doble envío al finalizar: se conserva la primera
+    ReservaStock = apps.get_model('inventario', 'ReservaStock')
+    vistas = set()
+    duplicadas = []
+    for reserva in ReservaStock.objects.filter(estado='activa').order_by('id').only('id', 'cotizacion_id', 'producto_id'):
+        clave = (reserva.cotizacion_id, reserva.producto_id)
+        if clave in vistas:
+            duplicadas.append(reserva.id)
+        vistas.add(clave)
+    ReservaStock.objects.filter(id__in=duplicadas).update(estado='liberada', fecha_cierre=models.functions.Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_reserva_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(liberar_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reservastock',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'activa')), fields=('cotizacion', 'producto'), name='reserva_activa_unica'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from apps.tienda.models import Producto
+from apps.tienda.models import Cotizacion, Producto
 
 
 class Proveedor(models.Model):
@@ -38,6 +38,23 @@ class Proveedor(models.Model):
         return self.nombre
 
 
+class ProductoProveedor(models.Model):
+    """Condiciones de compra de un producto con un proveedor"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='proveedores')
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name='productos')
+    preferido = models.BooleanField(default=False)
+    precio_compra = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad_minima = models.PositiveIntegerField(default=1, help_text="Cantidad mínima por pedido")
+    
+    class Meta:
+        verbose_name = 'Producto de Proveedor'
+        verbose_name_plural = 'Productos de Proveedores'
+        unique_together = ['producto', 'proveedor']
+    
+    def __str__(self):
+        return f"{self.producto} - {self.proveedor}"
+
+
 class MovimientoInventario(models.Model):
     """Movimientos de inventario (entradas y salidas)"""
     TIPO_MOVIMIENTO = [
@@ -89,11 +106,133 @@ class MovimientoInventario(models.Model):
         verbose_name = 'Movimiento de Inventario'
         verbose_name_plural = 'Movimientos de Inventario'
         ordering = ['-fecha_movimiento']
+        indexes = [
+            models.Index(fields=['producto', 'fecha_movimiento'], name='mov_producto_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.producto} - {self.get_tipo_movimiento_display()} - {self.cantidad} unidades"
 
 
+class EscaneoStock(models.Model):
+    """Lectura de un código QR desde un dispositivo de bodega"""
+    id_cliente = models.CharField(max_length=64, unique=True, help_text="Identificador generado por el dispositivo")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    delta = models.IntegerField()
+    fecha_escaneo = models.DateTimeField()
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Movimiento del libro en que se aplicó la lectura (agrupa las del mismo lote)
+    movimiento = models.ForeignKey(MovimientoInventario, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_recepcion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Escaneo de Stock'
+        verbose_name_plural = 'Escaneos de Stock'
+        ordering = ['-fecha_escaneo']
+    
+    def __str__(self):
+        return f"{self.producto} {self.delta:+d} ({self.id_cliente})"
+
+
+class ReservaStock(models.Model):
+    """Unidades apartadas para una cotización finalizada mientras se paga"""
+    ESTADOS_RESERVA = [
+        ('activa', 'Activa'),
+        ('consumida', 'Consumida'),
+        ('liberada', 'Liberada'),
+    ]
+    
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    cotizacion = models.ForeignKey(Cotizacion, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    estado = models.CharField(max_length=10, choices=ESTADOS_RESERVA, default='activa')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_expiracion = models.DateTimeField()
+    fecha_cierre = models.DateTimeField(null=True, blank=True, help_text="Fecha en que se consumió o liberó")
+    
+    class Meta:
+        verbose_name = 'Reserva de Stock'
+        verbose_name_plural = 'Reservas de Stock'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Índices parciales: la suma de reservas activas por producto se
+            # resuelve solo con el índice y el barrido no recorre el historial
+            models.Index(
+                fields=['producto', 'cantidad'], condition=models.Q(estado='activa'),
+                name='reserva_activa_producto_idx',
+            ),
+            models.Index(
+                fields=['fecha_expiracion'], condition=models.Q(estado='activa'),
+                name='reserva_activa_expira_idx',
+            ),
+        ]
+        constraints = [
+            # Una sola reserva activa por producto y cotización
+            models.UniqueConstraint(
+                fields=['cotizacion', 'producto'], condition=models.Q(estado='activa'),
+                name='reserva_activa_unica',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto} x {self.cantidad} ({self.cotizacion.numero_cotizacion}, {self.get_estado_display()})"
+
+
+class SnapshotStock(models.Model):
+    """Stock de cada producto al cierre de un día"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots_stock')
+    fecha = models.DateField()
+    stock = models.PositiveIntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Snapshot de Stock'
+        verbose_name_plural = 'Snapshots de Stock'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='snapshot_producto_fecha_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto} - {self.fecha}: {self.stock}"
+
+
+class PronosticoDemanda(models.Model):
+    """Pronóstico de demanda diaria y punto de reorden por producto"""
+    METODOS = [
+        ('ses', 'Suavizamiento Exponencial'),
+        ('croston', 'Croston (demanda intermitente)'),
+    ]
+    
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='pronostico')
+    metodo = models.CharField(max_length=10, choices=METODOS, default='ses')
+    demanda_diaria = models.FloatField(default=0)
+    desviacion_diaria = models.FloatField(default=0)
+    plazo_entrega_dias = models.PositiveIntegerField(default=7)
+    stock_seguridad = models.PositiveIntegerField(default=0)
+    punto_reorden = models.PositiveIntegerField(default=0)
+    
+    # Estado de los modelos para el recálculo incremental
+    fecha_hasta = models.DateField(help_text="Último día de demanda incorporado")
+    nivel = models.FloatField(default=0)
+    error_cuadratico = models.FloatField(default=0)
+    croston_demanda = models.FloatField(null=True, blank=True)
+    croston_intervalo = models.FloatField(null=True, blank=True)
+    dias_sin_demanda = models.PositiveIntegerField(default=0)
+    dias_observados = models.PositiveIntegerField(default=0)
+    dias_con_demanda = models.PositiveIntegerField(default=0)
+    
+    fecha_calculo = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Pronóstico de Demanda'
+        verbose_name_plural = 'Pronósticos de Demanda'
+    
+    def __str__(self):
+        return f"{self.producto} - {self.demanda_diaria:.2f}/día (reorden {self.punto_reorden})"
+
+
 class Compra(models.Model):
     """Compras de productos a proveedores"""
     ESTADOS_CHOICES = [
@@ -179,6 +318,8 @@ class AlertaInventario(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     tipo_alerta = models.CharField(max_length=20, choices=TIPO_ALERTA)
     mensaje = models.TextField()
+    # Movimiento que originó la alerta (alertas de movimiento anómalo)
+    movimiento = models.ForeignKey(MovimientoInventario, on_delete=models.SET_NULL, null=True, blank=True)
     fecha_alerta = models.DateTimeField(auto_now_add=True)
     leida = models.BooleanField(default=False)
     usuario_asignado = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -0,0 +1,186 @@
+"""
+Pronóstico de demanda (suavizamiento exponencial y Croston) y puntos de reorden
+"""
+import datetime
+import math
+
+import numpy as np
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from Pozinox.routers import usar_replica
+from apps.tienda.models import DetalleCotizacion, DetallePedido, Producto
+from apps.usuarios.configuracion import obtener_configuracion
+from .models import DetalleCompra, PronosticoDemanda
+
+ALFA = 0.1
+# Suavizado del error cuadrático de un paso (desviación de la demanda)
+BETA_ERROR = 0.1
+# Intervalo medio entre demandas sobre el cual se considera intermitente (Syntetos-Boylan)
+ADI_INTERMITENTE = 1.32
+# Nivel de servicio del 95%
+Z_SERVICIO = 1.65
+DIAS_HISTORIA_INICIAL = 365
+
+ESTADOS_PEDIDO_VENDIDO = ['confirmado', 'preparando', 'listo', 'enviado', 'entregado']
+
+CAMPOS_ESTADO = {
+    'nivel': 'nivel',
+    'error': 'error_cuadratico',
+    'z': 'croston_demanda',
+    'p': 'croston_intervalo',
+    'q': 'dias_sin_demanda',
+    'observados': 'dias_observados',
+    'con_demanda': 'dias_con_demanda',
+}
+
+
+def estado_inicial(n):
+    """Estado de los modelos para productos sin historial procesado"""
+    return {
+        'nivel': np.zeros(n), 'error': np.zeros(n),
+        'z': np.full(n, np.nan), 'p': np.full(n, np.nan), 'q': np.zeros(n),
+        'observados': np.zeros(n), 'con_demanda': np.zeros(n),
+    }
+
+
+def actualizar_estados(demanda, inicio, estado):
+    """
+    Incorpora una matriz de demanda (productos × días) al estado de los modelos.
+    Cada producto solo procesa los días desde su índice `inicio`; el recorrido
+    es por día y vectorizado sobre todos los productos.
+    """
+    for t in range(demanda.shape[1]):
+        activo = inicio <= t
+        d = demanda[:, t]
+
+        # Suavizamiento exponencial simple y error de un paso
+        error = d - estado['nivel']
+        estado['error'] = np.where(activo, BETA_ERROR * error ** 2 + (1 - BETA_ERROR) * estado['error'], estado['error'])
+        estado['nivel'] = np.where(activo, estado['nivel'] + ALFA * error, estado['nivel'])
+
+        # Croston: tamaño de la demanda e intervalo entre demandas
+        q = estado['q'] + 1
+        hay = activo & (d > 0)
+        primera = hay & np.isnan(estado['z'])
+        # El intervalo se inicializa con el primer intervalo real entre dos ventas
+        segunda = hay & ~primera & np.isnan(estado['p'])
+        estado['z'] = np.where(primera, d, np.where(hay, estado['z'] + ALFA * (d - estado['z']), estado['z']))
+        estado['p'] = np.where(segunda, q, np.where(hay, estado['p'] + ALFA * (q - estado['p']), estado['p']))
+        estado['q'] = np.where(hay, 0, np.where(activo, q, estado['q']))
+
+        # Los días previos a la primera venta no cuentan para el intervalo medio
+        estado['observados'] += activo & ~np.isnan(estado['z'])
+        estado['con_demanda'] += hay
+    return estado
+
+
+def pronosticar(estado):
+    """Demanda diaria esperada, su desviación y si se usó Croston"""
+    adi = estado['observados'] / np.maximum(estado['con_demanda'], 1)
+    croston = (adi > ADI_INTERMITENTE) & ~np.isnan(estado['p'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Corrección de sesgo de Syntetos-Boylan
+        tasa_croston = (1 - ALFA / 2) * estado['z'] / estado['p']
+    demanda = np.where(croston, tasa_croston, estado['nivel'])
+    return np.maximum(demanda, 0), np.sqrt(estado['error']), croston
+
+
+def demanda_por_dia(desde, hasta):
+    """
+    (producto_id, día, unidades) vendidas en cotizaciones pagadas y pedidos confirmados.
+    Las cotizaciones cuentan el día del pago: una finalizada antes de un día ya
+    procesado y pagada después entra en la corrida siguiente.
+    """
+    cotizaciones = DetalleCotizacion.objects.filter(cotizacion__estado='pagada').annotate(
+        dia=TruncDate('cotizacion__fecha_pago'),
+    ).filter(dia__range=(desde, hasta)).values('producto_id', 'dia').annotate(unidades=Sum('cantidad'))
+
+    pedidos = DetallePedido.objects.filter(pedido__estado__in=ESTADOS_PEDIDO_VENDIDO).annotate(
+        dia=TruncDate('pedido__fecha_pedido'),
+    ).filter(dia__range=(desde, hasta)).values('producto_id', 'dia').annotate(unidades=Sum('cantidad'))
+
+    for fila in list(cotizaciones.order_by()) + list(pedidos.order_by()):
+        yield fila['producto_id'], fila['dia'], fila['unidades']
+
+
+def recalcular_pronosticos(hasta=None, desde_cero=False, aplicar_stock_minimo=False):
+    """
+    Actualiza PronosticoDemanda de los productos activos incorporando solo los
+    días posteriores a lo ya procesado (o el último año si no hay estado).
+    Con `aplicar_stock_minimo` el punto de reorden pasa a ser el stock mínimo.
+    """
+    hasta = hasta or timezone.localdate() - datetime.timedelta(days=1)
+    config = obtener_configuracion()
+
+    ultimo_plazo = DetalleCompra.objects.filter(producto=OuterRef('pk')).order_by(
+        '-compra__fecha_orden'
+    ).values('compra__proveedor__plazo_entrega_dias')[:1]
+    with usar_replica():
+        productos = list(
+            Producto.objects.filter(activo=True).annotate(plazo=Subquery(ultimo_plazo)).only('id', 'stock_minimo')
+        )
+        previos = {} if desde_cero else {
+            previo.producto_id: previo for previo in PronosticoDemanda.objects.all()
+        }
+    if not productos:
+        return []
+
+    n = len(productos)
+    fila_de = {producto.id: i for i, producto in enumerate(productos)}
+    estado = estado_inicial(n)
+    primer_dia = np.full(n, np.datetime64(hasta - datetime.timedelta(days=DIAS_HISTORIA_INICIAL - 1)))
+    for producto_id, previo in previos.items():
+        if producto_id not in fila_de:
+            continue
+        i = fila_de[producto_id]
+        for clave, campo in CAMPOS_ESTADO.items():
+            valor = getattr(previo, campo)
+            estado[clave][i] = np.nan if valor is None else valor
+        primer_dia[i] = np.datetime64(previo.fecha_hasta + datetime.timedelta(days=1))
+
+    desde = primer_dia.min().astype(object)
+    dias = max((hasta - desde).days + 1, 0)
+    demanda = np.zeros((n, dias))
+    if dias:
+        with usar_replica():
+            for producto_id, dia, unidades in demanda_por_dia(desde, hasta):
+                if producto_id in fila_de:
+                    demanda[fila_de[producto_id], (dia - desde).days] += unidades
+    inicio = (primer_dia - np.datetime64(desde)).astype(int)
+    actualizar_estados(demanda, inicio, estado)
+
+    tasa, desviacion, croston = pronosticar(estado)
+    pronosticos = []
+    for i, producto in enumerate(productos):
+        plazo = producto.plazo or config.dias_entrega_default
+        seguridad = math.ceil(Z_SERVICIO * desviacion[i] * math.sqrt(plazo))
+        pronostico = PronosticoDemanda(
+            producto=producto, metodo='croston' if croston[i] else 'ses',
+            demanda_diaria=float(tasa[i]), desviacion_diaria=float(desviacion[i]),
+            plazo_entrega_dias=plazo, stock_seguridad=seguridad,
+            punto_reorden=math.ceil(tasa[i] * plazo + seguridad),
+            fecha_hasta=hasta,
+        )
+        for clave, campo in CAMPOS_ESTADO.items():
+            valor = float(estado[clave][i])
+            setattr(pronostico, campo, None if math.isnan(valor) else valor)
+        pronosticos.append(pronostico)
+
+    campos = [f.name for f in PronosticoDemanda._meta.concrete_fields if f.name not in ('id', 'producto')]
+    PronosticoDemanda.objects.bulk_create(
+        pronosticos, batch_size=1000, update_conflicts=True,
+        unique_fields=['producto'], update_fields=campos,
+    )
+
+    if aplicar_stock_minimo:
+        # Solo productos con ventas registradas; el resto conserva su mínimo manual
+        con_ventas = [
+            (producto, pronostico) for producto, pronostico in zip(productos, pronosticos)
+            if pronostico.dias_con_demanda
+        ]
+        for producto, pronostico in con_ventas:
+            producto.stock_minimo = pronostico.punto_reorden
+        Producto.objects.bulk_update([p for p, _ in con_ventas], ['stock_minimo'], batch_size=1000)
+    return pronosticos
@@ -0,0 +1,67 @@
+"""
+Recepción de órdenes de compra: actualiza cantidades recibidas, stock y estado de la compra
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Compra, DetalleCompra, MovimientoInventario
+from .stock import aplicar_movimientos
+
+ESTADOS_RECEPCIONABLES = ['pendiente', 'ordenada', 'parcialmente_recibida']
+
+
+class RecepcionInvalida(Exception):
+    """La recepción no corresponde a la orden de compra"""
+
+
+def recibir_compra(compra_id, cantidades, usuario, numero_documento=''):
+    """
+    Recibe varias líneas de una compra en una sola transacción.
+    `cantidades` es {producto_id: unidades recibidas}. Las cantidades recibidas se
+    escriben con un UPDATE, las entradas de stock con un lote del libro de
+    inventario y la compra pasa a parcialmente recibida o recibida.
+    """
+    cantidades = {int(producto_id): int(cantidad) for producto_id, cantidad in cantidades.items()}
+    if not cantidades:
+        raise RecepcionInvalida('Debe indicar al menos una línea a recibir')
+    if any(cantidad <= 0 for cantidad in cantidades.values()):
+        raise RecepcionInvalida('Las cantidades recibidas deben ser mayores a 0')
+    largo_documento = MovimientoInventario._meta.get_field('numero_documento').max_length
+    if not isinstance(numero_documento, str) or len(numero_documento) > largo_documento:
+        raise RecepcionInvalida(f'El número de documento debe ser un texto de hasta {largo_documento} caracteres')
+
+    with transaction.atomic():
+        compra = Compra.objects.select_for_update().get(id=compra_id)
+        if compra.estado not in ESTADOS_RECEPCIONABLES:
+            raise RecepcionInvalida(f'La orden {compra.numero_orden} está {compra.get_estado_display().lower()}')
+
+        detalles = {d.producto_id: d for d in DetalleCompra.objects.filter(compra=compra)}
+        desconocidos = set(cantidades) - set(detalles)
+        if desconocidos:
+            raise RecepcionInvalida(f'Productos que no están en la orden: {sorted(desconocidos)}')
+
+        movimientos = []
+        for producto_id, cantidad in cantidades.items():
+            detalle = detalles[producto_id]
+            pendiente = detalle.cantidad_solicitada - detalle.cantidad_recibida
+            if cantidad > pendiente:
+                raise RecepcionInvalida(
+                    f'Se reciben {cantidad} unidades del producto {producto_id} pero solo quedan {pendiente} pendientes'
+                )
+            detalle.cantidad_recibida += cantidad
+            movimientos.append(MovimientoInventario(
+                producto_id=producto_id, tipo_movimiento='entrada', motivo_entrada='compra',
+                cantidad=cantidad, proveedor_id=compra.proveedor_id, usuario=usuario,
+                numero_documento=numero_documento or compra.numero_orden,
+            ))
+
+        DetalleCompra.objects.bulk_update([detalles[p] for p in cantidades], ['cantidad_recibida'])
+        aplicar_movimientos(movimientos)
+
+        if all(d.cantidad_recibida >= d.cantidad_solicitada for d in detalles.values()):
+            compra.estado = 'recibida'
+            compra.fecha_recibida = timezone.localdate()
+        else:
+            compra.estado = 'parcialmente_recibida'
+        compra.save(update_fields=['estado', 'fecha_recibida'])
+    return compra
@@ -0,0 +1,111 @@
+"""
+Planificador de reposición: sugiere y crea órdenes de compra agrupadas por proveedor
+"""
+import datetime
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.tienda.models import Producto
+from apps.usuarios.configuracion import tasa_iva
+from .models import Compra, DetalleCompra, ProductoProveedor
+
+ESTADOS_COMPRA_ABIERTA = ['pendiente', 'ordenada', 'parcialmente_recibida']
+
+
+def productos_bajo_reorden():
+    """
+    Productos activos cuya posición (stock + unidades en camino) está bajo su punto
+    de reorden, con su proveedor preferido y condiciones de compra, en una consulta.
+    """
+    condiciones = ProductoProveedor.objects.filter(
+        producto=OuterRef('pk'), proveedor__activo=True,
+    ).order_by('-preferido', 'precio_compra')
+    en_camino = DetalleCompra.objects.filter(
+        producto=OuterRef('pk'), compra__estado__in=ESTADOS_COMPRA_ABIERTA,
+    ).values('producto').annotate(
+        pendiente=Sum(F('cantidad_solicitada') - F('cantidad_recibida'))
+    ).values('pendiente')
+
+    return Producto.objects.filter(activo=True).annotate(
+        punto=Coalesce('pronostico__punto_reorden', 'stock_minimo'),
+        demanda_diaria=Coalesce('pronostico__demanda_diaria', Value(0.0), output_field=FloatField()),
+        en_camino=Coalesce(Subquery(en_camino), 0),
+        proveedor_sugerido=Subquery(condiciones.values('proveedor_id')[:1]),
+        plazo=Subquery(condiciones.values('proveedor__plazo_entrega_dias')[:1]),
+        precio_compra=Subquery(condiciones.values('precio_compra')[:1]),
+        cantidad_minima=Subquery(condiciones.values('cantidad_minima')[:1]),
+    ).filter(punto__gt=F('stock_actual') + F('en_camino')).only('id', 'codigo_producto', 'nombre', 'stock_actual')
+
+
+def cantidad_economica(demanda_diaria, precio):
+    """Cantidad económica de pedido (EOQ) con los costos configurados"""
+    mantencion = float(precio or 0) * settings.TASA_COSTO_MANTENCION
+    if demanda_diaria <= 0 or mantencion <= 0:
+        return 0
+    return math.ceil(math.sqrt(2 * demanda_diaria * 365 * settings.COSTO_EMISION_PEDIDO / mantencion))
+
+
+def sugerir_compras():
+    """Líneas sugeridas agrupadas por proveedor: {proveedor_id: [línea, ...]}"""
+    sugerencias = {}
+    for producto in productos_bajo_reorden():
+        if producto.proveedor_sugerido is None:
+            continue
+        necesidad = producto.punto - producto.stock_actual - producto.en_camino
+        cantidad = max(
+            necesidad,
+            cantidad_economica(producto.demanda_diaria, producto.precio_compra),
+            producto.cantidad_minima,
+        )
+        sugerencias.setdefault(producto.proveedor_sugerido, []).append({
+            'producto': producto,
+            'cantidad': cantidad,
+            'precio_unitario': producto.precio_compra,
+            'plazo': producto.plazo,
+        })
+    return sugerencias
+
+
+def crear_compras_sugeridas(usuario):
+    """Crea una Compra en estado pendiente por proveedor con sus detalles, en consultas acotadas"""
+    hoy = timezone.localdate()
+    with transaction.atomic():
+        # Dentro de la transacción se lee la base principal: las compras recién
+        # creadas ya cuentan como unidades en camino
+        sugerencias = sugerir_compras()
+        if not sugerencias:
+            return []
+
+        # Misma numeración que Compra.save, reservada para todo el lote
+        emitidas_hoy = Compra.objects.filter(fecha_orden__date=hoy).count()
+        tasa = tasa_iva()
+        compras, detalles = [], []
+        for i, (proveedor_id, lineas) in enumerate(sugerencias.items(), start=1):
+            subtotal = sum(linea['cantidad'] * linea['precio_unitario'] for linea in lineas)
+            iva = (subtotal * tasa).quantize(Decimal('0.01'))
+            compra = Compra(
+                proveedor_id=proveedor_id,
+                numero_orden=f"ORD{hoy.strftime('%Y%m%d')}{emitidas_hoy + i:03d}",
+                fecha_esperada=hoy + datetime.timedelta(days=lineas[0]['plazo']),
+                subtotal=subtotal, iva=iva, total=subtotal + iva,
+                usuario=usuario,
+                notas_internas='Generada por el planificador de reposición',
+            )
+            compras.append(compra)
+            detalles.extend(
+                DetalleCompra(
+                    compra=compra, producto=linea['producto'],
+                    cantidad_solicitada=linea['cantidad'], precio_unitario=linea['precio_unitario'],
+                    subtotal=linea['cantidad'] * linea['precio_unitario'],
+                )
+                for linea in lineas
+            )
+        Compra.objects.bulk_create(compras)
+        DetalleCompra.objects.bulk_create(detalles, batch_size=1000)
+    return compras
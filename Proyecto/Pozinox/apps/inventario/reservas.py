@@ -0,0 +1,163 @@
+"""
+Reservas de stock de cotizaciones finalizadas: reserva, consumo al pagar y liberación
+"""
+import datetime
+import logging
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.tienda.models import Cotizacion, Producto
+from .models import MovimientoInventario, ReservaStock
+from .stock import StockInsuficiente, aplicar_movimientos
+
+logger = logging.getLogger(__name__)
+
+# Mismo plazo que se da para pagar una TransferenciaBancaria
+DIAS_RESERVA = 3
+
+
+def reservado_por_producto():
+    """Subconsulta con las unidades en reservas activas del producto externo"""
+    return ReservaStock.objects.filter(producto=OuterRef('pk'), estado='activa').order_by().values(
+        'producto'
+    ).annotate(total=Sum('cantidad')).values('total')
+
+
+def con_disponible(productos):
+    """
+    Anota stock_reservado y stock_disponible (stock - reservado, nunca negativo)
+    en un queryset de productos
+    """
+    return productos.annotate(
+        stock_reservado=Coalesce(Subquery(reservado_por_producto()), 0),
+    ).annotate(stock_disponible=Greatest(F('stock_actual') - F('stock_reservado'), 0))
+
+
+def disponibles(producto_ids):
+    """{producto_id: unidades disponibles para nuevas cotizaciones}"""
+    return dict(
+        con_disponible(Producto.objects.filter(id__in=producto_ids)).values_list('id', 'stock_disponible')
+    )
+
+
+def reservar_cotizacion(cotizacion):
+    """
+    Reserva las unidades de cada línea de la cotización por DIAS_RESERVA días.
+    Bloquea los productos en orden de id, igual que el libro de inventario, por
+    lo que dos finalizaciones concurrentes no pueden reservar la misma unidad.
+    Si alguna línea supera lo disponible se lanza StockInsuficiente y no se
+    reserva nada.
+    """
+    cantidades = dict(cotizacion.detalles.values_list('producto_id', 'cantidad'))
+    if not cantidades:
+        return []
+
+    with transaction.atomic():
+        productos = list(
+            Producto.objects.select_for_update().filter(id__in=cantidades).order_by('id')
+            .only('id', 'codigo_producto', 'nombre', 'stock_actual')
+        )
+        # Se suma en una consulta posterior al bloqueo para ver las reservas
+        # confirmadas por quien tenía el bloqueo antes
+        reservado = dict(
+            ReservaStock.objects.filter(producto_id__in=cantidades, estado='activa').order_by().values(
+                'producto_id'
+            ).annotate(total=Sum('cantidad')).values_list('producto_id', 'total')
+        )
+        for producto in productos:
+            disponible = producto.stock_actual - reservado.get(producto.id, 0)
+            if cantidades[producto.id] > disponible:
+                raise StockInsuficiente(producto, max(disponible, 0), cantidades[producto.id])
+
+        expira = timezone.now() + datetime.timedelta(days=DIAS_RESERVA)
+        return ReservaStock.objects.bulk_create([
+            ReservaStock(
+                producto=producto, cotizacion=cotizacion,
+                cantidad=cantidades[producto.id], fecha_expiracion=expira,
+            )
+            for producto in productos
+        ])
+
+
+def liberar_reservas(cotizacion_ids):
+    """Libera las reservas activas de las cotizaciones indicadas"""
+    return ReservaStock.objects.filter(cotizacion_id__in=cotizacion_ids, estado='activa').update(
+        estado='liberada', fecha_cierre=timezone.now()
+    )
+
+
+def consumir_reservas(cotizacion):
+    """
+    Convierte la cotización pagada en salidas de venta del libro de inventario y
+    marca sus reservas como consumidas. Se descuenta lo cotizado aunque la
+    reserva haya vencido; una cotización ya consumida no se descuenta dos veces.
+    """
+    with transaction.atomic():
+        reservas = list(ReservaStock.objects.select_for_update().filter(cotizacion=cotizacion).exclude(
+            estado='liberada'
+        ))
+        if any(reserva.estado == 'consumida' for reserva in reservas):
+            return []
+
+        movimientos = aplicar_movimientos(
+            MovimientoInventario(
+                producto_id=producto_id, tipo_movimiento='salida', motivo_salida='venta',
+                cantidad=cantidad, usuario_id=cotizacion.usuario_id,
+                numero_documento=cotizacion.numero_cotizacion,
+            )
+            for producto_id, cantidad in cotizacion.detalles.values_list('producto_id', 'cantidad')
+        )
+        ReservaStock.objects.filter(id__in=[r.id for r in reservas]).update(
+            estado='consumida', fecha_cierre=timezone.now()
+        )
+    return movimientos
+
+
+def liberar_reservas_vencidas(ahora=None):
+    """
+    Libera en un solo UPDATE las reservas activas de cotizaciones canceladas, de
+    transferencias expiradas y las vencidas. Un pago en revisión conserva su
+    reserva hasta que se resuelva, salvo que la transferencia haya sido rechazada.
+    """
+    ahora = ahora or timezone.now()
+    pago_en_revision = Q(cotizacion__estado='en_revision') & ~Q(cotizacion__transferencia__estado='rechazada')
+    return ReservaStock.objects.filter(estado='activa').filter(
+        Q(cotizacion__estado='cancelada')
+        | Q(cotizacion__transferencia__estado='expirada')
+        | (Q(fecha_expiracion__lte=ahora) & ~pago_en_revision)
+    ).update(estado='liberada', fecha_cierre=ahora)
+
+
+# ============================================
+# CAMBIOS DE ESTADO DE LA COTIZACIÓN
+# ============================================
+
+@receiver(post_init, sender=Cotizacion)
+def guardar_estado_original(sender, instance, **kwargs):
+    # __dict__ para no disparar consultas si el campo está diferido
+    instance._estado_original = instance.__dict__.get('estado')
+
+
+@receiver(post_save, sender=Cotizacion)
+def aplicar_reservas_por_estado(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Consume las reservas al pagarse la cotización y las libera al cancelarse"""
+    if raw or created or (update_fields is not None and 'estado' not in update_fields):
+        return
+    estado = instance.__dict__.get('estado')
+    if estado == instance._estado_original:
+        return
+    instance._estado_original = estado
+
+    if estado == 'pagada':
+        try:
+            consumir_reservas(instance)
+        except StockInsuficiente:
+            # El pago ya está hecho: se deja constancia y el stock se regulariza a mano
+            logger.exception(f'Cotización {instance.numero_cotizacion} pagada sin stock suficiente')
+    elif estado == 'cancelada':
+        liberar_reservas([instance.id])
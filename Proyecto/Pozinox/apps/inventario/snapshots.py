@@ -0,0 +1,104 @@
+"""
+Snapshots diarios de stock, consultas a una fecha y valorización del inventario
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.tienda.models import Producto
+from .models import MovimientoInventario, SnapshotStock
+
+# Variación neta de stock de un movimiento (ya viene con signo por el libro)
+DELTA_MOVIMIENTO = F('cantidad_nueva') - F('cantidad_anterior')
+
+
+def fin_del_dia(fecha):
+    """Instante (zona local) en que cierra el día indicado"""
+    siguiente = datetime.datetime.combine(fecha + datetime.timedelta(days=1), datetime.time.min)
+    return timezone.make_aware(siguiente)
+
+
+def generar_snapshots(fecha=None):
+    """
+    Guarda el stock de todos los productos al cierre de `fecha` (por defecto ayer).
+    El stock de cierre se obtiene restando al stock actual los movimientos posteriores,
+    en una sola consulta para que ambos valores sean coherentes entre sí.
+    """
+    fecha = fecha or timezone.localdate() - datetime.timedelta(days=1)
+    corte = fin_del_dia(fecha)
+
+    posteriores = (
+        MovimientoInventario.objects
+        .filter(producto=OuterRef('pk'), fecha_movimiento__gte=corte)
+        .values('producto')
+        .annotate(delta=Sum(DELTA_MOVIMIENTO))
+        .values('delta')
+    )
+    productos = Producto.objects.annotate(
+        delta=Coalesce(Subquery(posteriores), 0)
+    ).values_list('id', 'stock_actual', 'precio_por_unidad', 'delta')
+
+    snapshots = [
+        SnapshotStock(producto_id=producto_id, fecha=fecha, stock=stock - delta, precio_unitario=precio)
+        for producto_id, stock, precio, delta in productos
+    ]
+    SnapshotStock.objects.bulk_create(
+        snapshots, batch_size=1000, update_conflicts=True,
+        unique_fields=['producto', 'fecha'], update_fields=['stock', 'precio_unitario'],
+    )
+    return len(snapshots)
+
+
+def stock_en_fecha(producto, momento):
+    """Stock de un producto en un instante: snapshot más cercano + movimientos posteriores"""
+    snapshot = (
+        SnapshotStock.objects
+        .filter(producto=producto, fecha__lt=timezone.localdate(momento))
+        .order_by('-fecha')
+        .values_list('fecha', 'stock')
+        .first()
+    )
+    if snapshot is None:
+        # Sin snapshot previo se retrocede desde el stock actual
+        posteriores = MovimientoInventario.objects.filter(producto=producto, fecha_movimiento__gte=momento)
+        delta = posteriores.aggregate(delta=Sum(DELTA_MOVIMIENTO))['delta'] or 0
+        return Producto.objects.values_list('stock_actual', flat=True).get(id=producto.id) - delta
+
+    fecha, stock = snapshot
+    cola = MovimientoInventario.objects.filter(
+        producto=producto, fecha_movimiento__gte=fin_del_dia(fecha), fecha_movimiento__lt=momento,
+    )
+    return stock + (cola.aggregate(delta=Sum(DELTA_MOVIMIENTO))['delta'] or 0)
+
+
+def valorizacion_inventario(fecha=None):
+    """
+    Valorización por categoría (stock × precio unitario) en una sola consulta.
+    Sin fecha usa el stock actual; con fecha, los snapshots de ese día.
+    """
+    if fecha is None:
+        filas = Producto.objects.values(categoria_nombre=F('categoria__nombre')).annotate(
+            productos=Count('id'),
+            unidades=Sum('stock_actual'),
+            valor=Sum(F('stock_actual') * F('precio_por_unidad'), output_field=DecimalField()),
+        )
+    else:
+        filas = SnapshotStock.objects.filter(fecha=fecha).values(
+            categoria_nombre=F('producto__categoria__nombre')
+        ).annotate(
+            productos=Count('id'),
+            unidades=Sum('stock'),
+            valor=Sum(F('stock') * F('precio_unitario'), output_field=DecimalField()),
+        )
+    categorias = list(filas.order_by('categoria_nombre'))
+    for fila in categorias:
+        fila['valor'] = Decimal(fila['valor'] or 0).quantize(Decimal('0.01'))
+
+    return {
+        'categorias': categorias,
+        'total_unidades': sum(fila['unidades'] or 0 for fila in categorias),
+        'total_valor': sum((fila['valor'] for fila in categorias), Decimal('0')),
+    }
@@ -0,0 +1,111 @@
+"""
+Libro de inventario: única vía para modificar Producto.stock_actual
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from apps.tienda.kpis import invalidar_kpis
+from apps.tienda.models import Producto
+from .models import MovimientoInventario
+
+# Se emite al confirmar la transacción con los ids de los productos modificados
+stock_actualizado = Signal()
+
+
+class StockInsuficiente(Exception):
+    """El movimiento dejaría el stock de un producto en negativo"""
+
+    def __init__(self, producto, disponible, solicitado):
+        self.producto = producto
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(
+            f'Stock insuficiente para {producto}: disponible {disponible}, solicitado {solicitado}'
+        )
+
+
+def signo_movimiento(movimiento):
+    """+1 si el movimiento suma stock, -1 si lo descuenta"""
+    if movimiento.tipo_movimiento == 'entrada':
+        return 1
+    if movimiento.tipo_movimiento == 'salida':
+        return -1
+    # Ajustes, transferencias y devoluciones se orientan por su motivo
+    if movimiento.motivo_entrada and not movimiento.motivo_salida:
+        return 1
+    if movimiento.motivo_salida and not movimiento.motivo_entrada:
+        return -1
+    raise ValueError(
+        f'El movimiento de tipo "{movimiento.tipo_movimiento}" debe indicar un motivo de entrada o de salida'
+    )
+
+
+def _notificar(producto_ids):
+    invalidar_kpis()
+    stock_actualizado.send(sender=MovimientoInventario, producto_ids=producto_ids)
+
+
+def aplicar_movimientos(movimientos):
+    """
+    Aplica un lote de movimientos (sin guardar) en una sola transacción.
+    Bloquea los productos en orden de id, calcula cantidad_anterior/cantidad_nueva
+    y escribe con un UPDATE y un INSERT por lote. Si algún movimiento deja stock
+    negativo se lanza StockInsuficiente y no se aplica ninguno.
+    """
+    movimientos = list(movimientos)
+    if not movimientos:
+        return movimientos
+
+    producto_ids = sorted({m.producto_id for m in movimientos})
+    with transaction.atomic():
+        # El orden fijo de bloqueo evita interbloqueos entre lotes concurrentes
+        productos = {
+            p.id: p for p in Producto.objects.select_for_update()
+            .filter(id__in=producto_ids).order_by('id')
+            .only('id', 'codigo_producto', 'nombre', 'stock_actual')
+        }
+
+        for movimiento in movimientos:
+            producto = productos[movimiento.producto_id]
+            nuevo = producto.stock_actual + signo_movimiento(movimiento) * movimiento.cantidad
+            if nuevo < 0:
+                raise StockInsuficiente(producto, producto.stock_actual, movimiento.cantidad)
+            movimiento.cantidad_anterior = producto.stock_actual
+            movimiento.cantidad_nueva = nuevo
+            producto.stock_actual = nuevo
+
+        # bulk_update no aplica auto_now
+        ahora = timezone.now()
+        for producto in productos.values():
+            producto.fecha_actualizacion = ahora
+        Producto.objects.bulk_update(productos.values(), ['stock_actual', 'fecha_actualizacion'])
+        MovimientoInventario.objects.bulk_create(movimientos)
+
+        transaction.on_commit(lambda: _notificar(producto_ids))
+    return movimientos
+
+
+def registrar_movimiento(producto, tipo_movimiento, cantidad, usuario, **datos):
+    """Registra un único movimiento y actualiza el stock del producto recibido"""
+    movimiento = MovimientoInventario(
+        producto_id=producto.id, tipo_movimiento=tipo_movimiento,
+        cantidad=cantidad, usuario=usuario, **datos
+    )
+    aplicar_movimientos([movimiento])
+    producto.stock_actual = movimiento.cantidad_nueva
+    return movimiento
+
+
+def corregir_stock(producto, diferencia, usuario, observaciones=''):
+    """
+    Suma (o resta) `diferencia` al stock vigente con un ajuste. No fija un
+    valor, así que respeta los movimientos registrados entretanto.
+    """
+    if diferencia == 0:
+        return None
+    motivo = {'motivo_entrada' if diferencia > 0 else 'motivo_salida': 'ajuste_inventario'}
+    return registrar_movimiento(
+        producto, 'ajuste', abs(diferencia), usuario,
+        observaciones=observaciones, **motivo
+    )
@@ -1,3 +1,725 @@
-from django.test import TestCase
+import datetime
+import json
+import math
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.tienda.models import Cotizacion, DetalleCotizacion, Producto, TransferenciaBancaria
+from apps.tienda.tests import crear_producto
+from apps.usuarios.configuracion import obtener_configuracion
+from apps.usuarios.models import Notificacion, PerfilUsuario
+from .alertas import evaluar_alertas_stock
+from .anomalias import TIPO_HISTORIAL, detectar_movimientos_anomalos, marcar_atipicos
+from .escaneo import obtener_etiqueta, procesar_escaneos, ruta_etiqueta
+from .models import (
+    AlertaInventario, Compra, DetalleCompra, EscaneoStock, MovimientoInventario, ProductoProveedor, PronosticoDemanda, Proveedor,
+    ReservaStock, SnapshotStock,
+)
+from .pronostico import actualizar_estados, estado_inicial, pronosticar, recalcular_pronosticos
+from .recepcion import RecepcionInvalida, recibir_compra
+from .reposicion import crear_compras_sugeridas
+from .reservas import disponibles, liberar_reservas_vencidas, reservar_cotizacion
+from .snapshots import generar_snapshots, stock_en_fecha, valorizacion_inventario
+from .stock import StockInsuficiente, aplicar_movimientos, corregir_stock, registrar_movimiento, stock_actualizado
+
+
+def crear_proveedor(rut='76.000.000-1', **kwargs):
+    datos = {
+        'nombre': f'Proveedor {rut}', 'razon_social': f'Proveedor {rut} SpA', 'rut': rut,
+        'email': 'ventas@example.com', 'telefono': '+56222222222',
+        'direccion': 'Calle 1', 'comuna': 'Santiago', 'ciudad': 'Santiago',
+    }
+    datos.update(kwargs)
+    return Proveedor.objects.create(**datos)
+
+
+def movimiento(producto, tipo, cantidad, usuario, **datos):
+    return MovimientoInventario(
+        producto_id=producto.id, tipo_movimiento=tipo, cantidad=cantidad, usuario=usuario, **datos
+    )
+
+
+class LibroInventarioTests(TestCase):
+    """Aplicación de movimientos sobre Producto.stock_actual"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        self.plancha = crear_producto('P-001', stock_actual=10)
+        self.perfil = crear_producto('P-002', stock_actual=0)
+
+    def test_lote_en_consultas_constantes(self):
+        lote = [
+            movimiento(self.plancha, 'salida', 3, self.user, motivo_salida='venta'),
+            movimiento(self.perfil, 'entrada', 20, self.user, motivo_entrada='compra'),
+            movimiento(self.plancha, 'salida', 2, self.user, motivo_salida='venta'),
+            movimiento(self.perfil, 'devolucion', 5, self.user, motivo_salida='devolucion_proveedor'),
+        ]
+        # savepoint, bloqueo, UPDATE de productos, INSERT de movimientos, release
+        with self.assertNumQueries(5):
+            aplicar_movimientos(lote)
+
+        self.assertEqual(Producto.objects.get(id=self.plancha.id).stock_actual, 5)
+        self.assertEqual(Producto.objects.get(id=self.perfil.id).stock_actual, 15)
+        self.assertEqual(
+            [(m.cantidad_anterior, m.cantidad_nueva) for m in lote],
+            [(10, 7), (0, 20), (7, 5), (20, 15)],
+        )
+        self.assertEqual(MovimientoInventario.objects.count(), 4)
+
+    def test_stock_insuficiente_no_aplica_el_lote(self):
+        lote = [
+            movimiento(self.perfil, 'entrada', 5, self.user, motivo_entrada='compra'),
+            movimiento(self.plancha, 'salida', 11, self.user, motivo_salida='venta'),
+        ]
+        with self.assertRaises(StockInsuficiente):
+            aplicar_movimientos(lote)
+        self.assertEqual(Producto.objects.get(id=self.perfil.id).stock_actual, 0)
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+    def test_ajuste_registra_la_diferencia(self):
+        ajuste = corregir_stock(self.plancha, -6, self.user)
+        self.assertEqual(ajuste.motivo_salida, 'ajuste_inventario')
+        self.assertEqual((ajuste.cantidad, ajuste.cantidad_nueva), (6, 4))
+        self.assertIsNone(corregir_stock(self.plancha, 0, self.user))
+
+    def test_senal_al_confirmar(self):
+        recibidos = []
+        stock_actualizado.connect(lambda **kw: recibidos.append(kw['producto_ids']), weak=False,
+                                  dispatch_uid='test_senal_al_confirmar')
+        self.addCleanup(stock_actualizado.disconnect, dispatch_uid='test_senal_al_confirmar')
+        with self.captureOnCommitCallbacks(execute=True):
+            aplicar_movimientos([movimiento(self.plancha, 'salida', 1, self.user, motivo_salida='venta')])
+        self.assertEqual(recibidos, [[self.plancha.id]])
+
+    def test_editar_producto_no_sobrescribe_el_stock(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        datos = {
+            'nombre': 'Plancha editada', 'descripcion': 'x', 'codigo_producto': 'P-001',
+            'categoria': self.plancha.categoria_id, 'tipo_acero': 'inoxidable',
+            'precio_por_unidad': 1000, 'stock_actual': 12, 'stock_original': 10, 'stock_minimo': 5,
+            'unidad_medida': 'unidad', 'activo': 'on',
+        }
+        # Una venta registrada mientras el formulario estaba abierto
+        registrar_movimiento(self.plancha, 'salida', 3, self.user, motivo_salida='venta')
+        response = self.client.post(reverse('editar_producto', args=[self.plancha.id]), datos)
+        self.assertEqual(response.status_code, 302)
+        ajuste = MovimientoInventario.objects.get(producto=self.plancha, tipo_movimiento='ajuste')
+        self.assertEqual((ajuste.cantidad_anterior, ajuste.cantidad_nueva), (7, 9))
+
+        # Sin cambios en el campo no hay ajuste, aunque el stock vigente sea otro
+        datos.update(stock_actual=10, stock_original=10)
+        self.client.post(reverse('editar_producto', args=[self.plancha.id]), datos)
+        self.plancha.refresh_from_db()
+        self.assertEqual(self.plancha.stock_actual, 9)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento='ajuste').count(), 1)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class LibroInventarioConcurrenciaTests(TransactionTestCase):
+    """Ventas y recepciones simultáneas no pierden stock"""
+    databases = {'default', 'replica'}
+    HILOS = 8
+    LOTES_POR_HILO = 10
+
+    def test_no_se_pierde_stock(self):
+        user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        productos = [crear_producto(f'P-{i:03d}', stock_actual=1000) for i in range(3)]
+        errores = []
+
+        def trabajar(numero):
+            try:
+                for _ in range(self.LOTES_POR_HILO):
+                    # Cada lote toca los productos en distinto orden
+                    orden = productos if numero % 2 else list(reversed(productos))
+                    aplicar_movimientos(
+                        movimiento(p, 'entrada', 3, user, motivo_entrada='compra') if numero % 2
+                        else movimiento(p, 'salida', 2, user, motivo_salida='venta')
+                        for p in orden
+                    )
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar, args=(n,)) for n in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        lotes = self.HILOS // 2 * self.LOTES_POR_HILO
+        esperado = 1000 + lotes * 3 - lotes * 2
+        for producto in productos:
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock_actual, esperado)
+            # Cada movimiento parte de donde terminó el anterior
+            cadena = MovimientoInventario.objects.filter(producto=producto).order_by('id')
+            anterior = 1000
+            for mov in cadena:
+                self.assertEqual(mov.cantidad_anterior, anterior)
+                anterior = mov.cantidad_nueva
+            self.assertEqual(anterior, esperado)
+
+
+class SnapshotsStockTests(TestCase):
+    """Snapshots diarios, stock a una fecha y valorización"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        self.producto = crear_producto('P-001', stock_actual=10, precio_por_unidad=1500)
+        hoy = timezone.localdate()
+        self.dia1 = hoy - datetime.timedelta(days=3)
+        self.dia2 = hoy - datetime.timedelta(days=2)
+        # +5 el día 1, -4 el día 2 y -1 hoy: 10 -> 15 -> 11 -> 10
+        self._registrar('entrada', 5, self.dia1, motivo_entrada='compra')
+        self._registrar('salida', 4, self.dia2, motivo_salida='venta')
+        self._registrar('salida', 1, None, motivo_salida='venta')
+
+    def _registrar(self, tipo, cantidad, dia, **datos):
+        mov, = aplicar_movimientos([movimiento(self.producto, tipo, cantidad, self.user, **datos)])
+        if dia:
+            momento = self._momento(dia, 12)
+            MovimientoInventario.objects.filter(id=mov.id).update(fecha_movimiento=momento)
+
+    def _momento(self, dia, hora):
+        return timezone.make_aware(datetime.datetime.combine(dia, datetime.time(hora)))
+
+    def test_snapshot_al_cierre_del_dia(self):
+        with self.assertNumQueries(2):
+            generar_snapshots(self.dia1)
+        self.assertEqual(SnapshotStock.objects.get(producto=self.producto, fecha=self.dia1).stock, 15)
+
+    def test_stock_en_fecha_con_y_sin_snapshot(self):
+        self.assertEqual(stock_en_fecha(self.producto, self._momento(self.dia1, 6)), 10)
+        generar_snapshots(self.dia1)
+        with self.assertNumQueries(2):
+            self.assertEqual(stock_en_fecha(self.producto, self._momento(self.dia2, 18)), 11)
+
+    def test_valorizacion_en_una_consulta(self):
+        crear_producto('P-002', stock_actual=4, precio_por_unidad=250)
+        with self.assertNumQueries(1):
+            reporte = valorizacion_inventario()
+        self.assertEqual(reporte['total_unidades'], 14)
+        self.assertEqual(reporte['total_valor'], Decimal('16000.00'))
+
+        generar_snapshots(self.dia1)
+        with self.assertNumQueries(1):
+            reporte = valorizacion_inventario(self.dia1)
+        self.assertEqual(reporte['total_valor'], Decimal('23500.00'))
+
+    def test_comando_es_idempotente(self):
+        for _ in range(2):
+            call_command('generar_snapshots_stock', fecha=self.dia2.isoformat(), stdout=StringIO())
+        self.assertEqual(SnapshotStock.objects.get(fecha=self.dia2).stock, 11)
+
+    def test_reporte_renderiza(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('reporte_valorizacion'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Planchas')
+
+
+class AlertasStockTests(TestCase):
+    """Alertas de stock generadas a partir de los cambios del libro de inventario"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        PerfilUsuario.objects.filter(user=self.user).update(tipo_usuario='inventario')
+        User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.producto = crear_producto('P-001', stock_actual=10, stock_minimo=5)
+
+    def _vender(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            aplicar_movimientos([movimiento(self.producto, 'salida', cantidad, self.user, motivo_salida='venta')])
+
+    def test_alertas_sin_duplicados(self):
+        self._vender(6)  # 4: stock bajo
+        self._vender(1)  # 3: sigue bajo, no se repite
+        self._vender(1)  # 2: crítico
+        self._vender(2)  # 0: sin stock
+        self.assertEqual(
+            list(AlertaInventario.objects.order_by('id').values_list('tipo_alerta', flat=True)),
+            ['stock_bajo', 'stock_critico', 'sin_stock'],
+        )
+        # Solo el usuario de inventario recibe notificaciones
+        self.assertEqual(Notificacion.objects.filter(usuario=self.user).count(), 3)
+        self.assertEqual(Notificacion.objects.count(), 3)
+
+    def test_evaluacion_en_consultas_constantes(self):
+        ids = [crear_producto(f'P-1{i:02d}', stock_actual=1).id for i in range(5)]
+        # productos, alertas abiertas, INSERT alertas, destinatarios, INSERT notificaciones;
+        # la configuración ya está en memoria del proceso
+        obtener_configuracion()
+        with self.assertNumQueries(5):
+            alertas = evaluar_alertas_stock(ids)
+        self.assertEqual(len(alertas), 5)
+        with self.assertNumQueries(2):
+            self.assertEqual(evaluar_alertas_stock(ids), [])
+
+
+class MovimientosAnomalosTests(TestCase):
+    """Detección vectorizada de movimientos atípicos"""
+
+    def _historial(self, filas):
+        return np.array(filas, dtype=TIPO_HISTORIAL)
+
+    def test_marca_solo_atipicos_recientes_con_historial_suficiente(self):
+        filas = [(i, 1, -(4 + i % 3), False) for i in range(30)]
+        filas += [(100, 1, -200, True), (101, 1, -5, True), (102, 1, 40, True)]
+        # Producto 2 con muy pocos movimientos para juzgar
+        filas += [(200 + i, 2, -3, False) for i in range(4)] + [(300, 2, -90, True)]
+        historial = self._historial(filas)
+        self.assertEqual(historial['id'][marcar_atipicos(historial)].tolist(), [100])
+
+    def test_miles_de_productos_en_segundos(self):
+        rng = np.random.default_rng(7)
+        filas = 1_000_000
+        historial = np.zeros(filas, dtype=TIPO_HISTORIAL)
+        historial['id'] = np.arange(filas)
+        historial['producto_id'] = rng.integers(0, 3000, filas)
+        historial['delta'] = -rng.poisson(5, filas) - 1
+        historial['reciente'] = rng.random(filas) < 0.01
+        inicio = time.perf_counter()
+        marcar_atipicos(historial)
+        self.assertLess(time.perf_counter() - inicio, 5)
+
+    def test_crea_alerta_una_sola_vez(self):
+        user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        producto = crear_producto('P-001', stock_actual=500)
+        aplicar_movimientos(
+            movimiento(producto, 'salida', 2 + i % 2, user, motivo_salida='venta') for i in range(12)
+        )
+        MovimientoInventario.objects.update(fecha_movimiento=timezone.now() - datetime.timedelta(days=10))
+        perdida, = aplicar_movimientos([movimiento(producto, 'salida', 80, user, motivo_salida='perdida')])
+
+        alertas = detectar_movimientos_anomalos()
+        self.assertEqual([a.movimiento_id for a in alertas], [perdida.id])
+        self.assertEqual(alertas[0].tipo_alerta, 'movimiento_anomalo')
+        call_command('detectar_movimientos_anomalos', stdout=StringIO())
+        self.assertEqual(AlertaInventario.objects.filter(tipo_alerta='movimiento_anomalo').count(), 1)
+
+
+class PronosticoDemandaTests(TestCase):
+    """Pronóstico vectorizado, recálculo incremental y punto de reorden"""
+
+    def test_continua_vs_intermitente(self):
+        demanda = np.zeros((2, 120))
+        demanda[0] = 4
+        demanda[1, ::7] = 14
+        estado = actualizar_estados(demanda, np.zeros(2, dtype=int), estado_inicial(2))
+        tasa, _, croston = pronosticar(estado)
+        self.assertEqual(croston.tolist(), [False, True])
+        self.assertAlmostEqual(tasa[0], 4, places=2)
+        self.assertAlmostEqual(tasa[1], 0.95 * 14 / 7, places=1)
+
+    def test_incremental_equivale_a_recalcular(self):
+        rng = np.random.default_rng(3)
+        demanda = rng.poisson(2, (50, 90)) * (rng.random((50, 90)) < 0.4)
+        completo = actualizar_estados(demanda, np.zeros(50, dtype=int), estado_inicial(50))
+        parcial = actualizar_estados(demanda[:, :60], np.zeros(50, dtype=int), estado_inicial(50))
+        parcial = actualizar_estados(demanda[:, 60:], np.zeros(50, dtype=int), parcial)
+        for clave in completo:
+            np.testing.assert_allclose(completo[clave], parcial[clave])
+
+    def test_punto_de_reorden_con_plazo_del_proveedor(self):
+        user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        producto = crear_producto('P-001', stock_minimo=1)
+        proveedor = crear_proveedor(plazo_entrega_dias=10)
+        compra = Compra.objects.create(proveedor=proveedor, fecha_esperada=timezone.localdate(), usuario=user)
+        DetalleCompra.objects.create(compra=compra, producto=producto, cantidad_solicitada=10, precio_unitario=500)
+
+        hoy = timezone.localdate()
+        for dias_atras in range(1, 31):
+            cotizacion = Cotizacion.objects.create(usuario=user, estado='pagada')
+            DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=3, precio_unitario=1000)
+            Cotizacion.objects.filter(id=cotizacion.id).update(
+                fecha_pago=timezone.now() - datetime.timedelta(days=dias_atras)
+            )
+
+        pronostico, = recalcular_pronosticos(aplicar_stock_minimo=True)
+        self.assertEqual(pronostico.plazo_entrega_dias, 10)
+        self.assertEqual(pronostico.metodo, 'ses')
+        self.assertEqual(pronostico.dias_con_demanda, 30)
+        self.assertGreaterEqual(pronostico.punto_reorden, math.ceil(pronostico.demanda_diaria * 10))
+        self.assertEqual(Producto.objects.get(id=producto.id).stock_minimo, pronostico.punto_reorden)
+
+        # La noche siguiente solo se incorpora el día nuevo
+        recalcular_pronosticos(hasta=hoy)
+        guardado = PronosticoDemanda.objects.get(producto=producto)
+        self.assertEqual(guardado.fecha_hasta, hoy)
+        self.assertEqual(guardado.dias_observados, 31)
+
+    def test_cotizacion_pagada_despues_de_procesar_su_dia(self):
+        user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        producto = crear_producto('P-001')
+        hoy = timezone.localdate()
+        cotizacion = Cotizacion.objects.create(usuario=user, estado='finalizada')
+        DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=5, precio_unitario=1000)
+        Cotizacion.objects.filter(id=cotizacion.id).update(
+            fecha_finalizacion=timezone.now() - datetime.timedelta(days=3)
+        )
+        recalcular_pronosticos(hasta=hoy - datetime.timedelta(days=1))
+
+        # La transferencia se confirma hoy: cuenta como venta de hoy
+        cotizacion.refresh_from_db()
+        cotizacion.estado = 'pagada'
+        cotizacion.save()
+        pronostico, = recalcular_pronosticos(hasta=hoy)
+        self.assertEqual(pronostico.dias_con_demanda, 1)
+
+
+class PlanificadorReposicionTests(TestCase):
+    """Órdenes de compra sugeridas por proveedor"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('compras', 'compras@example.com', 'clave-segura-123')
+        self.sur = crear_proveedor('76.000.000-1', plazo_entrega_dias=10)
+        self.norte = crear_proveedor('77.000.000-2')
+
+    def _producto(self, codigo, proveedor, stock, minimo=5, precio=1000, cantidad_minima=1, preferido=True):
+        producto = crear_producto(codigo, stock_actual=stock, stock_minimo=minimo)
+        ProductoProveedor.objects.create(
+            producto=producto, proveedor=proveedor, preferido=preferido,
+            precio_compra=precio, cantidad_minima=cantidad_minima,
+        )
+        return producto
+
+    def test_agrupa_por_proveedor_en_consultas_acotadas(self):
+        for i in range(6):
+            self._producto(f'S-{i}', self.sur, stock=1)
+        self._producto('N-1', self.norte, stock=0, cantidad_minima=50)
+        self._producto('N-2', self.norte, stock=10)
+        crear_producto('X-1', stock_actual=0)  # sin proveedor
+
+        # savepoint, productos, numeración, INSERT compras, INSERT detalles, release
+        with self.assertNumQueries(6):
+            compras = crear_compras_sugeridas(self.user)
+
+        self.assertEqual(len(compras), 2)
+        sur = Compra.objects.get(proveedor=self.sur)
+        self.assertEqual(sur.detalles.count(), 6)
+        self.assertEqual(sur.fecha_esperada, timezone.localdate() + datetime.timedelta(days=10))
+        self.assertEqual(sur.total, Decimal('28560.00'))
+        self.assertEqual(
+            list(Compra.objects.get(proveedor=self.norte).detalles.values_list('cantidad_solicitada', flat=True)),
+            [50],
+        )
+        # Lo ya pedido cuenta como stock en camino
+        self.assertEqual(crear_compras_sugeridas(self.user), [])
+
+    def test_cantidad_economica_con_pronostico(self):
+        producto = self._producto('S-1', self.sur, stock=3, precio=1000)
+        PronosticoDemanda.objects.create(
+            producto=producto, demanda_diaria=2, punto_reorden=20, fecha_hasta=timezone.localdate(),
+        )
+        crear_compras_sugeridas(self.user)
+        # EOQ = sqrt(2 × 730 × 15000 / (1000 × 0,25))
+        self.assertEqual(DetalleCompra.objects.get(producto=producto).cantidad_solicitada, 296)
+
+
+class RecepcionComprasTests(TestCase):
+    """Recepción parcial y total de órdenes de compra"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        self.proveedor = crear_proveedor()
+
+    def _compra(self, lineas, solicitada=10):
+        compra = Compra.objects.create(
+            proveedor=self.proveedor, fecha_esperada=timezone.localdate(), usuario=self.user, estado='ordenada',
+        )
+        productos = [crear_producto(f'C{compra.id}-{i}', stock_actual=0) for i in range(lineas)]
+        for producto in productos:
+            DetalleCompra.objects.create(
+                compra=compra, producto=producto, cantidad_solicitada=solicitada, precio_unitario=500,
+            )
+        return compra, productos
+
+    def test_recepcion_parcial_y_total(self):
+        compra, (plancha, perfil) = self._compra(2)
+        compra = recibir_compra(compra.id, {plancha.id: 10, perfil.id: 4}, self.user, 'GD-100')
+        self.assertEqual(compra.estado, 'parcialmente_recibida')
+        self.assertEqual(Producto.objects.get(id=perfil.id).stock_actual, 4)
+        entrada = MovimientoInventario.objects.get(producto=perfil)
+        self.assertEqual((entrada.motivo_entrada, entrada.numero_documento), ('compra', 'GD-100'))
+
+        compra = recibir_compra(compra.id, {perfil.id: 6}, self.user)
+        self.assertEqual(compra.estado, 'recibida')
+        self.assertEqual(compra.fecha_recibida, timezone.localdate())
+        self.assertEqual(
+            list(DetalleCompra.objects.filter(compra=compra).values_list('cantidad_recibida', flat=True)), [10, 10]
+        )
+
+    def test_consultas_constantes_por_recepcion(self):
+        consultas = []
+        for lineas in (2, 15):
+            compra, productos = self._compra(lineas)
+            with CaptureQueriesContext(connection) as contexto:
+                recibir_compra(compra.id, {p.id: 5 for p in productos}, self.user)
+            consultas.append(len(contexto.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_exceso_no_modifica_nada(self):
+        compra, (plancha,) = self._compra(1)
+        with self.assertRaises(RecepcionInvalida):
+            recibir_compra(compra.id, {plancha.id: 11}, self.user)
+        self.assertEqual(DetalleCompra.objects.get(compra=compra).cantidad_recibida, 0)
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+    def test_endpoint_de_recepcion(self):
+        compra, (plancha,) = self._compra(1)
+        PerfilUsuario.objects.filter(user=self.user).update(tipo_usuario='inventario')
+        self.client.force_login(self.user)
+        url = reverse('recibir_compra_api', args=[compra.id])
+
+        response = self.client.post(url, {'lineas': [{'producto': plancha.id, 'cantidad': 20}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, {'lineas': [{'producto': 'abc', 'cantidad': 1}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        # En PostgreSQL un documento más largo que la columna sería un DataError
+        cuerpo = {'lineas': [{'producto': plancha.id, 'cantidad': 1}], 'numero_documento': 'F' * 51}
+        response = self.client.post(url, cuerpo, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+        # El mismo producto como texto y como número se suma en una sola línea
+        lineas = [{'producto': str(plancha.id), 'cantidad': 4}, {'producto': plancha.id, 'cantidad': 6}]
+        response = self.client.post(url, {'lineas': lineas}, content_type='application/json')
+        self.assertEqual(response.json()['estado'], 'recibida')
+        self.assertEqual(Producto.objects.get(id=plancha.id).stock_actual, 10)
+
+
+class EscaneoStockTests(TestCase):
+    """Etiquetas QR e ingesta de escaneos por lotes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bodega', 'bodega@example.com', 'clave-segura-123')
+        PerfilUsuario.objects.filter(user=self.user).update(tipo_usuario='inventario')
+        self.productos = [crear_producto(f'P-00{i}', stock_actual=500) for i in range(3)]
+
+    def _lote(self, cantidad, prefijo='a'):
+        return [
+            {'id': f'{prefijo}-{i}', 'codigo': self.productos[i % 3].codigo_producto, 'delta': -1,
+             'fecha': '2026-10-18T10:00:00'}
+            for i in range(cantidad)
+        ]
+
+    def test_lote_coalescido_en_consultas_constantes(self):
+        consultas = []
+        # 90 lecturas caben en un solo INSERT incluso con el límite de parámetros de SQLite
+        for cantidad, prefijo in ((9, 'a'), (90, 'b')):
+            with CaptureQueriesContext(connection) as contexto:
+                procesar_escaneos(self._lote(cantidad, prefijo), self.user)
+            consultas.append(len(contexto.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+        # Un movimiento por producto y lote
+        self.assertEqual(MovimientoInventario.objects.count(), 6)
+        self.assertEqual(Producto.objects.get(id=self.productos[0].id).stock_actual, 500 - 3 - 30)
+
+    def test_reintentos_y_codigos_desconocidos(self):
+        lote = self._lote(6) + [{'id': 'x-1', 'codigo': 'NO-EXISTE', 'delta': 1}]
+        primero = procesar_escaneos(lote, self.user)
+        self.assertEqual((primero['aplicados'], primero['desconocidos']), (6, ['NO-EXISTE']))
+        self.assertEqual(primero['stock']['P-000'], 498)
+
+        reintento = procesar_escaneos(lote, self.user)
+        self.assertEqual(reintento['aplicados'], 0)
+        self.assertEqual(len(reintento['duplicados']), 6)
+        self.assertEqual(Producto.objects.get(id=self.productos[0].id).stock_actual, 498)
+        self.assertEqual(EscaneoStock.objects.filter(movimiento__isnull=False).count(), 6)
+
+    def test_reenvio_simultaneo_queda_como_duplicado(self):
+        lote = self._lote(3)
+        procesar_escaneos(lote[:1], self.user)
+        # Otro reenvío guardó 'a-0' después de que este consultara los ids recibidos
+        with mock.patch('apps.inventario.escaneo.ids_recibidos', side_effect=[set(), {'a-0'}]):
+            resultado = procesar_escaneos(lote, self.user)
+        self.assertEqual((resultado['aplicados'], resultado['duplicados']), (2, ['a-0']))
+        self.assertEqual(Producto.objects.get(id=self.productos[0].id).stock_actual, 499)
+        self.assertEqual(EscaneoStock.objects.count(), 3)
+
+    def test_api_ndjson(self):
+        self.client.force_login(self.user)
+        cuerpo = '\n'.join(json.dumps(escaneo) for escaneo in self._lote(3))
+        response = self.client.post(reverse('escaneos_api'), cuerpo, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['aplicados'], 3)
+
+        response = self.client.post(reverse('escaneos_api'), {'escaneos': [{'codigo': 'P-000'}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_etiqueta_se_genera_una_vez(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            with mock.patch('apps.inventario.escaneo.generar_etiqueta_svg', return_value='<svg/>') as generar:
+                self.assertEqual(obtener_etiqueta('P-000'), obtener_etiqueta('P-000'))
+            self.assertEqual(generar.call_count, 1)
+
+            self.client.force_login(self.user)
+            response = self.client.get(reverse('etiqueta_qr', args=[self.productos[1].id]))
+            self.assertEqual(response['Content-Type'], 'image/svg+xml')
+            self.assertIn(b'<svg', b''.join(response.streaming_content))
+        # Códigos que se confunden al pasarlos a slug tienen etiquetas distintas
+        self.assertNotEqual(ruta_etiqueta('TUB-1.5'), ruta_etiqueta('TUB-15'))
+        self.assertNotEqual(ruta_etiqueta('PL 10'), ruta_etiqueta('pl-10'))
+
+
+def crear_cotizacion(usuario, lineas, numero):
+    cotizacion = Cotizacion.objects.create(usuario=usuario, numero_cotizacion=numero)
+    for producto, cantidad in lineas:
+        DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=cantidad, precio_unitario=1000)
+    return Cotizacion.objects.get(id=cotizacion.id)
+
+
+class ReservaStockTests(TestCase):
+    """Reservas de stock de cotizaciones finalizadas"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.plancha = crear_producto('P-001', stock_actual=10)
+        self.perfil = crear_producto('P-002', stock_actual=5)
+
+    def test_finalizar_reserva_y_bloquea_sobreventa(self):
+        self.client.force_login(self.cliente)
+        primera = crear_cotizacion(self.cliente, [(self.plancha, 7), (self.perfil, 1)], 'COT-1')
+        self.client.post(reverse('finalizar_cotizacion', args=[primera.id]))
+        self.assertEqual(disponibles([self.plancha.id, self.perfil.id]), {self.plancha.id: 3, self.perfil.id: 4})
+
+        # La segunda cotización no alcanza y no reserva ninguna de sus líneas
+        segunda = crear_cotizacion(self.cliente, [(self.perfil, 1), (self.plancha, 4)], 'COT-2')
+        response = self.client.post(reverse('finalizar_cotizacion', args=[segunda.id]))
+        self.assertRedirects(response, reverse('detalle_cotizacion', args=[segunda.id]))
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.estado, 'borrador')
+        self.assertFalse(ReservaStock.objects.filter(cotizacion=segunda).exists())
+
+    def test_finalizar_dos_veces_reserva_una_vez(self):
+        self.client.force_login(self.cliente)
+        cotizacion = crear_cotizacion(self.cliente, [(self.plancha, 2)], 'COT-1')
+        self.assertEqual(self.client.get(reverse('finalizar_cotizacion', args=[cotizacion.id])).status_code, 405)
+        self.client.post(reverse('finalizar_cotizacion', args=[cotizacion.id]))
+        self.client.post(reverse('finalizar_cotizacion', args=[cotizacion.id]))
+        self.assertEqual(ReservaStock.objects.filter(cotizacion=cotizacion).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            reservar_cotizacion(cotizacion)
+
+    def test_catalogo_y_cotizacion_usan_el_disponible(self):
+        reservar_cotizacion(crear_cotizacion(self.cliente, [(self.plancha, 7)], 'COT-1'))
+        response = self.client.get(reverse('detalle_producto', args=[self.plancha.id]))
+        self.assertContains(response, 'Stock: 3 ')
+        response = self.client.get(reverse('productos'))
+        self.assertContains(response, 'Stock: 3<')
+
+        self.client.force_login(self.cliente)
+        borrador = Cotizacion.objects.create(usuario=self.cliente)
+        self.client.post(
+            reverse('agregar_producto_cotizacion', args=[borrador.id]), {'producto_id': self.plancha.id, 'cantidad': 4},
+        )
+        self.assertFalse(borrador.detalles.exists())
+        self.client.post(
+            reverse('agregar_producto_cotizacion', args=[borrador.id]), {'producto_id': self.plancha.id, 'cantidad': 3},
+        )
+        self.assertEqual(borrador.detalles.get().cantidad, 3)
+
+        # Subir la cantidad de la línea tampoco supera el disponible
+        detalle = borrador.detalles.get()
+        url = reverse('actualizar_cantidad_producto', args=[detalle.id])
+        response = self.client.post(url, {'cantidad': 10000})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(borrador.detalles.get().cantidad, 3)
+        self.assertEqual(self.client.post(url, {'cantidad': 2}).status_code, 200)
+
+    def test_pago_consume_reserva_una_vez(self):
+        cotizacion = crear_cotizacion(self.cliente, [(self.plancha, 4)], 'COT-1')
+        reservar_cotizacion(cotizacion)
+        transferencia = TransferenciaBancaria.objects.create(cotizacion=cotizacion, monto_transferencia=4760)
+        transferencia.aprobar(self.cliente)
+        cotizacion.refresh_from_db()
+        cotizacion.save()
+
+        self.plancha.refresh_from_db()
+        self.assertEqual(self.plancha.stock_actual, 6)
+        self.assertEqual(disponibles([self.plancha.id]), {self.plancha.id: 6})
+        self.assertEqual(ReservaStock.objects.get().estado, 'consumida')
+        venta = MovimientoInventario.objects.get(motivo_salida='venta')
+        self.assertEqual((venta.numero_documento, venta.cantidad_nueva), ('COT-1', 6))
+
+    def test_cancelar_libera_reserva(self):
+        cotizacion = crear_cotizacion(self.cliente, [(self.plancha, 10)], 'COT-1')
+        reservar_cotizacion(cotizacion)
+        cotizacion.estado = 'cancelada'
+        cotizacion.save()
+        self.assertEqual(ReservaStock.objects.get().estado, 'liberada')
+        self.assertEqual(disponibles([self.plancha.id]), {self.plancha.id: 10})
+
+    def test_barrido_libera_vencidas_en_un_update(self):
+        vencida, en_revision, expirada, vigente = [
+            crear_cotizacion(self.cliente, [(self.perfil, 1)], f'COT-{i}') for i in range(4)
+        ]
+        for cotizacion in (vencida, en_revision, expirada, vigente):
+            reservar_cotizacion(cotizacion)
+        Cotizacion.objects.filter(id=en_revision.id).update(estado='en_revision')
+        TransferenciaBancaria.objects.create(cotizacion=expirada, monto_transferencia=1190, estado='expirada')
+        ReservaStock.objects.exclude(cotizacion=vigente).update(
+            fecha_expiracion=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(liberar_reservas_vencidas(), 2)
+        activas = set(ReservaStock.objects.filter(estado='activa').values_list('cotizacion_id', flat=True))
+        self.assertEqual(activas, {en_revision.id, vigente.id})
+
+        out = StringIO()
+        call_command('liberar_reservas_vencidas', stdout=out)
+        self.assertIn('0 reservas', out.getvalue())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ReservaStockConcurrenciaTests(TransactionTestCase):
+    """Finalizaciones simultáneas no reservan más que el stock"""
+    databases = {'default', 'replica'}
+    HILOS = 8
+
+    def test_no_se_sobrerreserva(self):
+        cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        producto = crear_producto('P-001', stock_actual=5)
+        cotizaciones = [crear_cotizacion(cliente, [(producto, 2)], f'COT-{i}') for i in range(self.HILOS)]
+        rechazadas = []
+
+        def finalizar(cotizacion):
+            try:
+                reservar_cotizacion(cotizacion)
+            except StockInsuficiente:
+                rechazadas.append(cotizacion.id)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=finalizar, args=(c,)) for c in cotizaciones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(ReservaStock.objects.filter(estado='activa').count(), 2)
+        self.assertEqual(len(rechazadas), self.HILOS - 2)
+        self.assertEqual(disponibles([producto.id]), {producto.id: 1})
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('valorizacion/', views.reporte_valorizacion, name='reporte_valorizacion'),
+    path('api/compras/<int:compra_id>/recibir/', views.recibir_compra_api, name='recibir_compra_api'),
+    path('api/escaneos/', views.escaneos_api, name='escaneos_api'),
+    path('productos/<int:producto_id>/etiqueta-qr/', views.etiqueta_qr, name='etiqueta_qr'),
+]
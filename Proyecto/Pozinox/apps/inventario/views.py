@@ -1,8 +1,34 @@
+import datetime
+import json
 import random
 from django.core.mail import send_mail
 from django.conf import settings
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.files.storage import default_storage
+from django.http import FileResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
 from apps.tienda.models import Producto, CategoriaAcero
+from .escaneo import LoteEscaneoInvalido, obtener_etiqueta, procesar_escaneos
+from .models import Compra
+from .recepcion import RecepcionInvalida, recibir_compra
+from .stock import StockInsuficiente
+from .snapshots import valorizacion_inventario
+
+
+def es_superusuario(user):
+    return user.is_superuser
+
+
+def es_personal_inventario(user):
+    """Superusuarios, administradores y encargados de inventario"""
+    if user.is_superuser:
+        return True
+    perfil = getattr(user, 'perfil', None)
+    return perfil is not None and perfil.tipo_usuario in ('administrador', 'inventario')
+
 
 def home(request):
     # ...tu lógica actual...
@@ -79,4 +105,90 @@ Mensaje: {mensaje}
             'error_suma': error_suma,
             'success': success,
         }
-        return render(request, 'tienda/home.html', context)
\ No newline at end of file
+        return render(request, 'tienda/home.html', context)
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def reporte_valorizacion(request):
+    """Valorización del inventario actual o al cierre de una fecha"""
+    fecha = None
+    if request.GET.get('fecha'):
+        try:
+            fecha = datetime.date.fromisoformat(request.GET['fecha'])
+        except ValueError:
+            messages.error(request, 'La fecha debe tener el formato AAAA-MM-DD.')
+
+    context = valorizacion_inventario(fecha)
+    context['fecha'] = fecha
+    return render(request, 'inventario/valorizacion.html', context)
+
+
+@login_required
+@user_passes_test(es_personal_inventario)
+@require_POST
+def recibir_compra_api(request, compra_id):
+    """
+    Recepción de una orden de compra. Cuerpo JSON:
+    {"lineas": [{"producto": id, "cantidad": n}, ...], "numero_documento": "..."}
+    """
+    try:
+        datos = json.loads(request.body)
+        cantidades = {}
+        for linea in datos['lineas']:
+            # Entero antes de sumar: "5" y 5 son el mismo producto
+            producto_id = int(linea['producto'])
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + int(linea['cantidad'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Formato de recepción inválido'}, status=400)
+
+    try:
+        compra = recibir_compra(compra_id, cantidades, request.user, datos.get('numero_documento') or '')
+    except Compra.DoesNotExist:
+        return JsonResponse({'error': 'Orden de compra no encontrada'}, status=404)
+    except RecepcionInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'numero_orden': compra.numero_orden,
+        'estado': compra.estado,
+        'lineas_recibidas': len(cantidades),
+    })
+
+
+@login_required
+@user_passes_test(es_personal_inventario)
+@cache_control(private=True, max_age=86400)
+def etiqueta_qr(request, producto_id):
+    """Etiqueta QR del producto (se genera una vez y queda guardada)"""
+    producto = get_object_or_404(Producto.objects.only('codigo_producto'), id=producto_id)
+    ruta = obtener_etiqueta(producto.codigo_producto)
+    return FileResponse(default_storage.open(ruta, 'rb'), content_type='image/svg+xml')
+
+
+@login_required
+@user_passes_test(es_personal_inventario)
+@require_POST
+def escaneos_api(request):
+    """
+    Lote de escaneos de un dispositivo de bodega. Acepta JSON
+    {"escaneos": [{"id": "...", "codigo": "...", "delta": -1, "fecha": "ISO 8601"}]}
+    o NDJSON (una lectura por línea) con Content-Type application/x-ndjson.
+    """
+    try:
+        if request.content_type == 'application/x-ndjson':
+            escaneos = [json.loads(linea) for linea in request.body.splitlines() if linea.strip()]
+        else:
+            escaneos = json.loads(request.body)['escaneos']
+        if not isinstance(escaneos, list):
+            raise ValueError
+        resultado = procesar_escaneos(escaneos, request.user)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Formato de escaneos inválido'}, status=400)
+    except LoteEscaneoInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except StockInsuficiente as e:
+        return JsonResponse({'error': str(e)}, status=409)
+
+    return JsonResponse({'success': True, **resultado})
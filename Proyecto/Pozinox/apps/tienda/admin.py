@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Producto, CategoriaAcero, Cliente, Pedido, DetallePedido, Cotizacion, DetalleCotizacion, TransferenciaBancaria
+from django.shortcuts import redirect
+from django.urls import reverse
+from .models import Producto, CategoriaAcero, Cliente, Pedido, DetallePedido, Cotizacion, DetalleCotizacion, ExportacionProgramada, ReglaDescuento, TransferenciaBancaria
 
 
 @admin.register(CategoriaAcero)
@@ -18,6 +20,8 @@ class ProductoAdmin(admin.ModelAdmin):
     list_filter = ['categoria', 'tipo_acero', 'activo']
     search_fields = ['nombre', 'codigo_producto', 'descripcion']
     ordering = ['categoria', 'nombre']
+    # El stock solo cambia a través de movimientos de inventario
+    readonly_fields = ['stock_actual']
     
     fieldsets = (
         ('Información Básica', {
@@ -84,6 +88,12 @@ class CotizacionAdmin(admin.ModelAdmin):
     search_fields = ['numero_cotizacion', 'usuario__username', 'usuario__email']
     ordering = ['-fecha_creacion']
     readonly_fields = ['numero_cotizacion', 'fecha_creacion', 'fecha_actualizacion']
+    actions = ['descargar_pdfs']
+    
+    @admin.action(description='Descargar PDF de las cotizaciones (ZIP)')
+    def descargar_pdfs(self, request, queryset):
+        ids = ','.join(str(pk) for pk in queryset.values_list('id', flat=True))
+        return redirect(f"{reverse('cotizaciones_pdf_lote')}?ids={ids}")
     
     fieldsets = (
         ('Información Básica', {
@@ -114,12 +124,22 @@ class DetalleCotizacionInline(admin.TabularInline):
 @admin.register(DetalleCotizacion)
 class DetalleCotizacionAdmin(admin.ModelAdmin):
     """Administración de detalles de cotizaciones"""
-    list_display = ['cotizacion', 'producto', 'cantidad', 'precio_unitario', 'subtotal']
+    list_display = ['cotizacion', 'producto', 'cantidad', 'precio_unitario', 'descuento', 'subtotal']
     list_filter = ['cotizacion__estado']
     search_fields = ['cotizacion__numero_cotizacion', 'producto__nombre']
     ordering = ['-cotizacion__fecha_creacion']
 
 
+@admin.register(ReglaDescuento)
+class ReglaDescuentoAdmin(admin.ModelAdmin):
+    """Administración de reglas de descuento"""
+    list_display = ['nombre', 'tipo_cliente', 'producto', 'categoria', 'cantidad_minima', 'porcentaje', 'activa']
+    list_filter = ['activa', 'tipo_cliente', 'categoria']
+    search_fields = ['nombre', 'producto__nombre', 'producto__codigo_producto']
+    autocomplete_fields = ['producto']
+    ordering = ['tipo_cliente', 'cantidad_minima']
+
+
 @admin.register(TransferenciaBancaria)
 class TransferenciaBancariaAdmin(admin.ModelAdmin):
     """Administración de transferencias bancarias"""
@@ -154,3 +174,22 @@ class TransferenciaBancariaAdmin(admin.ModelAdmin):
             # Los trabajadores solo ven transferencias pendientes y en verificación
             qs = qs.filter(estado__in=['pendiente', 'verificando'])
         return qs
+
+
+@admin.register(ExportacionProgramada)
+class ExportacionProgramadaAdmin(admin.ModelAdmin):
+    """Consulta de exportaciones generadas en segundo plano"""
+    list_display = ['exportacion', 'formato', 'usuario', 'estado', 'filas', 'fecha_creacion', 'fecha_finalizacion']
+    list_filter = ['estado', 'exportacion', 'formato']
+    search_fields = ['usuario__username']
+    list_select_related = ['usuario']
+    readonly_fields = [
+        'usuario', 'exportacion', 'formato', 'parametros', 'filas', 'nombre_archivo', 'error', 'intentos',
+        'fecha_inicio', 'fecha_finalizacion',
+    ]
+    exclude = ['archivo']
+
+    @admin.display(description='Archivo')
+    def nombre_archivo(self, obj):
+        # Sin enlace: el archivo es privado y se descarga desde el panel de exportaciones
+        return obj.archivo.name or '-'
@@ -5,3 +5,11 @@ class TiendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tienda'
     verbose_name = 'Tienda de Aceros'
+
+    def ready(self):
+        # Registrar señales de invalidación de KPIs
+        from . import kpis  # noqa: F401
+        # Recompilar los descuentos al cambiar sus reglas
+        from . import descuentos  # noqa: F401
+        # Agregados de ventas al cambiar el estado de pago
+        from . import ventas  # noqa: F401
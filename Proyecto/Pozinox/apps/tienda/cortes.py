@@ -0,0 +1,130 @@
+"""
+Optimización de cortes de barras y tubos (corte unidimensional)
+"""
+import math
+from collections import Counter
+
+import numpy as np
+
+MAX_CORTES = 5000
+
+
+class CorteInvalido(Exception):
+    """Los cortes pedidos no se pueden obtener de la barra"""
+
+
+def primer_ajuste_decreciente(piezas, capacidad):
+    """First-fit decreasing: cada pieza, de mayor a menor, va a la primera barra donde cabe"""
+    libres, barras = [], []
+    for pieza in sorted(piezas, reverse=True):
+        for i, libre in enumerate(libres):
+            if pieza <= libre:
+                libres[i] -= pieza
+                barras[i].append(pieza)
+                break
+        else:
+            libres.append(capacidad - pieza)
+            barras.append([pieza])
+    return barras
+
+
+def _patron_mas_lleno(largos, restantes, capacidad):
+    """
+    Combinación de piezas pendientes que más llena una barra (mochila acotada
+    resuelta sobre un arreglo de largos alcanzables). Devuelve {índice: copias}.
+    """
+    alcanzable = np.zeros(capacidad + 1, dtype=bool)
+    alcanzable[0] = True
+    previo = np.full(capacidad + 1, -1, dtype=np.int64)
+    pieza = np.full(capacidad + 1, -1, dtype=np.int64)
+    copias = np.zeros(capacidad + 1, dtype=np.int64)
+
+    for i, (largo, pendientes) in enumerate(zip(largos, restantes)):
+        # Las copias se agrupan en potencias de dos: 1, 2, 4, ... y el resto
+        grupo = 1
+        while pendientes > 0:
+            n = min(grupo, pendientes)
+            pendientes -= n
+            grupo *= 2
+            peso = largo * n
+            if peso > capacidad:
+                continue
+            nuevos = np.flatnonzero(alcanzable[:capacidad + 1 - peso] & ~alcanzable[peso:])
+            alcanzable[nuevos + peso] = True
+            previo[nuevos + peso] = nuevos
+            pieza[nuevos + peso] = i
+            copias[nuevos + peso] = n
+
+    patron = Counter()
+    posicion = int(np.flatnonzero(alcanzable)[-1])
+    while posicion > 0:
+        patron[int(pieza[posicion])] += int(copias[posicion])
+        posicion = int(previo[posicion])
+    return patron
+
+
+def procedimiento_secuencial(piezas, capacidad):
+    """
+    Heurística secuencial sin programación lineal: se repite el patrón que más
+    llena la barra tantas veces como lo permitan las piezas pendientes.
+    """
+    demanda = Counter(piezas)
+    largos = sorted(demanda, reverse=True)
+    restantes = [demanda[largo] for largo in largos]
+    barras = []
+    while any(restantes):
+        patron = _patron_mas_lleno(largos, restantes, capacidad)
+        repeticiones = min(restantes[i] // n for i, n in patron.items())
+        barra = [largos[i] for i, n in sorted(patron.items()) for _ in range(n)]
+        barras.extend(list(barra) for _ in range(repeticiones))
+        for i, n in patron.items():
+            restantes[i] -= n * repeticiones
+    return barras
+
+
+def optimizar_cortes(cortes, largo_barra, ancho_corte=0):
+    """
+    Reparte los cortes (en mm) en el menor número de barras de `largo_barra` mm.
+    `ancho_corte` es el material que consume la sierra en cada corte. Se parte
+    de first-fit decreasing y, si no alcanza la cota inferior, se prueba la
+    heurística secuencial de patrones y se conserva la mejor.
+    """
+    cortes = [int(round(corte)) for corte in cortes]
+    largo_barra = int(largo_barra)
+    if not cortes:
+        raise CorteInvalido('Debe indicar al menos un corte')
+    if len(cortes) > MAX_CORTES:
+        raise CorteInvalido(f'Se aceptan hasta {MAX_CORTES} cortes por pedido')
+    if min(cortes) <= 0:
+        raise CorteInvalido('Los largos de corte deben ser mayores a 0')
+    if max(cortes) > largo_barra:
+        raise CorteInvalido(f'Hay cortes más largos que la barra de {largo_barra} mm')
+
+    # Cada pieza arrastra su corte de sierra; el último corte de la barra no se hace
+    capacidad = largo_barra + ancho_corte
+    piezas = [corte + ancho_corte for corte in cortes]
+    cota_inferior = math.ceil(sum(piezas) / capacidad)
+
+    barras = primer_ajuste_decreciente(piezas, capacidad)
+    metodo = 'ffd'
+    if len(barras) > cota_inferior:
+        alternativa = procedimiento_secuencial(piezas, capacidad)
+        if len(alternativa) < len(barras):
+            barras, metodo = alternativa, 'patrones'
+
+    patrones = Counter(tuple(sorted((p - ancho_corte for p in barra), reverse=True)) for barra in barras)
+    desperdicio = len(barras) * largo_barra - sum(cortes)
+    return {
+        'barras': len(barras),
+        'cota_inferior': cota_inferior,
+        'metodo': metodo,
+        'desperdicio_mm': desperdicio,
+        'desperdicio_pct': round(100 * desperdicio / (len(barras) * largo_barra), 2),
+        'patrones': [
+            {
+                'cortes': list(cortes_barra), 'repeticiones': repeticiones,
+                'sobrante_mm': largo_barra - sum(cortes_barra) - ancho_corte * (len(cortes_barra) - 1),
+            }
+            for cortes_barra, repeticiones in patrones.most_common()
+        ],
+    }
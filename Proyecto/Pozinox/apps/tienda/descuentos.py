@@ -0,0 +1,113 @@
+"""
+Motor de descuentos por tipo de cliente y volumen
+
+Las reglas vigentes se compilan en una tabla en memoria del proceso: por cada
+(tipo de cliente, alcance) una escala de cantidades mínimas con el mejor
+descuento acumulado, de modo que cada línea se resuelve con unas pocas
+búsquedas en diccionario y una búsqueda binaria, sin consultas.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from Pozinox.cache_proceso import CacheProceso
+from .models import Cliente, ReglaDescuento
+
+CACHE_KEY_VERSION = 'tienda:descuentos_version'
+SIN_DESCUENTO = Decimal('0')
+
+
+class TablaDescuentos:
+    """Reglas compiladas; entre reglas aplicables gana el mayor descuento"""
+
+    def __init__(self, reglas, vigente_hasta=None):
+        tramos = {}
+        for regla in reglas:
+            if regla.producto_id:
+                alcance = ('producto', regla.producto_id)
+            elif regla.categoria_id:
+                alcance = ('categoria', regla.categoria_id)
+            else:
+                alcance = ('catalogo', None)
+            tramos.setdefault((regla.tipo_cliente, *alcance), []).append((regla.cantidad_minima, regla.porcentaje))
+
+        self.escalas = {}
+        for clave, escala in tramos.items():
+            minimas, mejores, mejor = [], [], SIN_DESCUENTO
+            for minima, porcentaje in sorted(escala):
+                mejor = max(mejor, porcentaje)
+                if minimas and minimas[-1] == minima:
+                    mejores[-1] = mejor
+                else:
+                    minimas.append(minima)
+                    mejores.append(mejor)
+            self.escalas[clave] = (minimas, mejores)
+        # Momento en que una regla empieza o termina y la tabla deja de servir
+        self.vigente_hasta = vigente_hasta
+
+    def descuento(self, tipo_cliente, producto, piezas):
+        """Porcentaje para `piezas` unidades de stock de `producto`"""
+        mejor = SIN_DESCUENTO
+        for tipo in (tipo_cliente, ''):
+            for alcance in (('producto', producto.id), ('categoria', producto.categoria_id), ('catalogo', None)):
+                escala = self.escalas.get((tipo, *alcance))
+                if escala:
+                    i = bisect_right(escala[0], piezas)
+                    if i:
+                        mejor = max(mejor, escala[1][i - 1])
+        return mejor
+
+
+def compilar_tabla(ahora=None):
+    """Tabla con las reglas activas en `ahora`, en una consulta"""
+    ahora = ahora or timezone.now()
+    reglas = list(
+        ReglaDescuento.objects.filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=ahora), activa=True).only(
+            'tipo_cliente', 'producto_id', 'categoria_id', 'cantidad_minima', 'porcentaje', 'fecha_inicio', 'fecha_fin'
+        )
+    )
+    vigentes = [r for r in reglas if r.fecha_inicio is None or r.fecha_inicio <= ahora]
+    cambios = [r.fecha_inicio for r in reglas if r.fecha_inicio and r.fecha_inicio > ahora]
+    cambios += [r.fecha_fin for r in vigentes if r.fecha_fin]
+    return TablaDescuentos(vigentes, vigente_hasta=min(cambios, default=None))
+
+
+def tabla_vencida(tabla):
+    return bool(tabla.vigente_hasta and timezone.now() >= tabla.vigente_hasta)
+
+
+_tabla = CacheProceso(CACHE_KEY_VERSION, compilar_tabla, caducado=tabla_vencida)
+
+
+def obtener_tabla():
+    """
+    Tabla compilada del proceso. Se recompila cuando otro proceso cambia las
+    reglas (versión en la caché compartida) o cuando una regla entra o sale de vigencia.
+    """
+    return _tabla.obtener()
+
+
+def tipo_cliente(usuario_id):
+    """Tipo de la ficha de cliente del usuario; sin ficha se trata como particular"""
+    tipo = Cliente.objects.filter(usuario_id=usuario_id).values_list('tipo_cliente', flat=True).first()
+    return tipo or 'particular'
+
+
+def descuentos_cotizacion(cotizacion):
+    """Función (producto, piezas) -> porcentaje para las líneas de la cotización"""
+    tabla, tipo = obtener_tabla(), tipo_cliente(cotizacion.usuario_id)
+    return lambda producto, piezas: tabla.descuento(tipo, producto, piezas)
+
+
+def invalidar_descuentos():
+    """Obliga a todos los procesos a recompilar las reglas"""
+    _tabla.invalidar()
+
+
+@receiver([post_save, post_delete], sender=ReglaDescuento)
+def invalidar_descuentos_al_cambiar(sender, **kwargs):
+    _tabla.invalidar_al_confirmar()
@@ -0,0 +1,155 @@
+"""
+Exportaciones de cotizaciones (una fila por línea) y productos, y generación en
+segundo plano de las exportaciones demasiado grandes para descargarse al vuelo
+"""
+import datetime
+import logging
+import secrets
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Q
+from django.utils import timezone
+
+from Pozinox.exportar import Exportacion, generar, nombre_archivo, obtener_exportacion
+from apps.usuarios.models import Notificacion
+from .filtros import filtrar_cotizaciones_admin, filtrar_productos_admin
+from .models import DetalleCotizacion, ExportacionProgramada
+
+logger = logging.getLogger(__name__)
+
+
+def exportar_cotizaciones(parametros):
+    lineas = DetalleCotizacion.objects.filter(
+        cotizacion__in=filtrar_cotizaciones_admin(parametros).values('id'),
+    ).select_related('cotizacion__usuario', 'producto').order_by('cotizacion_id', 'id')
+
+    def fila(detalle):
+        cotizacion = detalle.cotizacion
+        return [
+            cotizacion.numero_cotizacion, cotizacion.fecha_creacion, cotizacion.get_estado_display(),
+            cotizacion.usuario.username, cotizacion.usuario.email,
+            cotizacion.get_metodo_pago_display() or '', cotizacion.fecha_pago,
+            detalle.producto.codigo_producto, detalle.producto.nombre,
+            detalle.cantidad_medida, detalle.get_unidad_display(), detalle.cantidad,
+            detalle.precio_unitario, detalle.descuento, detalle.subtotal,
+            cotizacion.subtotal, cotizacion.iva, cotizacion.total,
+        ]
+
+    return Exportacion('Cotizaciones', [
+        'Cotización', 'Fecha', 'Estado', 'Usuario', 'Email', 'Método de pago', 'Fecha de pago',
+        'Código', 'Producto', 'Cantidad', 'Unidad', 'Unidades de stock',
+        'Precio unitario', 'Descuento %', 'Subtotal línea',
+        'Subtotal cotización', 'IVA cotización', 'Total cotización',
+    ], lineas, fila)
+
+
+def exportar_productos(parametros):
+    productos = filtrar_productos_admin(parametros).select_related('categoria')
+
+    def fila(producto):
+        return [
+            producto.codigo_producto, producto.nombre, producto.categoria.nombre, producto.get_tipo_acero_display(),
+            producto.grosor, producto.ancho, producto.largo, producto.peso_por_metro,
+            producto.precio_por_unidad, producto.precio_por_metro, producto.precio_por_kg,
+            producto.stock_actual, producto.stock_minimo, producto.unidad_medida, producto.activo,
+            producto.fecha_creacion,
+        ]
+
+    return Exportacion('Productos', [
+        'Código', 'Nombre', 'Categoría', 'Tipo de acero', 'Grosor (mm)', 'Ancho (mm)', 'Largo (mm)',
+        'Peso por metro (kg)', 'Precio unidad', 'Precio metro', 'Precio kg',
+        'Stock', 'Stock mínimo', 'Unidad de medida', 'Activo', 'Fecha de creación',
+    ], productos, fila)
+
+
+def programar_exportacion(usuario, nombre, formato, parametros, filas=0):
+    """Deja la exportación pendiente con los filtros pedidos (solo valores simples)"""
+    return ExportacionProgramada.objects.create(
+        usuario=usuario, exportacion=nombre, formato=formato, filas=filas,
+        parametros={clave: parametros.get(clave) for clave in parametros if clave != 'page'},
+    )
+
+
+def generar_exportacion(trabajo):
+    """Escribe el archivo de una exportación pendiente en un temporal y lo guarda en el almacenamiento"""
+    # Otro proceso pudo tomarla primero
+    tomada = ExportacionProgramada.objects.filter(id=trabajo.id, estado='pendiente').update(
+        estado='procesando', fecha_inicio=timezone.now(), intentos=F('intentos') + 1,
+    )
+    if not tomada:
+        return False
+    try:
+        exportacion = obtener_exportacion(trabajo.exportacion, trabajo.parametros)
+        with tempfile.TemporaryFile() as temporal:
+            for fragmento in generar(trabajo.formato, exportacion.encabezados, exportacion.filas(), exportacion.titulo):
+                temporal.write(fragmento)
+            temporal.seek(0)
+            # Con un sufijo aleatorio el nombre no se puede adivinar
+            nombre = nombre_archivo(trabajo.exportacion, trabajo.formato, secrets.token_urlsafe(12))
+            trabajo.archivo.save(nombre, File(temporal), save=False)
+    except Exception as e:
+        logger.exception(f'Error al generar la exportación {trabajo.id}')
+        trabajo.estado, trabajo.error = 'error', str(e)
+    else:
+        trabajo.estado = 'completada'
+    trabajo.fecha_finalizacion = timezone.now()
+    trabajo.save(update_fields=['estado', 'archivo', 'error', 'fecha_finalizacion'])
+
+    if trabajo.estado == 'completada':
+        Notificacion.objects.create(
+            usuario=trabajo.usuario, tipo='success', titulo='Exportación lista',
+            mensaje=f'La exportación de {trabajo.get_exportacion_display().lower()} ({trabajo.filas} filas) '
+                    'está disponible en Exportaciones del panel de administración.',
+            modelo_relacionado='ExportacionProgramada', objeto_id=trabajo.id,
+        )
+    else:
+        Notificacion.objects.create(
+            usuario=trabajo.usuario, tipo='error', titulo='Exportación fallida',
+            mensaje=f'No se pudo generar la exportación de {trabajo.get_exportacion_display().lower()}.',
+            modelo_relacionado='ExportacionProgramada', objeto_id=trabajo.id,
+        )
+    return True
+
+
+def limite_procesando(ahora=None):
+    return (ahora or timezone.now()) - datetime.timedelta(minutes=settings.EXPORTACION_MINUTOS_MAXIMOS)
+
+
+def recuperar_interrumpidas(ahora=None):
+    """
+    Las exportaciones que siguen en 'procesando' pasado el tiempo máximo (el
+    proceso murió) vuelven a quedar pendientes, o fallan tras EXPORTACION_MAX_INTENTOS.
+    """
+    interrumpidas = ExportacionProgramada.objects.filter(estado='procesando', fecha_inicio__lt=limite_procesando(ahora))
+    fallidas = interrumpidas.filter(intentos__gte=settings.EXPORTACION_MAX_INTENTOS).update(
+        estado='error', error='Interrumpida demasiadas veces', fecha_finalizacion=timezone.now(),
+    )
+    return fallidas + interrumpidas.update(estado='pendiente')
+
+
+def procesar_exportaciones():
+    """Genera, de la más antigua a la más nueva, las exportaciones pendientes"""
+    recuperar_interrumpidas()
+    total = 0
+    for trabajo in ExportacionProgramada.objects.filter(estado='pendiente').order_by('fecha_creacion'):
+        total += generar_exportacion(trabajo)
+    return total
+
+
+def purgar_exportaciones(dias=None):
+    """Elimina las exportaciones (y sus archivos) de más de `dias` días"""
+    dias = settings.DIAS_RETENCION_EXPORTACIONES if dias is None else dias
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    # Las que se están generando se respetan, salvo que lleven demasiado tiempo
+    antiguas = ExportacionProgramada.objects.filter(fecha_creacion__lt=limite).exclude(
+        Q(estado='procesando') & Q(fecha_inicio__gte=limite_procesando()),
+    )
+    total = 0
+    for trabajo in antiguas.iterator():
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+        trabajo.delete()
+        total += 1
+    return total
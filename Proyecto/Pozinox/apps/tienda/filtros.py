@@ -0,0 +1,73 @@
+"""
+Filtros de los listados, compartidos por las vistas y las exportaciones
+
+Reciben los parámetros como diccionario (request.GET o los guardados en una
+exportación programada) para que un listado y su exportación coincidan.
+"""
+import datetime
+
+from django.db.models import Q
+
+from .models import Cotizacion, Producto
+
+
+def leer_fecha(valor):
+    try:
+        return datetime.date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def filtrar_productos(queryset, parametros):
+    """Filtros comunes a productos: categoría y búsqueda"""
+    categoria_id = parametros.get('categoria')
+    busqueda = parametros.get('q')
+
+    if categoria_id:
+        queryset = queryset.filter(categoria_id=categoria_id)
+    if busqueda:
+        queryset = queryset.filter(
+            Q(nombre__icontains=busqueda) |
+            Q(descripcion__icontains=busqueda) |
+            Q(codigo_producto__icontains=busqueda)
+        )
+    return queryset
+
+
+def filtrar_productos_admin(parametros):
+    """Productos del listado de administración"""
+    productos = Producto.objects.all().order_by('-fecha_creacion')
+    estado = parametros.get('estado')
+    if estado == 'activos':
+        productos = productos.filter(activo=True)
+    elif estado == 'inactivos':
+        productos = productos.filter(activo=False)
+    return filtrar_productos(productos, parametros)
+
+
+def filtrar_cotizaciones_admin(parametros):
+    """Cotizaciones con los filtros y la búsqueda de su administración"""
+    cotizaciones = Cotizacion.objects.all()
+    for campo in ('estado', 'metodo_pago'):
+        if parametros.get(campo):
+            cotizaciones = cotizaciones.filter(**{campo: parametros[campo]})
+    # Un cliente (por ejemplo, para su estado de cuenta mensual)
+    if str(parametros.get('usuario') or '').isdigit():
+        cotizaciones = cotizaciones.filter(usuario_id=parametros['usuario'])
+    if parametros.get('pago_completado') in ('0', '1'):
+        cotizaciones = cotizaciones.filter(pago_completado=parametros['pago_completado'] == '1')
+
+    desde, hasta = leer_fecha(parametros.get('desde')), leer_fecha(parametros.get('hasta'))
+    if desde:
+        cotizaciones = cotizaciones.filter(fecha_creacion__date__gte=desde)
+    if hasta:
+        cotizaciones = cotizaciones.filter(fecha_creacion__date__lte=hasta)
+
+    busqueda = parametros.get('q')
+    if busqueda:
+        cotizaciones = cotizaciones.filter(
+            Q(numero_cotizacion__icontains=busqueda) |
+            Q(usuario__username__icontains=busqueda) |
+            Q(usuario__email__icontains=busqueda)
+        )
+    return cotizaciones
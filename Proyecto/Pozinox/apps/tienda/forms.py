@@ -34,6 +34,8 @@ class CategoriaForm(forms.ModelForm):
 
 class ProductoForm(forms.ModelForm):
     """Formulario para crear y editar productos"""
+    # Stock que mostraba el formulario al abrirse: al editar se aplica solo la diferencia
+    stock_original = forms.IntegerField(required=False, widget=forms.HiddenInput)
     
     class Meta:
         model = Producto
@@ -84,6 +86,8 @@ class ProductoForm(forms.ModelForm):
             self.fields[field].required = True
         
         self.fields['categoria'].queryset = CategoriaAcero.objects.filter(activa=True)
+        if self.instance.pk:
+            self.fields['stock_original'].initial = self.instance.stock_actual
     
     def clean_codigo_producto(self):
         codigo = self.cleaned_data.get('codigo_producto')
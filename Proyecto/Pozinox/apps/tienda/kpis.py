@@ -0,0 +1,61 @@
+"""
+Indicadores (KPIs) del panel de administración
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Pozinox.routers import usar_replica
+from .models import CategoriaAcero, Cotizacion, Producto, TransferenciaBancaria
+
+CACHE_KEY_KPIS = 'tienda:kpis_dashboard'
+
+
+def calcular_kpis():
+    """Calcula todos los indicadores con una consulta agregada por tabla"""
+    with usar_replica():
+        productos = Producto.objects.aggregate(
+            total_productos=Count('id'),
+            productos_activos=Count('id', filter=Q(activo=True)),
+            productos_stock_bajo=Count('id', filter=Q(stock_actual__lte=F('stock_minimo'))),
+        )
+
+        estados = {
+            f'cotizaciones_{estado}': Count('id', filter=Q(estado=estado))
+            for estado, _ in Cotizacion.ESTADOS_COTIZACION
+        }
+        cotizaciones = Cotizacion.objects.aggregate(
+            total_cotizaciones=Count('id'),
+            ingresos_pagados=Sum('total', filter=Q(estado='pagada')),
+            **estados,
+        )
+        cotizaciones['ingresos_pagados'] = cotizaciones['ingresos_pagados'] or Decimal('0')
+
+        transferencias = TransferenciaBancaria.objects.aggregate(
+            transferencias_pendientes=Count('id', filter=Q(estado__in=['pendiente', 'verificando'])),
+        )
+
+        categorias = CategoriaAcero.objects.aggregate(total_categorias=Count('id'))
+
+    return {**productos, **cotizaciones, **transferencias, **categorias}
+
+
+def obtener_kpis():
+    """KPIs cacheados por KPI_CACHE_TTL segundos"""
+    return cache.get_or_set(CACHE_KEY_KPIS, calcular_kpis, settings.KPI_CACHE_TTL)
+
+
+def invalidar_kpis():
+    cache.delete(CACHE_KEY_KPIS)
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=CategoriaAcero)
+@receiver([post_save, post_delete], sender=Cotizacion)
+@receiver([post_save, post_delete], sender=TransferenciaBancaria)
+def invalidar_kpis_al_cambiar(sender, **kwargs):
+    invalidar_kpis()
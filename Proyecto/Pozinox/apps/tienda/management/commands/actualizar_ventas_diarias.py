@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.tienda.ventas import actualizar_ventas, recalcular_ventas
+
+
+class Command(BaseCommand):
+    help = (
+        'Rehace los agregados diarios de ventas de los últimos días (repaso nocturno). '
+        'Con --desde reconstruye todo el período indicado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=2, help='Días hacia atrás que se repasan')
+        parser.add_argument('--desde', help='Fecha AAAA-MM-DD desde la que se reconstruye hasta hoy')
+
+    def handle(self, *args, **options):
+        if options['desde']:
+            try:
+                desde = datetime.date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD')
+            total = recalcular_ventas(desde, timezone.localdate())
+        else:
+            total = actualizar_ventas(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f'{total} agregados de ventas actualizados'))
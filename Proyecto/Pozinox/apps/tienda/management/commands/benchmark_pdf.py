@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tienda.pdf import renderizar_lote
+
+
+def datos_de_prueba(numero, lineas):
+    """Cotización ficticia para medir el render sin depender de la base de datos"""
+    return {
+        'numero': f'COT-BENCH-{numero:05d}',
+        'cliente': 'Cliente de prueba',
+        'email': 'cliente@example.com',
+        'fecha': '01/01/2026 10:00',
+        'estado': 'Finalizada',
+        'lineas': [
+            (f'Plancha acero inoxidable 304 {i} mm', f'PL-{i:04d}', str(i % 7 + 1), '$125.000', '$250.000')
+            for i in range(lineas)
+        ],
+        'subtotal': '$2.500.000',
+        'etiqueta_iva': 'IVA (19%)',
+        'iva': '$475.000',
+        'total': '$2.975.000',
+        'observaciones': '',
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide cuántas cotizaciones por segundo se generan en PDF, en serie y con un pool de procesos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cotizaciones', type=int, default=100)
+        parser.add_argument('--lineas', type=int, default=10, help='Líneas por cotización')
+        parser.add_argument('--procesos', type=int, nargs='+', default=[1, 2, 4])
+
+    def handle(self, *args, **options):
+        if options['cotizaciones'] <= 0 or min(options['procesos']) <= 0:
+            raise CommandError('Las cotizaciones y los procesos deben ser mayores a 0')
+        lote = [datos_de_prueba(i, options['lineas']) for i in range(options['cotizaciones'])]
+        for procesos in options['procesos']:
+            inicio = time.perf_counter()
+            paginas = sum(pdf.count(b'/Type /Page\n') for _, pdf in renderizar_lote(lote, procesos=procesos))
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(
+                f'{procesos} proceso(s): {len(lote) / segundos:.1f} cotizaciones/s '
+                f'({len(lote)} cotizaciones, {paginas} páginas, {segundos:.2f} s)'
+            )
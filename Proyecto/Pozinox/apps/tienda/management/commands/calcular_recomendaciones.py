@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.tienda.recomendaciones import TOP_K, calcular_recomendaciones
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los productos recomendados según lo que se cotiza en conjunto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help='Días de cotizaciones considerados')
+        parser.add_argument('--top', type=int, default=TOP_K, help='Recomendaciones guardadas por producto')
+
+    def handle(self, *args, **options):
+        total = calcular_recomendaciones(dias=options['dias'], top_k=options['top'])
+        self.stdout.write(self.style.SUCCESS(f'{total} recomendaciones guardadas'))
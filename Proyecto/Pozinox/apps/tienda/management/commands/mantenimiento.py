@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.tienda.mantenimiento import ejecutar_mantenimiento
+
+
+class Command(BaseCommand):
+    help = (
+        'Expira transferencias vencidas, libera reservas de stock, elimina borradores abandonados, '
+        'limpia tokens y exportaciones antiguas. Con --intervalo queda ejecutándose periódicamente en este proceso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, help='Segundos entre ejecuciones; sin él se ejecuta una vez')
+        parser.add_argument('--dias-borradores', type=int, help='Días sin cambios tras los que se elimina un borrador')
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        if intervalo is not None and intervalo <= 0:
+            raise CommandError('El intervalo debe ser mayor a 0 segundos')
+
+        while True:
+            resultado = ejecutar_mantenimiento(dias_borradores=options['dias_borradores'])
+            resumen = ', '.join(
+                f'{nombre.replace("_", " ")}: {"error" if total is None else total}'
+                for nombre, total in resultado.items()
+            )
+            self.stdout.write(self.style.SUCCESS(resumen))
+            if intervalo is None:
+                break
+            # Entre ejecuciones no se mantienen conexiones abiertas ni caducadas
+            close_old_connections()
+            time.sleep(intervalo)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.tienda.exportaciones import procesar_exportaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera las exportaciones pendientes del panel de administración. '
+        'Con --intervalo queda atendiéndolas periódicamente en este proceso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, help='Segundos entre revisiones; sin él se ejecuta una vez')
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        if intervalo is not None and intervalo <= 0:
+            raise CommandError('El intervalo debe ser mayor a 0 segundos')
+
+        while True:
+            total = procesar_exportaciones()
+            if total or intervalo is None:
+                self.stdout.write(self.style.SUCCESS(f'{total} exportaciones generadas'))
+            if intervalo is None:
+                break
+            close_old_connections()
+            time.sleep(intervalo)
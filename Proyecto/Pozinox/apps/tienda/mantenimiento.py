@@ -0,0 +1,86 @@
+"""
+Tareas periódicas de mantenimiento: transferencias vencidas, borradores abandonados, tokens,
+exportaciones antiguas y retención del registro de actividad
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.inventario.reservas import liberar_reservas_vencidas
+from apps.usuarios.auditoria import purgar_actividad
+from apps.usuarios.models import EmailVerificationToken, PasswordResetToken
+from .exportaciones import purgar_exportaciones
+from .kpis import invalidar_kpis
+from .models import Cotizacion, TransferenciaBancaria
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+
+
+def expirar_transferencias(ahora=None):
+    """Marca como expiradas, en un solo UPDATE, las transferencias pendientes vencidas"""
+    ahora = ahora or timezone.now()
+    total = TransferenciaBancaria.objects.vencidas(ahora).update(estado='expirada', fecha_actualizacion=ahora)
+    if total:
+        invalidar_kpis()
+    return total
+
+
+def purgar_borradores(dias=None, tamano_lote=TAMANO_LOTE):
+    """
+    Elimina por lotes las cotizaciones en borrador sin cambios en `dias` días
+    (DIAS_RETENCION_BORRADORES por defecto), junto con sus detalles.
+    """
+    dias = settings.DIAS_RETENCION_BORRADORES if dias is None else dias
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    abandonadas = Cotizacion.objects.filter(estado='borrador', fecha_actualizacion__lt=limite)
+
+    total = 0
+    while True:
+        ids = list(abandonadas.order_by().values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            break
+        # Cada lote es una transacción corta; el filtro se repite por si el borrador cambió
+        abandonadas.filter(id__in=ids).delete()
+        total += len(ids)
+    if total:
+        invalidar_kpis()
+    return total
+
+
+def limpiar_tokens(ahora=None):
+    """Elimina los códigos de verificación y tokens de recuperación usados o vencidos"""
+    ahora = ahora or timezone.now()
+    vencido = Q(is_used=True) | Q(expires_at__lte=ahora)
+    verificacion, _ = EmailVerificationToken.objects.filter(vencido).delete()
+    recuperacion, _ = PasswordResetToken.objects.filter(vencido).delete()
+    return verificacion + recuperacion
+
+
+def ejecutar_mantenimiento(dias_borradores=None):
+    """
+    Ejecuta todas las tareas y devuelve {tarea: filas afectadas}. Una tarea que
+    falla se registra y no impide las siguientes.
+    """
+    tareas = [
+        ('transferencias_expiradas', expirar_transferencias),
+        # Después de expirar transferencias, para liberar también su stock
+        ('reservas_liberadas', liberar_reservas_vencidas),
+        ('borradores_eliminados', lambda: purgar_borradores(dias_borradores)),
+        ('tokens_eliminados', limpiar_tokens),
+        ('exportaciones_eliminadas', purgar_exportaciones),
+        # También crea por adelantado la partición del mes siguiente
+        ('actividad_purgada', purgar_actividad),
+    ]
+    resultado = {}
+    for nombre, tarea in tareas:
+        try:
+            resultado[nombre] = tarea()
+        except Exception:
+            logger.exception(f'Error en la tarea de mantenimiento {nombre}')
+            resultado[nombre] = None
+    return resultado
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0004_cotizacion_comentarios_pago_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transferenciabancaria',
+            index=models.Index(fields=['estado', '-fecha_creacion'], name='transf_estado_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0005_transferencia_estado_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['usuario', 'estado'], name='cot_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['estado', 'fecha_actualizacion'], name='cot_estado_actualizacion_idx'),
+        ),
+    ]
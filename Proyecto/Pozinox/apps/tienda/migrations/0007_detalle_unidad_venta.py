@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:43
+
+from django.db import migrations, models
+
+
+def copiar_cantidades(apps, schema_editor):
+    # Las líneas existentes se vendieron por unidad
+    DetalleCotizacion = apps.get_model('tienda', 'DetalleCotizacion')
+    DetalleCotizacion.objects.update(cantidad_medida=models.F('cantidad'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0006_cotizacion_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallecotizacion',
+            name='cantidad_medida',
+            field=models.DecimalField(decimal_places=3, default=1, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='detallecotizacion',
+            name='unidad',
+            field=models.CharField(choices=[('unidad', 'Unidad'), ('metro', 'Metro'), ('kg', 'Kilogramo')], default='unidad', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='detallecotizacion',
+            name='precio_unitario',
+            field=models.DecimalField(decimal_places=2, help_text='Precio por unidad de venta', max_digits=10),
+        ),
+        migrations.RunPython(copiar_cantidades, migrations.RunPython.noop),
+    ]
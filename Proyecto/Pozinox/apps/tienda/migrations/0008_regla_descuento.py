@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0007_detalle_unidad_venta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallecotizacion',
+            name='descuento',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Porcentaje de descuento', max_digits=5),
+        ),
+        migrations.CreateModel(
+            name='ReglaDescuento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo_cliente', models.CharField(blank=True, choices=[('particular', 'Particular'), ('empresa', 'Empresa'), ('constructor', 'Constructor'), ('distribuidor', 'Distribuidor')], max_length=20)),
+                ('cantidad_minima', models.PositiveIntegerField(default=1, help_text='Unidades de stock desde las que aplica')),
+                ('porcentaje', models.DecimalField(decimal_places=2, help_text='Porcentaje de descuento', max_digits=5)),
+                ('activa', models.BooleanField(default=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_descuento', to='tienda.categoriaacero')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_descuento', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'Regla de Descuento',
+                'verbose_name_plural': 'Reglas de Descuento',
+                'ordering': ['tipo_cliente', 'cantidad_minima'],
+            },
+        ),
+    ]
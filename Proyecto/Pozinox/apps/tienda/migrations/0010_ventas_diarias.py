@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fechar_pagos(apps, schema_editor):
+    # Las cotizaciones ya pagadas toman su última actualización como fecha de pago
+    Cotizacion = apps.get_model('tienda', 'Cotizacion')
+    Cotizacion.objects.filter(estado='pagada', fecha_pago__isnull=True).update(fecha_pago=models.F('fecha_actualizacion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0009_recomendacion_producto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('producto', 'Producto'), ('categoria', 'Categoría'), ('cliente', 'Cliente'), ('metodo_pago', 'Método de pago')], max_length=20)),
+                ('clave', models.CharField(max_length=50)),
+                ('cotizaciones', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0, help_text='Unidades de stock vendidas')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, help_text='Neto, sin IVA', max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha', 'dimension'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='fecha_pago',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['fecha_pago'], name='cot_fecha_pago_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ventadiaria',
+            unique_together={('dimension', 'fecha', 'clave')},
+        ),
+        migrations.RunPython(fechar_pagos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:42
+
+import Pozinox.exportar
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def eliminar_exportaciones_publicas(apps, schema_editor):
+    # Las generadas hasta ahora quedaron en MEDIA_ROOT, accesibles sin autenticación
+    ExportacionProgramada = apps.get_model('tienda', 'ExportacionProgramada')
+    for trabajo in ExportacionProgramada.objects.exclude(archivo=''):
+        default_storage.delete(trabajo.archivo.name)
+        trabajo.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0011_exportacion_programada'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_exportaciones_publicas, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='exportacionprogramada',
+            name='fecha_inicio',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportacionprogramada',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='exportacionprogramada',
+            name='archivo',
+            field=models.FileField(blank=True, storage=Pozinox.exportar.almacenamiento_exportaciones, upload_to='exportaciones/'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:50
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def fijar_tasa(apps, schema_editor):
+    # La tasa de cada cotización se deduce de sus totales; sin subtotal, la configurada
+    Cotizacion = apps.get_model('tienda', 'Cotizacion')
+    ConfiguracionSistema = apps.get_model('usuarios', 'ConfiguracionSistema')
+    config = ConfiguracionSistema.objects.first()
+    vigente = Decimal(str(config.iva_porcentaje)) if config else Decimal('19')
+    Cotizacion.objects.filter(subtotal=0).update(iva_porcentaje=vigente)
+    for cotizacion in Cotizacion.objects.exclude(subtotal=0).only('id', 'subtotal', 'iva').iterator():
+        porcentaje = (cotizacion.iva * 100 / cotizacion.subtotal).quantize(Decimal('0.01'))
+        if porcentaje != Decimal('19'):
+            Cotizacion.objects.filter(id=cotizacion.id).update(iva_porcentaje=porcentaje)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0012_exportacion_privada'),
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cotizacion',
+            name='iva_porcentaje',
+            field=models.DecimalField(decimal_places=2, default=Decimal('19'), max_digits=5),
+        ),
+        migrations.RunPython(fijar_tasa, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from storages.backends.s3boto3 import S3Boto3Storage
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from django.utils import timezone
 from datetime import timedelta
+from apps.usuarios.configuracion import obtener_configuracion
+from apps.usuarios.models import formato_iva
+from Pozinox.exportar import almacenamiento_exportaciones
 
 
 class CategoriaAcero(models.Model):
@@ -217,10 +221,13 @@ class Cotizacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     fecha_finalizacion = models.DateTimeField(null=True, blank=True)
+    fecha_pago = models.DateTimeField(null=True, blank=True)
     
     # Totales
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     iva = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Tasa con que se calculó el IVA; la configuración puede cambiar después
+    iva_porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('19'))
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
     # Pago
@@ -242,6 +249,11 @@ class Cotizacion(models.Model):
         verbose_name = 'Cotización'
         verbose_name_plural = 'Cotizaciones'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['usuario', 'estado'], name='cot_usuario_estado_idx'),
+            models.Index(fields=['estado', 'fecha_actualizacion'], name='cot_estado_actualizacion_idx'),
+            models.Index(fields=['fecha_pago'], name='cot_fecha_pago_idx'),
+        ]
     
     def __str__(self):
         return f"Cotización {self.numero_cotizacion} - {self.usuario.username}"
@@ -253,23 +265,44 @@ class Cotizacion(models.Model):
             today = datetime.date.today()
             last_cotizacion = Cotizacion.objects.filter(fecha_creacion__date=today).count()
             self.numero_cotizacion = f"COT{today.strftime('%Y%m%d')}{last_cotizacion + 1:04d}"
+        if self.estado == 'pagada' and not self.fecha_pago:
+            # Día en que la venta cuenta para los reportes
+            self.fecha_pago = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'fecha_pago'}
         super().save(*args, **kwargs)
     
     def calcular_totales(self):
         """Calcula los totales de la cotización basándose en los detalles"""
-        detalles = self.detalles.all()
-        self.subtotal = sum(detalle.subtotal for detalle in detalles) if detalles else Decimal('0')
-        self.iva = self.subtotal * Decimal('0.19')  # IVA del 19%
+        self.subtotal = self.detalles.aggregate(total=models.Sum('subtotal'))['total'] or Decimal('0')
+        self.iva_porcentaje = Decimal(str(obtener_configuracion().iva_porcentaje))
+        self.iva = self.subtotal * self.iva_porcentaje / 100
         self.total = self.subtotal + self.iva
-        self.save()
+        self.save(update_fields=['subtotal', 'iva', 'iva_porcentaje', 'total', 'fecha_actualizacion'])
+    
+    @property
+    def etiqueta_iva(self):
+        return formato_iva(self.iva_porcentaje)
 
 
 class DetalleCotizacion(models.Model):
     """Detalles de cada producto en una cotización"""
+    UNIDADES_VENTA = [
+        ('unidad', 'Unidad'),
+        ('metro', 'Metro'),
+        ('kg', 'Kilogramo'),
+    ]
+    ABREVIATURAS_UNIDAD = {'metro': 'm', 'kg': 'kg'}
+    
     cotizacion = models.ForeignKey(Cotizacion, on_delete=models.CASCADE, related_name='detalles')
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    unidad = models.CharField(max_length=10, choices=UNIDADES_VENTA, default='unidad')
+    # Cantidad pedida en la unidad de venta (metros, kilos o unidades)
+    cantidad_medida = models.DecimalField(max_digits=10, decimal_places=3, default=1)
+    # Unidades de stock que cubren lo pedido (piezas, barras o planchas)
     cantidad = models.PositiveIntegerField(default=1)
-    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio por unidad de venta")
+    descuento = models.DecimalField(max_digits=5, decimal_places=2, default=0, help_text="Porcentaje de descuento")
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
     class Meta:
@@ -278,16 +311,182 @@ class DetalleCotizacion(models.Model):
         unique_together = ['cotizacion', 'producto']
     
     def __str__(self):
-        return f"{self.cotizacion.numero_cotizacion} - {self.producto} x {self.cantidad}"
+        return f"{self.cotizacion.numero_cotizacion} - {self.producto} x {self.cantidad_legible}"
+    
+    @property
+    def cantidad_legible(self):
+        if self.unidad == 'unidad':
+            return str(self.cantidad)
+        medida = f'{self.cantidad_medida.normalize():f}'.replace('.', ',')
+        return f'{medida} {self.ABREVIATURAS_UNIDAD[self.unidad]}'
+    
+    @property
+    def descuento_legible(self):
+        if not self.descuento:
+            return ''
+        return f"-{Decimal(self.descuento).normalize():f}%".replace('.', ',')
     
     def save(self, *args, **kwargs):
-        # Calcular subtotal
-        self.subtotal = self.precio_unitario * self.cantidad
+        # Vendido por unidad, lo pedido y lo que sale de stock coinciden
+        if self.unidad == 'unidad':
+            self.cantidad_medida = self.cantidad
+        # Calcular subtotal con el descuento aplicado
+        bruto = self.precio_unitario * Decimal(self.cantidad_medida)
+        self.subtotal = (bruto * (100 - Decimal(self.descuento)) / 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
         super().save(*args, **kwargs)
         # Actualizar totales de la cotización
         self.cotizacion.calcular_totales()
 
 
+class ReglaDescuento(models.Model):
+    """
+    Descuento por tipo de cliente y volumen. Sin producto ni categoría aplica a
+    todo el catálogo; sin tipo de cliente, a todos los clientes.
+    """
+    nombre = models.CharField(max_length=100)
+    tipo_cliente = models.CharField(max_length=20, choices=Cliente.TIPO_CLIENTE, blank=True)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_descuento')
+    categoria = models.ForeignKey(CategoriaAcero, on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_descuento')
+    cantidad_minima = models.PositiveIntegerField(default=1, help_text="Unidades de stock desde las que aplica")
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, help_text="Porcentaje de descuento")
+    
+    activa = models.BooleanField(default=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Regla de Descuento'
+        verbose_name_plural = 'Reglas de Descuento'
+        ordering = ['tipo_cliente', 'cantidad_minima']
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.porcentaje}%)"
+    
+    def clean(self):
+        if self.producto_id and self.categoria_id:
+            raise ValidationError('Indique un producto o una categoría, no ambos.')
+        if self.porcentaje is not None and not 0 < self.porcentaje < 100:
+            raise ValidationError({'porcentaje': 'El descuento debe estar entre 0 y 100%.'})
+        if self.fecha_inicio and self.fecha_fin and self.fecha_fin <= self.fecha_inicio:
+            raise ValidationError({'fecha_fin': 'La fecha de término debe ser posterior al inicio.'})
+
+
+class RecomendacionProducto(models.Model):
+    """Productos cotizados junto a otro, precalculados por calcular_recomendaciones"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='recomendaciones')
+    recomendado = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    posicion = models.PositiveSmallIntegerField()
+    puntaje = models.FloatField(help_text="Similitud coseno entre las cotizaciones de ambos productos")
+    
+    class Meta:
+        verbose_name = 'Recomendación de Producto'
+        verbose_name_plural = 'Recomendaciones de Productos'
+        ordering = ['producto', 'posicion']
+        unique_together = ['producto', 'posicion']
+    
+    def __str__(self):
+        return f"{self.producto} → {self.recomendado}"
+
+
+class VentaDiaria(models.Model):
+    """
+    Ventas pagadas agregadas por día y dimensión. `clave` es el id del producto,
+    categoría o usuario, o el método de pago.
+    """
+    DIMENSIONES = [
+        ('producto', 'Producto'),
+        ('categoria', 'Categoría'),
+        ('cliente', 'Cliente'),
+        ('metodo_pago', 'Método de pago'),
+    ]
+    
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSIONES)
+    clave = models.CharField(max_length=50)
+    cotizaciones = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0, help_text="Unidades de stock vendidas")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Neto, sin IVA")
+    
+    class Meta:
+        verbose_name = 'Venta Diaria'
+        verbose_name_plural = 'Ventas Diarias'
+        ordering = ['-fecha', 'dimension']
+        unique_together = ['dimension', 'fecha', 'clave']
+    
+    def __str__(self):
+        return f"{self.fecha} {self.dimension}={self.clave}: ${self.monto:,.0f}"
+
+
+class ExportacionProgramada(models.Model):
+    """Exportación demasiado grande para descargarse al vuelo, generada en segundo plano"""
+    EXPORTACIONES = [
+        ('cotizaciones', 'Cotizaciones'),
+        ('productos', 'Productos'),
+        ('movimientos', 'Movimientos de inventario'),
+        ('usuarios', 'Usuarios'),
+    ]
+    FORMATOS = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completada', 'Completada'),
+        ('error', 'Error'),
+    ]
+    
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exportaciones')
+    exportacion = models.CharField(max_length=20, choices=EXPORTACIONES)
+    formato = models.CharField(max_length=10, choices=FORMATOS)
+    # Filtros del listado (request.GET) con que se pidió
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    filas = models.PositiveIntegerField(default=0)
+    # Almacenamiento privado: solo se descarga a través de descargar_exportacion
+    archivo = models.FileField(upload_to='exportaciones/', storage=almacenamiento_exportaciones, blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_finalizacion = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Exportación Programada'
+        verbose_name_plural = 'Exportaciones Programadas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='export_estado_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_exportacion_display()} ({self.formato}) - {self.get_estado_display()}"
+
+
+class TransferenciaBancariaQuerySet(models.QuerySet):
+    """Consultas optimizadas de transferencias"""
+    
+    def por_verificar(self):
+        return self.filter(estado__in=['pendiente', 'verificando'])
+    
+    def vencidas(self, ahora):
+        """Pendientes cuyo plazo para transferir ya pasó"""
+        return self.filter(estado='pendiente', fecha_expiracion__lte=ahora)
+    
+    def para_panel(self):
+        """Carga en una sola consulta lo que muestra el panel de verificación"""
+        return self.select_related(
+            'cotizacion', 'cotizacion__usuario', 'verificada_por'
+        ).only(
+            'id', 'estado', 'monto_transferencia', 'comprobante', 'fecha_creacion', 'fecha_expiracion',
+            'cotizacion__id', 'cotizacion__numero_cotizacion',
+            'cotizacion__usuario__id', 'cotizacion__usuario__username',
+            'cotizacion__usuario__first_name', 'cotizacion__usuario__last_name',
+            'verificada_por__id', 'verificada_por__username',
+            'verificada_por__first_name', 'verificada_por__last_name',
+        )
+
+
 class TransferenciaBancaria(models.Model):
     """Transferencias bancarias para pagos de cotizaciones"""
     ESTADOS_TRANSFERENCIA = [
@@ -326,10 +525,15 @@ class TransferenciaBancaria(models.Model):
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     fecha_expiracion = models.DateTimeField(help_text="Fecha límite para realizar la transferencia")
     
+    objects = TransferenciaBancariaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Transferencia Bancaria'
         verbose_name_plural = 'Transferencias Bancarias'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', '-fecha_creacion'], name='transf_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Transferencia {self.cotizacion.numero_cotizacion} - {self.get_estado_display()}"
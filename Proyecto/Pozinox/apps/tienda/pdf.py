@@ -0,0 +1,226 @@
+"""
+PDF de cotizaciones
+
+Los estilos se construyen una sola vez por proceso y se comparten entre
+documentos. El render trabaja sobre diccionarios simples (datos_cotizacion), sin
+modelos ni base de datos, para poder repartir un lote en un pool de procesos;
+por eso este módulo no importa nada de Django.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+AZUL = colors.HexColor('#1e3a8a')
+# Con menos cotizaciones no compensa repartirlas entre procesos
+MINIMO_POOL = 4
+
+ESTILOS = getSampleStyleSheet()
+
+ESTILO_TITULO = ParagraphStyle(
+    'CustomTitle',
+    parent=ESTILOS['Heading1'],
+    fontSize=24,
+    textColor=AZUL,
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+ESTILO_ENCABEZADO = ParagraphStyle(
+    'CustomHeading',
+    parent=ESTILOS['Heading2'],
+    fontSize=14,
+    textColor=AZUL,
+    spaceAfter=12,
+    fontName='Helvetica-Bold'
+)
+
+ESTILO_NORMAL = ParagraphStyle(
+    'CustomNormal',
+    parent=ESTILOS['Normal'],
+    fontSize=10,
+    spaceAfter=12,
+)
+
+ESTILO_PIE = ParagraphStyle(
+    'Footer',
+    parent=ESTILOS['Normal'],
+    fontSize=8,
+    textColor=colors.grey,
+    alignment=TA_CENTER,
+)
+
+TABLA_INFO = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), AZUL),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+TABLA_PRODUCTOS = TableStyle([
+    # Encabezado
+    ('BACKGROUND', (0, 0), (-1, 0), AZUL),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+
+    # Contenido
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+    ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+    ('TOPPADDING', (0, 1), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+])
+
+TABLA_TOTALES = TableStyle([
+    ('FONTNAME', (0, 0), (0, 1), 'Helvetica'),
+    ('FONTNAME', (1, 0), (1, 1), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 3), (-1, 3), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 2), 11),
+    ('FONTSIZE', (0, 3), (-1, 3), 14),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (0, 3), (-1, 3), AZUL),
+    ('LINEABOVE', (0, 3), (-1, 3), 2, AZUL),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+
+def datos_cotizacion(cotizacion):
+    """Lo que se imprime de una cotización, con sus detalles y productos ya cargados"""
+    usuario = cotizacion.usuario
+    return {
+        'numero': cotizacion.numero_cotizacion,
+        'cliente': usuario.get_full_name() or usuario.username,
+        'email': usuario.email,
+        'fecha': cotizacion.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
+        'estado': cotizacion.get_estado_display(),
+        'lineas': [
+            (
+                detalle.producto.nombre,
+                detalle.producto.codigo_producto,
+                detalle.cantidad_legible,
+                f'${detalle.precio_unitario:,.0f} {detalle.descuento_legible}'.strip(),
+                f'${detalle.subtotal:,.0f}',
+            )
+            for detalle in cotizacion.detalles.all()
+        ],
+        'subtotal': f'${cotizacion.subtotal:,.0f}',
+        'etiqueta_iva': cotizacion.etiqueta_iva,
+        'iva': f'${cotizacion.iva:,.0f}',
+        'total': f'${cotizacion.total:,.0f}',
+        'observaciones': cotizacion.observaciones,
+    }
+
+
+def cargar_cotizaciones(cotizaciones):
+    """Datos de impresión de un queryset de cotizaciones en tres consultas"""
+    cotizaciones = cotizaciones.select_related('usuario').prefetch_related('detalles__producto')
+    return [datos_cotizacion(cotizacion) for cotizacion in cotizaciones]
+
+
+def nombre_pdf(datos):
+    return f'Cotizacion_{datos["numero"]}.pdf'
+
+
+def elementos_cotizacion(datos):
+    """Flowables de una cotización"""
+    elementos = [
+        Paragraph('POZINOX', ESTILO_TITULO),
+        Paragraph('Tienda de Aceros', ESTILOS['Normal']),
+        Spacer(1, 20),
+        Paragraph(f'COTIZACIÓN N° {datos["numero"]}', ESTILO_ENCABEZADO),
+    ]
+
+    info = Table([
+        ['Cliente:', datos['cliente']],
+        ['Email:', datos['email']],
+        ['Fecha:', datos['fecha']],
+        ['Estado:', datos['estado']],
+    ], colWidths=[2*inch, 4*inch])
+    info.setStyle(TABLA_INFO)
+    elementos += [info, Spacer(1, 20), Paragraph('DETALLE DE PRODUCTOS', ESTILO_ENCABEZADO)]
+
+    filas = [['Producto', 'Código', 'Cantidad', 'Precio Unit.', 'Subtotal']]
+    filas += [[Paragraph(nombre, ESTILO_NORMAL), *resto] for nombre, *resto in datos['lineas']]
+    productos = Table(filas, colWidths=[2.5*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
+    productos.setStyle(TABLA_PRODUCTOS)
+    elementos += [productos, Spacer(1, 20)]
+
+    totales = Table([
+        ['Subtotal:', datos['subtotal']],
+        [f'{datos["etiqueta_iva"]}:', datos['iva']],
+        ['', ''],
+        ['TOTAL:', datos['total']],
+    ], colWidths=[5*inch, 1.5*inch])
+    totales.setStyle(TABLA_TOTALES)
+    elementos += [totales, Spacer(1, 30)]
+
+    if datos['observaciones']:
+        elementos += [
+            Paragraph('OBSERVACIONES:', ESTILO_ENCABEZADO),
+            Paragraph(datos['observaciones'], ESTILO_NORMAL),
+            Spacer(1, 20),
+        ]
+
+    elementos += [
+        Spacer(1, 30),
+        Paragraph('_______________________________________________', ESTILO_PIE),
+        Spacer(1, 10),
+        Paragraph('POZINOX - Tienda de Aceros', ESTILO_PIE),
+        Paragraph('www.pozinox.cl | info@pozinox.cl | +56 2 1234 5678', ESTILO_PIE),
+        Paragraph('Este documento es una cotización y no constituye una factura', ESTILO_PIE),
+    ]
+    return elementos
+
+
+def documento(salida):
+    return SimpleDocTemplate(salida, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+
+def renderizar_cotizacion(datos):
+    """PDF de una cotización, en bytes"""
+    salida = BytesIO()
+    documento(salida).build(elementos_cotizacion(datos))
+    return salida.getvalue()
+
+
+def renderizar_combinado(lista_datos, salida):
+    """Un solo PDF con una cotización tras otra, cada una desde una página nueva"""
+    elementos = []
+    for datos in lista_datos:
+        if elementos:
+            elementos.append(PageBreak())
+        elementos += elementos_cotizacion(datos)
+    documento(salida).build(elementos)
+
+
+def renderizar_lote(lista_datos, procesos=None):
+    """
+    Pares (datos, pdf) en el orden recibido. Con `procesos` > 1 y suficientes
+    cotizaciones se reparten en un pool; los procesos se inician con spawn para
+    no heredar conexiones ni hilos del proceso web.
+    """
+    if not procesos or procesos < 2 or len(lista_datos) < MINIMO_POOL:
+        for datos in lista_datos:
+            yield datos, renderizar_cotizacion(datos)
+        return
+    procesos = min(procesos, len(lista_datos))
+    bloque = max(1, len(lista_datos) // (procesos * 4))
+    with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield from zip(lista_datos, pool.map(renderizar_cotizacion, lista_datos, chunksize=bloque))
@@ -0,0 +1,122 @@
+"""
+Estimación de planchas para piezas rectangulares (empaquetado por estantes guillotinables)
+"""
+import hashlib
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+MAX_PIEZAS = 5000
+PREFIJO_CACHE = 'tienda:planchas'
+
+
+class PiezaInvalida(Exception):
+    """Las piezas pedidas no se pueden obtener de la plancha"""
+
+
+def orientar(ancho, largo, ancho_plancha, largo_plancha):
+    """
+    Orientación de la pieza en el estante: el lado largo a lo ancho de la plancha
+    para que los estantes queden bajos; si no cabe así, se gira.
+    """
+    mayor, menor = max(ancho, largo), min(ancho, largo)
+    if mayor <= ancho_plancha and menor <= largo_plancha:
+        return mayor, menor
+    if menor <= ancho_plancha and mayor <= largo_plancha:
+        return menor, mayor
+    raise PiezaInvalida(f'La pieza de {ancho} × {largo} mm no cabe en la plancha')
+
+
+def empaquetar_estantes(piezas, ancho_plancha, largo_plancha):
+    """
+    First-fit decreasing height: las piezas, de mayor a menor alto, van al primer
+    estante (de cualquier plancha) con alto y ancho libres suficientes; si no hay,
+    se abre un estante en la primera plancha con alto libre o una plancha nueva.
+    Cada estante es un corte recto, por lo que el plan es guillotinable.
+    Devuelve por plancha la lista de estantes [alto, ancho usado, piezas].
+    """
+    planchas, alto_libre = [], []
+    for ancho, alto in sorted(piezas, key=lambda p: (p[1], p[0]), reverse=True):
+        ubicada = False
+        for estantes in planchas:
+            for estante in estantes:
+                if alto <= estante[0] and estante[1] + ancho <= ancho_plancha:
+                    estante[1] += ancho
+                    estante[2] += 1
+                    ubicada = True
+                    break
+            if ubicada:
+                break
+        if ubicada:
+            continue
+        for i, libre in enumerate(alto_libre):
+            if alto <= libre:
+                planchas[i].append([alto, ancho, 1])
+                alto_libre[i] -= alto
+                break
+        else:
+            planchas.append([[alto, ancho, 1]])
+            alto_libre.append(largo_plancha - alto)
+    return planchas
+
+
+def normalizar_piezas(piezas):
+    """Lista canónica [[lado menor, lado mayor, cantidad], ...] para comparar pedidos"""
+    conteo = Counter()
+    for ancho, largo, cantidad in piezas:
+        conteo[(min(ancho, largo), max(ancho, largo))] += cantidad
+    return [[menor, mayor, cantidad] for (menor, mayor), cantidad in sorted(conteo.items())]
+
+
+def estimar_planchas(piezas, ancho_plancha, largo_plancha, ancho_corte=0):
+    """
+    Planchas necesarias y desperdicio para piezas (ancho, largo, cantidad) en mm.
+    `ancho_corte` es el material que consume cada corte.
+    """
+    ancho_plancha, largo_plancha = int(ancho_plancha), int(largo_plancha)
+    normalizadas = normalizar_piezas((int(round(a)), int(round(l)), int(c)) for a, l, c in piezas)
+    total = sum(cantidad for _, _, cantidad in normalizadas)
+    if not total:
+        raise PiezaInvalida('Debe indicar al menos una pieza')
+    if total > MAX_PIEZAS:
+        raise PiezaInvalida(f'Se aceptan hasta {MAX_PIEZAS} piezas por pedido')
+    if any(menor <= 0 or cantidad <= 0 for menor, _, cantidad in normalizadas):
+        raise PiezaInvalida('Las medidas y cantidades deben ser mayores a 0')
+
+    # Cada pieza arrastra un corte por lado; el último corte de la plancha no se hace
+    capacidad = (ancho_plancha + ancho_corte, largo_plancha + ancho_corte)
+    orientadas = []
+    for menor, mayor, cantidad in normalizadas:
+        orientadas.extend([orientar(menor + ancho_corte, mayor + ancho_corte, *capacidad)] * cantidad)
+
+    planchas = empaquetar_estantes(orientadas, *capacidad)
+    area_piezas = sum(menor * mayor * cantidad for menor, mayor, cantidad in normalizadas)
+    area_planchas = len(planchas) * ancho_plancha * largo_plancha
+    return {
+        'planchas': len(planchas),
+        'piezas': total,
+        'estantes': sum(len(estantes) for estantes in planchas),
+        'aprovechamiento_pct': round(100 * area_piezas / area_planchas, 2),
+        'desperdicio_pct': round(100 * (1 - area_piezas / area_planchas), 2),
+    }
+
+
+def clave_cache(piezas, ancho_plancha, largo_plancha, ancho_corte=0):
+    pedido = [normalizar_piezas(piezas), int(ancho_plancha), int(largo_plancha), int(ancho_corte)]
+    resumen = hashlib.sha1(json.dumps(pedido).encode()).hexdigest()
+    return f'{PREFIJO_CACHE}:{resumen}'
+
+
+def estimar_planchas_cacheado(piezas, ancho_plancha, largo_plancha, ancho_corte=0):
+    """
+    estimar_planchas con caché por PLANCHAS_CACHE_TTL segundos. La clave usa el
+    pedido normalizado, por lo que el orden de las piezas o sus lados no importa.
+    """
+    piezas = [(int(round(a)), int(round(l)), int(c)) for a, l, c in piezas]
+    return cache.get_or_set(
+        clave_cache(piezas, ancho_plancha, largo_plancha, ancho_corte),
+        lambda: estimar_planchas(piezas, ancho_plancha, largo_plancha, ancho_corte),
+        settings.PLANCHAS_CACHE_TTL,
+    )
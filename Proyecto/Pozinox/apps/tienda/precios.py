@@ -0,0 +1,189 @@
+"""
+Motor de precios de aceros: precio por unidad, metro o kilo y peso derivado
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.db import transaction
+
+from apps.inventario.reservas import disponibles
+from apps.inventario.stock import StockInsuficiente
+from .descuentos import descuentos_cotizacion
+from .models import DetalleCotizacion
+
+# Densidad en kg/m³ por tipo de acero
+DENSIDAD_ACERO = {
+    'inoxidable': 7930,
+    'carbono': 7850,
+    'galvanizado': 7850,
+    'estructural': 7850,
+}
+
+CENTAVOS = Decimal('0.01')
+# Las cantidades se guardan con 3 decimales (mm o gramos)
+ESCALA_CANTIDAD = 1000
+ESCALA_PRECIO = 100
+# 100% en centésimas de punto porcentual
+ESCALA_DESCUENTO = 10000
+
+
+class PrecioNoDisponible(Exception):
+    """El producto no se puede cotizar en la unidad pedida"""
+
+
+def peso_por_metro(producto):
+    """kg/m declarado o, en planchas y pletinas, derivado de grosor × ancho × densidad"""
+    if producto.peso_por_metro:
+        return producto.peso_por_metro
+    if producto.grosor and producto.ancho:
+        densidad = DENSIDAD_ACERO.get(producto.tipo_acero, 7850)
+        return (producto.grosor * producto.ancho * densidad / 1000000).quantize(Decimal('0.0001'))
+    return None
+
+
+def tarifa(producto, unidad):
+    """
+    (precio por unidad de venta, unidades de venta que trae una unidad de stock).
+    Sin precio propio, el metro se deriva del kilo y viceversa usando el peso
+    por metro. Un producto sin largo lleva su stock en la misma unidad de venta;
+    uno con largo pero sin peso conocido no se puede vender por kilo.
+    """
+    if unidad == 'unidad':
+        return producto.precio_por_unidad, Decimal(1)
+
+    peso = peso_por_metro(producto)
+    largo = producto.largo / 1000 if producto.largo else None
+    if unidad == 'metro':
+        precio = producto.precio_por_metro or (producto.precio_por_kg * peso if producto.precio_por_kg and peso else None)
+        por_pieza = largo
+    elif unidad == 'kg':
+        precio = producto.precio_por_kg or (producto.precio_por_metro / peso if producto.precio_por_metro and peso else None)
+        if largo and not peso:
+            raise PrecioNoDisponible(f'{producto.nombre} no tiene peso para venderse por kg')
+        por_pieza = largo * peso if largo else None
+    else:
+        raise PrecioNoDisponible(f'Unidad de venta desconocida: {unidad}')
+
+    if not precio:
+        raise PrecioNoDisponible(f'{producto.nombre} no tiene precio por {unidad}')
+    return precio.quantize(CENTAVOS, ROUND_HALF_UP), por_pieza or Decimal(1)
+
+
+def _entero(valor, escala):
+    return int((valor * escala).to_integral_value(ROUND_HALF_UP))
+
+
+def cotizar_lineas(lineas, descuento=None):
+    """
+    Evalúa un lote de líneas (producto, unidad, cantidad) y devuelve, por línea,
+    (precio_unitario, subtotal, unidades de stock, descuento). Las tarifas se
+    calculan una vez por producto y unidad; los subtotales se obtienen para todo
+    el lote en aritmética entera (milésimas × centavos × centésimas de punto
+    porcentual), sin errores de coma flotante. `descuento(producto, piezas)`
+    entrega el porcentaje de cada línea.
+    """
+    if not lineas:
+        return []
+    tarifas = {}
+    precios, por_pieza, cantidades = [], [], []
+    for producto, unidad, cantidad in lineas:
+        clave = (producto.id, unidad)
+        if clave not in tarifas:
+            precio, pieza = tarifa(producto, unidad)
+            tarifas[clave] = (_entero(precio, ESCALA_PRECIO), max(_entero(pieza, ESCALA_CANTIDAD), 1))
+        precios.append(tarifas[clave][0])
+        por_pieza.append(tarifas[clave][1])
+        cantidades.append(_entero(Decimal(cantidad), ESCALA_CANTIDAD))
+
+    # Con montos que no caben en 64 bits se usan enteros de Python (más lento, igual de exacto)
+    tipo = np.int64 if max(precios) * max(cantidades) * ESCALA_DESCUENTO < 2 ** 62 else object
+    precios = np.array(precios, dtype=tipo)
+    cantidades = np.array(cantidades, dtype=tipo)
+    por_pieza = np.array(por_pieza, dtype=tipo)
+    piezas = (-(-cantidades // por_pieza)).tolist()
+
+    descuentos = [
+        descuento(producto, pieza) if descuento else Decimal(0)
+        for (producto, _, _), pieza in zip(lineas, piezas)
+    ]
+    factores = np.array([ESCALA_DESCUENTO - _entero(d, 100) for d in descuentos], dtype=tipo)
+
+    # Redondeo al centavo hacia arriba desde la mitad
+    escala = ESCALA_CANTIDAD * ESCALA_DESCUENTO
+    subtotales = (cantidades * precios * factores + escala // 2) // escala
+    return [
+        (Decimal(int(precio)).scaleb(-2), Decimal(int(subtotal)).scaleb(-2), int(pieza), porcentaje)
+        for precio, subtotal, pieza, porcentaje in zip(precios.tolist(), subtotales.tolist(), piezas, descuentos)
+    ]
+
+
+def comprobar_disponible(producto, piezas):
+    """StockInsuficiente si `piezas` supera el stock no reservado por cotizaciones finalizadas"""
+    disponible = disponibles([producto.id]).get(producto.id, 0)
+    if piezas > disponible:
+        raise StockInsuficiente(producto, disponible, piezas)
+
+
+def agregar_a_cotizacion(cotizacion, producto, unidad, cantidad):
+    """
+    Suma `cantidad` (en la unidad de venta) a la línea del producto o la crea.
+    Devuelve (detalle, creado). Un producto ya cotizado en otra unidad no se mezcla
+    y si la línea supera el stock disponible se lanza StockInsuficiente.
+    """
+    detalle = DetalleCotizacion.objects.filter(cotizacion=cotizacion, producto=producto).first()
+    if detalle and detalle.unidad != unidad:
+        raise PrecioNoDisponible(
+            f'{producto.nombre} ya está en la cotización por {detalle.get_unidad_display().lower()}.'
+        )
+
+    if detalle:
+        # Los totales se recalculan sobre la instancia recibida
+        detalle.cotizacion = cotizacion
+    medida = Decimal(cantidad) + (detalle.cantidad_medida if detalle else 0)
+    [(precio, _, piezas, descuento)] = cotizar_lineas([(producto, unidad, medida)], descuentos_cotizacion(cotizacion))
+    comprobar_disponible(producto, piezas)
+    if detalle:
+        detalle.cantidad_medida, detalle.cantidad, detalle.precio_unitario = medida, piezas, precio
+        detalle.descuento = descuento
+        detalle.save()
+        return detalle, False
+    detalle = DetalleCotizacion.objects.create(
+        cotizacion=cotizacion, producto=producto, unidad=unidad,
+        cantidad_medida=medida, cantidad=piezas, precio_unitario=precio, descuento=descuento,
+    )
+    return detalle, True
+
+
+def cambiar_cantidad(detalle, cantidad):
+    """
+    Reemplaza la cantidad de una línea, con el descuento por volumen que le
+    corresponda. Si supera el stock disponible se lanza StockInsuficiente.
+    """
+    [(_, _, piezas, descuento)] = cotizar_lineas(
+        [(detalle.producto, detalle.unidad, cantidad)], descuentos_cotizacion(detalle.cotizacion)
+    )
+    comprobar_disponible(detalle.producto, piezas)
+    detalle.cantidad_medida, detalle.cantidad, detalle.descuento = cantidad, piezas, descuento
+    detalle.save()
+    return detalle
+
+
+def recalcular_cotizacion(cotizacion):
+    """
+    Vuelve a cotizar todas las líneas con los precios y descuentos vigentes y
+    actualiza los totales, con un UPDATE por lote de líneas sin importar cuántas tenga.
+    """
+    detalles = list(cotizacion.detalles.select_related('producto'))
+    resultados = cotizar_lineas(
+        [(d.producto, d.unidad, d.cantidad_medida) for d in detalles], descuentos_cotizacion(cotizacion)
+    )
+    for detalle, (precio, subtotal, piezas, descuento) in zip(detalles, resultados):
+        detalle.precio_unitario, detalle.subtotal, detalle.cantidad = precio, subtotal, piezas
+        detalle.descuento = descuento
+
+    with transaction.atomic():
+        DetalleCotizacion.objects.bulk_update(
+            detalles, ['precio_unitario', 'descuento', 'subtotal', 'cantidad'], batch_size=500
+        )
+        cotizacion.calcular_totales()
+    return detalles
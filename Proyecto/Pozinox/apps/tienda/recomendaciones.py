@@ -0,0 +1,118 @@
+"""
+Recomendaciones de productos por co-ocurrencia en cotizaciones
+
+La matriz cotización × producto se trata como dispersa (pares de índices) y el
+producto Aᵀ·A, que cuenta las cotizaciones que comparten cada par de productos,
+se obtiene generando los pares dentro de cada cotización y agrupándolos.
+"""
+import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from Pozinox.routers import usar_replica
+from .models import DetalleCotizacion, Producto, RecomendacionProducto
+
+TOP_K = 8
+# Cotizaciones muy grandes aportan pares poco informativos y crecen cuadráticamente
+MAX_LINEAS_COTIZACION = 100
+MINIMO_COINCIDENCIAS = 2
+
+
+def cargar_lineas(desde):
+    """Pares (cotización, producto) de las cotizaciones no canceladas desde una fecha"""
+    lineas = DetalleCotizacion.objects.filter(
+        cotizacion__fecha_creacion__gte=desde,
+    ).exclude(cotizacion__estado='cancelada').order_by().values_list('cotizacion_id', 'producto_id')
+    with usar_replica():
+        return np.fromiter(
+            lineas.iterator(chunk_size=20000), dtype=np.dtype([('cotizacion', np.int64), ('producto', np.int64)])
+        )
+
+
+def similitudes(cotizaciones, productos, top_k=TOP_K, minimo=MINIMO_COINCIDENCIAS):
+    """
+    Similitud coseno item-item a partir de las líneas (cotización, producto).
+    Devuelve arreglos (producto, recomendado, puntaje, posición) con los `top_k`
+    más similares de cada producto que coinciden en al menos `minimo` cotizaciones.
+    """
+    vacio = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64))
+    # Filas y columnas compactas, ordenadas por cotización; una línea repetida cuenta una vez
+    filas = np.unique(cotizaciones, return_inverse=True)[1].astype(np.int64)
+    ids, columnas = np.unique(productos, return_inverse=True)
+    n = len(ids)
+    claves = np.unique(filas * n + columnas)
+    filas, columnas = claves // n, claves % n
+
+    # Se descartan las cotizaciones sin pares o demasiado grandes
+    inicios = np.flatnonzero(np.r_[True, filas[1:] != filas[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(filas)])
+    validas = (tamanos >= 2) & (tamanos <= MAX_LINEAS_COTIZACION)
+    if not validas.any():
+        return vacio
+    # Diagonal de Aᵀ·A: cotizaciones (válidas) en que aparece cada producto
+    frecuencia = np.bincount(columnas[np.repeat(validas, tamanos)], minlength=n)
+    inicios, tamanos = inicios[validas], tamanos[validas]
+
+    # Todos los pares ordenados (i, j) de cada cotización: tamaño² por cotización
+    pares = tamanos ** 2
+    desplazamiento = np.arange(pares.sum()) - np.repeat(np.cumsum(pares) - pares, pares)
+    base, tamano = np.repeat(inicios, pares), np.repeat(tamanos, pares)
+    a = columnas[base + desplazamiento // tamano]
+    b = columnas[base + desplazamiento % tamano]
+    distintos = a != b
+    par, coincidencias = np.unique(a[distintos] * n + b[distintos], return_counts=True)
+    a, b = par // n, par % n
+    puntaje = coincidencias / np.sqrt(frecuencia[a] * frecuencia[b])
+
+    suficientes = coincidencias >= minimo
+    a, b, puntaje = a[suficientes], b[suficientes], puntaje[suficientes]
+    if not len(a):
+        return vacio
+    # Por producto, de mayor a menor puntaje (y por id para desempatar de forma estable)
+    orden = np.lexsort((ids[b], -puntaje, a))
+    a, b, puntaje = a[orden], b[orden], puntaje[orden]
+    inicio_grupo = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    posicion = np.arange(len(a)) - np.repeat(inicio_grupo, np.diff(np.r_[inicio_grupo, len(a)]))
+    top = posicion < top_k
+    return ids[a[top]], ids[b[top]], puntaje[top], posicion[top]
+
+
+def calcular_recomendaciones(dias=365, top_k=TOP_K):
+    """Reemplaza la tabla de recomendaciones con las cotizaciones de los últimos `dias` días"""
+    lineas = cargar_lineas(timezone.now() - datetime.timedelta(days=dias))
+    producto, recomendado, puntaje, posicion = similitudes(lineas['cotizacion'], lineas['producto'], top_k)
+    recomendaciones = [
+        RecomendacionProducto(producto_id=p, recomendado_id=r, puntaje=round(s, 4), posicion=i)
+        for p, r, s, i in zip(producto.tolist(), recomendado.tolist(), puntaje.tolist(), posicion.tolist())
+    ]
+    with transaction.atomic():
+        RecomendacionProducto.objects.all().delete()
+        RecomendacionProducto.objects.bulk_create(recomendaciones, batch_size=2000)
+    return len(recomendaciones)
+
+
+def recomendados_para(productos_ids, excluir=(), limite=4):
+    """
+    Productos activos recomendados para un conjunto de productos, en una consulta
+    sobre el índice (producto, posición). Con varios productos se suman los puntajes.
+    """
+    filas = RecomendacionProducto.objects.filter(
+        producto_id__in=productos_ids, recomendado__activo=True,
+    ).exclude(recomendado_id__in=[*productos_ids, *excluir]).select_related('recomendado')
+
+    puntajes, productos = {}, {}
+    for fila in filas:
+        puntajes[fila.recomendado_id] = puntajes.get(fila.recomendado_id, 0) + fila.puntaje
+        productos[fila.recomendado_id] = fila.recomendado
+    mejores = sorted(puntajes, key=lambda pid: (-puntajes[pid], pid))[:limite]
+    return [productos[pid] for pid in mejores]
+
+
+def productos_relacionados(producto, limite=4):
+    """Recomendados del producto o, si aún no tiene, otros de su categoría"""
+    recomendados = recomendados_para([producto.id], limite=limite)
+    if recomendados:
+        return recomendados
+    return list(Producto.objects.filter(categoria=producto.categoria, activo=True).exclude(id=producto.id)[:limite])
@@ -1,3 +1,860 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Pozinox import exportar
+from Pozinox.routers import ReplicaRouter, fijar_base_principal, usar_replica
+from apps.usuarios.configuracion import invalidar_configuracion
+from apps.usuarios.models import ConfiguracionSistema, EmailVerificationToken, Notificacion, PasswordResetToken
+from .cortes import optimizar_cortes, primer_ajuste_decreciente
+from .exportaciones import procesar_exportaciones, purgar_exportaciones
+from .kpis import calcular_kpis, obtener_kpis
+from .pdf import datos_cotizacion
+from .mantenimiento import expirar_transferencias, purgar_borradores
+from . import planchas
+from .recomendaciones import calcular_recomendaciones, productos_relacionados, recomendados_para
+from .ventas import rango_periodo, recalcular_ventas, resumen_ventas, serie_ventas
+from .planchas import PiezaInvalida, estimar_planchas, estimar_planchas_cacheado
+from .descuentos import CACHE_KEY_VERSION as DESCUENTOS_VERSION, compilar_tabla, invalidar_descuentos, obtener_tabla
+from .precios import (
+    PrecioNoDisponible, agregar_a_cotizacion, cambiar_cantidad, cotizar_lineas, peso_por_metro, recalcular_cotizacion, tarifa,
+)
+from .models import (
+    CategoriaAcero, Cliente, Cotizacion, DetalleCotizacion, ExportacionProgramada, Producto, RecomendacionProducto, ReglaDescuento,
+    TransferenciaBancaria, VentaDiaria,
+)
+
+
+def crear_producto(codigo='P-001', **kwargs):
+    categoria, _ = CategoriaAcero.objects.get_or_create(nombre='Planchas')
+    datos = {
+        'nombre': f'Producto {codigo}',
+        'descripcion': 'Producto de prueba',
+        'codigo_producto': codigo,
+        'categoria': categoria,
+        'tipo_acero': 'inoxidable',
+        'precio_por_unidad': 1000,
+        'stock_actual': 10,
+    }
+    datos.update(kwargs)
+    return Producto.objects.create(**datos)
+
+
+class ReplicaRouterTests(TestCase):
+    """Decisiones del router de réplica"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_dentro_de_transaccion_se_lee_la_principal(self):
+        # TestCase envuelve cada test en una transacción sobre default
+        self.assertEqual(self.router.db_for_read(Producto), 'default')
+
+    def test_escrituras_y_migraciones_en_principal(self):
+        self.assertEqual(self.router.db_for_write(Producto), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'tienda'))
+        self.assertTrue(self.router.allow_migrate('default', 'tienda'))
+
+
+class ReplicaRouterSinTransaccionTests(TransactionTestCase):
+    """Lecturas reales a través de la réplica simulada"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_modelos_de_catalogo_y_reportes(self):
+        self.assertEqual(self.router.db_for_read(Producto), 'replica')
+        self.assertEqual(self.router.db_for_read(Cotizacion), 'default')
+        with usar_replica():
+            self.assertEqual(self.router.db_for_read(Cotizacion), 'replica')
+        with fijar_base_principal():
+            self.assertEqual(self.router.db_for_read(Producto), 'default')
+
+    def test_catalogo_consulta_la_replica(self):
+        crear_producto()
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('productos'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(replica.captured_queries), 0)
+
+    def test_despues_de_un_post_se_lee_la_principal(self):
+        crear_producto()
+        self.client.post(reverse('home'), {'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': 'Hola'})
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get(reverse('productos'))
+        self.assertEqual(len(replica.captured_queries), 0)
+
+
+class KpisDashboardTests(TestCase):
+    """KPIs del panel: una consulta por tabla, caché e invalidación por señales"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        crear_producto('P-001', stock_actual=2)
+        crear_producto('P-002', activo=False)
+
+    def test_calculo_en_una_consulta_por_tabla(self):
+        Cotizacion.objects.create(usuario=self.user, estado='pagada', total=1190)
+        Cotizacion.objects.create(usuario=self.user)
+        with self.assertNumQueries(4):
+            kpis = calcular_kpis()
+        self.assertEqual(kpis['total_productos'], 2)
+        self.assertEqual(kpis['productos_activos'], 1)
+        self.assertEqual(kpis['productos_stock_bajo'], 1)
+        self.assertEqual(kpis['cotizaciones_pagada'], 1)
+        self.assertEqual(kpis['cotizaciones_borrador'], 1)
+        self.assertEqual(kpis['ingresos_pagados'], 1190)
+        self.assertEqual(kpis['total_categorias'], 1)
+
+    def test_cache_e_invalidacion(self):
+        obtener_kpis()
+        with self.assertNumQueries(0):
+            obtener_kpis()
+        crear_producto('P-003')
+        self.assertEqual(obtener_kpis()['total_productos'], 3)
+
+    def test_panel_admin_renderiza_desde_kpis(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('panel_admin'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['productos_stock_bajo'], 1)
+
+
+class PanelVerificacionTransferenciasTests(TestCase):
+    """Presupuesto de consultas del panel de verificación"""
+    # usuario + perfil, conteo del paginador y página de transferencias
+    PRESUPUESTO_CONSULTAS = 3
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(self.admin)
+
+    def _crear_transferencias(self, cantidad):
+        inicio = TransferenciaBancaria.objects.count()
+        for i in range(inicio, inicio + cantidad):
+            cliente = User.objects.create_user(f'cliente{i}', f'c{i}@example.com', 'clave-segura-123')
+            cotizacion = Cotizacion.objects.create(usuario=cliente, numero_cotizacion=f'COT-{i}', total=1000)
+            TransferenciaBancaria.objects.create(
+                cotizacion=cotizacion, monto_transferencia=1000,
+                estado='verificando', verificada_por=self.admin,
+            )
+
+    def test_consultas_constantes_sin_importar_las_filas(self):
+        self._crear_transferencias(1)
+        with self.assertNumQueries(self.PRESUPUESTO_CONSULTAS):
+            self.client.get(reverse('panel_verificacion_transferencias'))
+
+        self._crear_transferencias(9)
+        with self.assertNumQueries(self.PRESUPUESTO_CONSULTAS):
+            response = self.client.get(reverse('panel_verificacion_transferencias'))
+        self.assertEqual(len(response.context['transferencias']), 10)
+
+
+class MantenimientoTests(TestCase):
+    """Barrido de transferencias vencidas, borradores abandonados y tokens"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.hace_un_mes = timezone.now() - datetime.timedelta(days=31)
+
+    def test_transferencias_vencidas_en_un_update(self):
+        for i, (estado, vencida) in enumerate([('pendiente', True), ('pendiente', False), ('verificando', True)]):
+            cotizacion = Cotizacion.objects.create(usuario=self.cliente, numero_cotizacion=f'COT-{i}')
+            TransferenciaBancaria.objects.create(
+                cotizacion=cotizacion, monto_transferencia=1000, estado=estado,
+                fecha_expiracion=self.hace_un_mes if vencida else timezone.now() + datetime.timedelta(days=1),
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(expirar_transferencias(), 1)
+        self.assertEqual(
+            list(TransferenciaBancaria.objects.order_by('cotizacion__numero_cotizacion').values_list('estado', flat=True)),
+            ['expirada', 'pendiente', 'verificando'],
+        )
+
+    def test_purga_solo_borradores_abandonados_por_lotes(self):
+        producto = crear_producto()
+        for i in range(5):
+            cotizacion = Cotizacion.objects.create(usuario=self.cliente, numero_cotizacion=f'COT-{i}')
+            DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=1, precio_unitario=1000)
+        Cotizacion.objects.filter(numero_cotizacion__in=['COT-0', 'COT-1', 'COT-2']).update(
+            fecha_actualizacion=self.hace_un_mes
+        )
+        Cotizacion.objects.filter(numero_cotizacion='COT-2').update(estado='finalizada')
+
+        self.assertEqual(purgar_borradores(dias=30, tamano_lote=1), 2)
+        self.assertEqual(
+            sorted(Cotizacion.objects.values_list('numero_cotizacion', flat=True)), ['COT-2', 'COT-3', 'COT-4']
+        )
+        self.assertEqual(DetalleCotizacion.objects.count(), 3)
+
+    def test_comando_limpia_tokens(self):
+        PasswordResetToken.objects.create(user=self.cliente, is_used=True)
+        PasswordResetToken.objects.create(user=self.cliente)
+        EmailVerificationToken.objects.create(email='nuevo@example.com', expires_at=self.hace_un_mes)
+
+        out = StringIO()
+        call_command('mantenimiento', stdout=out)
+        self.assertIn('tokens eliminados: 2', out.getvalue())
+        self.assertEqual(PasswordResetToken.objects.count(), 1)
+        self.assertFalse(EmailVerificationToken.objects.exists())
+
+
+class MotorPreciosTests(TestCase):
+    """Precios por unidad, metro y kilo"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        # Tubo de 6 m a $2.500 el metro, 1,85 kg/m
+        self.tubo = crear_producto(
+            'TUB-001', largo=Decimal('6000'), peso_por_metro=Decimal('1.85'), precio_por_metro=Decimal('2500'),
+        )
+        # Plancha inoxidable de 3 mm × 1000 mm × 2000 mm vendida por kilo
+        self.plancha = crear_producto(
+            'PL-003', grosor=Decimal('3'), ancho=Decimal('1000'), largo=Decimal('2000'), precio_por_kg=Decimal('3200'),
+        )
+
+    def test_peso_derivado_y_precios_cruzados(self):
+        self.assertEqual(peso_por_metro(self.plancha), Decimal('23.7900'))
+        # Una plancha pesa 47,58 kg; 820 kg requieren 18 planchas
+        self.assertEqual(cotizar_lineas([(self.plancha, 'kg', Decimal('820'))]),
+                         [(Decimal('3200.00'), Decimal('2624000.00'), 18, Decimal('0'))])
+        # El metro de plancha se deriva del kilo y el kilo de tubo del metro
+        self.assertEqual(tarifa(self.plancha, 'metro')[0], Decimal('76128.00'))
+        self.assertEqual(tarifa(self.tubo, 'kg')[0], Decimal('1351.35'))
+
+    def test_barra_por_kilo_sin_peso_no_se_cotiza(self):
+        # Sin peso no se sabe cuántas barras son 820 kg: no se toma 1 kg por barra
+        barra = crear_producto('BAR-001', largo=Decimal('6000'), precio_por_kg=Decimal('1500'), stock_actual=1000)
+        with self.assertRaises(PrecioNoDisponible):
+            cotizar_lineas([(barra, 'kg', Decimal('820'))])
+        # Sin largo el stock va en kilos
+        granel = crear_producto('GRA-001', precio_por_kg=Decimal('1500'))
+        self.assertEqual(tarifa(granel, 'kg'), (Decimal('1500.00'), Decimal(1)))
+
+        # El estimador de planchas tampoco cuenta 1 kg por plancha: cotiza planchas
+        plancha = crear_producto('PL-SIN', ancho=Decimal('1000'), largo=Decimal('2000'), precio_por_kg=Decimal('3200'))
+        self.client.force_login(self.cliente)
+        cotizacion = Cotizacion.objects.create(usuario=self.cliente)
+        cuerpo = {'producto': plancha.id, 'piezas': [{'ancho': 500, 'largo': 500, 'cantidad': 2}]}
+        respuesta = self.client.post(
+            reverse('estimar_planchas_api', args=[cotizacion.id]), json.dumps(cuerpo), content_type='application/json',
+        ).json()
+        self.assertEqual((respuesta['unidad'], respuesta['cantidad']), ('unidad', 1))
+
+    def test_agregar_metros_guarda_la_unidad(self):
+        self.client.force_login(self.cliente)
+        cotizacion = Cotizacion.objects.create(usuario=self.cliente)
+        url = reverse('agregar_producto_cotizacion', args=[cotizacion.id])
+        self.client.post(url, {'producto_id': self.tubo.id, 'unidad': 'metro', 'cantidad': '37,5'})
+        self.client.post(url, {'producto_id': self.tubo.id, 'unidad': 'metro', 'cantidad': '0.5'})
+
+        detalle = DetalleCotizacion.objects.get()
+        self.assertEqual((detalle.unidad, detalle.cantidad_medida, detalle.cantidad), ('metro', Decimal('38'), 7))
+        self.assertEqual(detalle.subtotal, Decimal('95000'))
+        self.assertEqual(detalle.cantidad_legible, '38 m')
+        cotizacion.refresh_from_db()
+        self.assertEqual(cotizacion.total, Decimal('113050'))
+        response = self.client.get(reverse('detalle_cotizacion', args=[cotizacion.id]))
+        self.assertContains(response, '$2500 / m')
+
+        # No se mezcla con otra unidad de venta
+        self.client.post(url, {'producto_id': self.tubo.id, 'unidad': 'kg', 'cantidad': '5'})
+        self.assertEqual(DetalleCotizacion.objects.get().unidad, 'metro')
+
+    def test_benchmark_cotizacion_de_mil_lineas(self):
+        categoria = self.tubo.categoria
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Perfil {i}', descripcion='Perfil', codigo_producto=f'PER-{i:04d}', categoria=categoria,
+                tipo_acero='carbono', precio_por_unidad=Decimal('9990'), precio_por_kg=Decimal('1234.56'),
+                largo=Decimal('6000'), peso_por_metro=Decimal(i % 17 + 1) / 4,
+            )
+            for i in range(1000)
+        ])
+        cotizacion = Cotizacion.objects.create(usuario=self.cliente)
+        unidades = ['unidad', 'metro', 'kg']
+        DetalleCotizacion.objects.bulk_create([
+            DetalleCotizacion(
+                cotizacion=cotizacion, producto=producto, unidad=unidades[i % 3],
+                cantidad_medida=Decimal(i % 7 + 1) + Decimal('0.125'), precio_unitario=0,
+            )
+            for i, producto in enumerate(productos)
+        ])
+        DetalleCotizacion.objects.filter(unidad='unidad').update(cantidad_medida=7)
+
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connections['default']) as contexto:
+            detalles = recalcular_cotizacion(cotizacion)
+        duracion = time.perf_counter() - inicio
+        self.assertLess(duracion, 2)
+        # Lectura, UPDATE por lotes (SQLite los achica por su límite de parámetros), suma y totales
+        self.assertLess(len(contexto.captured_queries), 15)
+
+        # Igual al cálculo línea a línea con Decimal
+        esperado = sum(
+            (tarifa(d.producto, d.unidad)[0] * d.cantidad_medida).quantize(Decimal('0.01')) for d in detalles
+        )
+        cotizacion.refresh_from_db()
+        self.assertEqual(cotizacion.subtotal, esperado)
+
+
+class OptimizadorCortesTests(TestCase):
+    """Corte de barras con el menor número de barras"""
+
+    def test_mejora_first_fit_decreasing(self):
+        cortes = [400] * 4 + [350] * 4 + [250] * 4
+        self.assertEqual(len(primer_ajuste_decreciente(cortes, 1000)), 5)
+        plan = optimizar_cortes(cortes, 1000)
+        self.assertEqual((plan['barras'], plan['metodo'], plan['desperdicio_mm']), (4, 'patrones', 0))
+
+    def test_ancho_de_corte(self):
+        # Tres cortes de 2000 mm caben en 6000 mm solo si la sierra no consume material
+        self.assertEqual(optimizar_cortes([2000] * 3, 6000)['barras'], 1)
+        plan = optimizar_cortes([2000] * 3, 6000, ancho_corte=3)
+        self.assertEqual(plan['barras'], 2)
+        self.assertEqual(sum(p['repeticiones'] for p in plan['patrones']), 2)
+
+    def test_benchmark_cientos_de_cortes(self):
+        aleatorio = random.Random(7)
+        medidas = [455, 615, 730, 980, 1210, 1880, 2350, 2990]
+        for cantidad in (200, 500):
+            cortes = [aleatorio.choice(medidas) for _ in range(cantidad)]
+            inicio = time.perf_counter()
+            plan = optimizar_cortes(cortes, 6000, ancho_corte=3)
+            self.assertLess(time.perf_counter() - inicio, 1)
+            self.assertLessEqual(plan['barras'], len(primer_ajuste_decreciente([c + 3 for c in cortes], 6003)))
+            self.assertGreaterEqual(plan['barras'], plan['cota_inferior'])
+
+    def test_api_agrega_las_barras_a_la_cotizacion(self):
+        cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        tubo = crear_producto('TUB-001', largo=Decimal('6000'), precio_por_unidad=Decimal('15000'))
+        cotizacion = Cotizacion.objects.create(usuario=cliente)
+        self.client.force_login(cliente)
+
+        url = reverse('optimizar_cortes_api', args=[cotizacion.id])
+        cuerpo = {'producto': tubo.id, 'cortes': [{'largo': 1500, 'cantidad': 7}, {'largo': 2900, 'cantidad': 2}]}
+        respuesta = self.client.post(url, json.dumps(cuerpo), content_type='application/json').json()
+        self.assertEqual((respuesta['barras'], respuesta['cantidad_en_cotizacion']), (3, 3))
+        respuesta = self.client.post(url, json.dumps(cuerpo), content_type='application/json').json()
+        self.assertEqual(respuesta['cantidad_en_cotizacion'], 6)
+        self.assertEqual(respuesta['total_cotizacion'], 107100.0)
+
+        cuerpo['cortes'] = [{'largo': 6500}]
+        response = self.client.post(url, json.dumps(cuerpo), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DescuentosTests(TestCase):
+    """Descuentos por tipo de cliente y volumen compilados en memoria"""
+
+    def setUp(self):
+        cache.clear()
+        self.distribuidor = User.objects.create_user('distribuidor', 'd@example.com', 'clave-segura-123')
+        Cliente.objects.create(
+            usuario=self.distribuidor, tipo_cliente='distribuidor', nombre='Dist', apellido='Ribuidor',
+            rut='11111111-1', email='d@example.com', telefono='1', direccion='Calle 1', comuna='Santiago', ciudad='Santiago',
+        )
+        self.particular = User.objects.create_user('particular', 'p@example.com', 'clave-segura-123')
+        self.producto = crear_producto('TUB-010', precio_por_unidad=Decimal('10000'), stock_actual=100)
+        ReglaDescuento.objects.bulk_create([
+            ReglaDescuento(nombre='Distribuidor', tipo_cliente='distribuidor', porcentaje=Decimal('5')),
+            ReglaDescuento(nombre='Tubo x10', producto=self.producto, cantidad_minima=10, porcentaje=Decimal('3')),
+            ReglaDescuento(
+                nombre='Tubo x50 distribuidor', tipo_cliente='distribuidor', producto=self.producto,
+                cantidad_minima=50, porcentaje=Decimal('12.5'),
+            ),
+            ReglaDescuento(
+                nombre='Planchas x20', categoria=self.producto.categoria, cantidad_minima=20, porcentaje=Decimal('7'),
+            ),
+        ])
+
+    def tearDown(self):
+        invalidar_descuentos()
+
+    def test_gana_el_mayor_descuento_aplicable(self):
+        tabla = compilar_tabla()
+        casos = [
+            ('particular', 1, 0), ('particular', 10, 3), ('particular', 25, 7),
+            ('distribuidor', 1, 5), ('distribuidor', 25, 7), ('distribuidor', 60, Decimal('12.5')),
+        ]
+        for tipo, piezas, esperado in casos:
+            self.assertEqual(tabla.descuento(tipo, self.producto, piezas), esperado, (tipo, piezas))
+
+    def test_subtotal_con_descuento_por_volumen(self):
+        cotizacion = Cotizacion.objects.create(usuario=self.distribuidor)
+        detalle, _ = agregar_a_cotizacion(cotizacion, self.producto, 'unidad', 49)
+        self.assertEqual((detalle.descuento, detalle.subtotal), (7, Decimal('455700.00')))
+        cambiar_cantidad(detalle, 50)
+        self.assertEqual((detalle.descuento, detalle.subtotal), (Decimal('12.5'), Decimal('437500.00')))
+        cotizacion.refresh_from_db()
+        self.assertEqual(cotizacion.subtotal, Decimal('437500.00'))
+
+    def test_vigencia_y_cambios_de_reglas(self):
+        manana = timezone.now() + datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReglaDescuento.objects.create(nombre='Liquidación', porcentaje=Decimal('30'), fecha_inicio=manana)
+        self.assertEqual(obtener_tabla().descuento('particular', self.producto, 1), 0)
+        self.assertEqual(obtener_tabla().vigente_hasta, manana)
+        self.assertEqual(compilar_tabla(manana).descuento('particular', self.producto, 1), 30)
+
+        # Otro proceso modifica las reglas: la versión compartida obliga a recompilar
+        ReglaDescuento.objects.filter(nombre='Tubo x10').update(cantidad_minima=1)
+        self.assertEqual(obtener_tabla().descuento('particular', self.producto, 1), 0)
+        cache.set(DESCUENTOS_VERSION, 'nueva-version')
+        self.assertEqual(obtener_tabla().descuento('particular', self.producto, 1), 3)
+
+    def test_cotizacion_de_200_lineas_sin_consultas_por_linea(self):
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Barra {i}', descripcion='Barra', codigo_producto=f'BAR-{i:03d}', tipo_acero='carbono',
+                categoria=self.producto.categoria, precio_por_unidad=Decimal('1990'),
+            )
+            for i in range(200)
+        ])
+        cotizacion = Cotizacion.objects.create(usuario=self.distribuidor)
+        DetalleCotizacion.objects.bulk_create([
+            DetalleCotizacion(cotizacion=cotizacion, producto=producto, cantidad=i % 30 + 1, cantidad_medida=i % 30 + 1,
+                              precio_unitario=0)
+            for i, producto in enumerate(productos)
+        ])
+        obtener_tabla()
+        with CaptureQueriesContext(connections['default']) as contexto:
+            detalles = recalcular_cotizacion(cotizacion)
+        consultas = [q['sql'] for q in contexto.captured_queries]
+        # Las reglas ya están compiladas; el tipo de cliente se lee una vez por cotización
+        self.assertFalse(any('tienda_regladescuento' in sql for sql in consultas))
+        self.assertEqual(sum('tienda_cliente' in sql for sql in consultas), 1)
+        self.assertLess(len(consultas), 12)
+        self.assertEqual({d.descuento for d in detalles}, {5, 7})
+        self.assertEqual(detalles[19].subtotal, Decimal('37014.00'))
+
+
+class RecomendacionesTests(TestCase):
+    """Recomendaciones por co-ocurrencia en cotizaciones"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.productos = [crear_producto(f'P-{i}', stock_actual=100) for i in range(5)]
+        canastas = [(0, 1, 2), (0, 1), (0, 1, 3), (0, 2), (1, 2), (3,)]
+        for canasta in canastas:
+            cotizacion = Cotizacion.objects.create(usuario=self.cliente)
+            DetalleCotizacion.objects.bulk_create([
+                DetalleCotizacion(cotizacion=cotizacion, producto=self.productos[i], precio_unitario=1000)
+                for i in canasta
+            ])
+
+    def test_similitud_coseno_y_top_k(self):
+        p = self.productos
+        self.assertEqual(call_command('calcular_recomendaciones', stdout=StringIO()), None)
+        recomendaciones = list(RecomendacionProducto.objects.filter(producto=p[0]).values_list('recomendado', 'puntaje'))
+        # P-0 y P-1 coinciden en 3 de sus 4 cotizaciones; P-3 solo una vez (bajo el mínimo)
+        self.assertEqual(recomendaciones, [(p[1].id, 0.75), (p[2].id, 0.5774)])
+
+        calcular_recomendaciones(top_k=1)
+        self.assertEqual(RecomendacionProducto.objects.filter(producto=p[0]).count(), 1)
+
+    def test_vistas_leen_en_una_consulta(self):
+        p = self.productos
+        calcular_recomendaciones()
+        with self.assertNumQueries(1):
+            self.assertEqual(recomendados_para([p[0].id]), [p[1], p[2]])
+        # Sin recomendaciones se muestran productos de la misma categoría
+        self.assertEqual(len(productos_relacionados(p[4])), 4)
+
+        response = self.client.get(reverse('detalle_producto', args=[p[2].id]))
+        self.assertEqual(response.context['productos_relacionados'], [p[0], p[1]])
+
+        self.client.force_login(self.cliente)
+        cotizacion = Cotizacion.objects.create(usuario=self.cliente)
+        DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=p[1], precio_unitario=1000)
+        response = self.client.get(reverse('detalle_cotizacion', args=[cotizacion.id]))
+        self.assertEqual(response.context['productos_sugeridos'], [p[0], p[2]])
+
+
+class VentasDiariasTests(TestCase):
+    """Agregados diarios de ventas y reportes sobre ellos"""
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123', first_name='Ana')
+        self.plancha = crear_producto('PL-001', precio_por_unidad=Decimal('50000'))
+        otra = CategoriaAcero.objects.create(nombre='Tubos')
+        self.tubo = crear_producto('TUB-001', categoria=otra, precio_por_unidad=Decimal('8000'))
+
+    def _venta(self, fecha_pago, metodo, lineas):
+        cotizacion = Cotizacion.objects.create(usuario=self.cliente, estado='finalizada', metodo_pago=metodo)
+        for producto, cantidad in lineas:
+            DetalleCotizacion.objects.create(
+                cotizacion=cotizacion, producto=producto, cantidad=cantidad, precio_unitario=producto.precio_por_unidad,
+            )
+        cotizacion.estado, cotizacion.fecha_pago = 'pagada', fecha_pago
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion.save()
+        return cotizacion
+
+    def test_pago_y_cancelacion_actualizan_el_dia(self):
+        pago = timezone.make_aware(datetime.datetime(2026, 3, 10, 23, 30))
+        cotizacion = self._venta(pago, 'efectivo', [(self.plancha, 2), (self.tubo, 5)])
+        self._venta(pago, 'transferencia', [(self.tubo, 1)])
+        filas = {
+            (v.dimension, v.clave): (v.cotizaciones, v.unidades, v.monto)
+            for v in VentaDiaria.objects.filter(fecha=datetime.date(2026, 3, 10))
+        }
+        self.assertEqual(filas[('producto', str(self.tubo.id))], (2, 6, Decimal('48000')))
+        self.assertEqual(filas[('categoria', str(self.plancha.categoria_id))], (1, 2, Decimal('100000')))
+        self.assertEqual(filas[('cliente', str(self.cliente.id))], (2, 8, Decimal('148000')))
+        self.assertEqual(filas[('metodo_pago', 'efectivo')], (1, 7, Decimal('140000')))
+
+        cotizacion.estado = 'cancelada'
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion.save()
+        self.assertFalse(VentaDiaria.objects.filter(dimension='metodo_pago', clave='efectivo').exists())
+
+    def test_reporte_de_mes_y_anio_desde_los_agregados(self):
+        self._venta(timezone.make_aware(datetime.datetime(2026, 1, 15, 12)), 'mercadopago', [(self.plancha, 1)])
+        self._venta(timezone.make_aware(datetime.datetime(2026, 2, 3, 12)), 'efectivo', [(self.tubo, 10)])
+        self._venta(timezone.make_aware(datetime.datetime(2026, 2, 20, 12)), 'efectivo', [(self.plancha, 3)])
+
+        serie = serie_ventas(*rango_periodo(2026), por_mes=True)
+        self.assertEqual(
+            [(p['periodo'].month, p['total_cotizaciones'], p['total_monto']) for p in serie],
+            [(1, 1, Decimal('50000')), (2, 2, Decimal('230000'))],
+        )
+        resumen = resumen_ventas(*rango_periodo(2026, 2), 'producto')
+        self.assertEqual([fila['clave'] for fila in resumen], [str(self.plancha.id), str(self.tubo.id)])
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        url = reverse('reporte_ventas')
+        # usuario, serie, ranking de la dimensión y nombres de las claves
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'anio': 2026, 'dimension': 'categoria'})
+        self.assertEqual(response.context['totales']['total_monto'], Decimal('280000'))
+        self.assertEqual([fila['nombre'] for fila in response.context['filas']], ['Planchas', 'Tubos'])
+        response = self.client.get(url, {'anio': 2026, 'mes': 13})
+        self.assertEqual(response.context['mes'], None)
+
+    def test_repaso_nocturno_reconstruye_el_periodo(self):
+        self._venta(timezone.now(), 'efectivo', [(self.tubo, 2)])
+        VentaDiaria.objects.all().delete()
+        salida = StringIO()
+        call_command('actualizar_ventas_diarias', stdout=salida)
+        self.assertIn('4 agregados', salida.getvalue())
+        self.assertEqual(VentaDiaria.objects.get(dimension='producto').unidades, 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Advisory locks solo en PostgreSQL')
+class VentasDiariasConcurrenciaTests(TransactionTestCase):
+    """Dos pagos del mismo día confirmados a la vez no se pisan al rehacer el día"""
+    databases = {'default', 'replica'}
+    HILOS = 6
+    VUELTAS = 5
+
+    def test_reconstrucciones_simultaneas_del_mismo_dia(self):
+        cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        producto = crear_producto('PL-001', precio_por_unidad=Decimal('50000'))
+        dia = datetime.date(2026, 3, 10)
+        for _ in range(2):
+            cotizacion = Cotizacion.objects.create(usuario=cliente, estado='finalizada', metodo_pago='efectivo')
+            DetalleCotizacion.objects.create(
+                cotizacion=cotizacion, producto=producto, cantidad=1, precio_unitario=producto.precio_por_unidad,
+            )
+            cotizacion.estado = 'pagada'
+            cotizacion.fecha_pago = timezone.make_aware(datetime.datetime(2026, 3, 10, 12))
+            cotizacion.save()
+        VentaDiaria.objects.all().delete()
+        barrera = threading.Barrier(self.HILOS)
+        errores = []
+
+        def rehacer():
+            try:
+                barrera.wait()
+                for _ in range(self.VUELTAS):
+                    recalcular_ventas(dia)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=rehacer) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        fila = VentaDiaria.objects.get(fecha=dia, dimension='producto')
+        self.assertEqual((fila.cotizaciones, fila.unidades), (2, 2))
+
+
+class EstimadorPlanchasTests(TestCase):
+    """Estimación de planchas para piezas rectangulares"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_piezas_exactas_y_ancho_de_corte(self):
+        piezas = [(1220, 610, 2), (610, 1220, 2)]
+        estimacion = estimar_planchas(piezas, 1220, 2440)
+        self.assertEqual((estimacion['planchas'], estimacion['desperdicio_pct']), (1, 0))
+        # Con 3 mm de corte los cuatro estantes ya no caben en el largo de la plancha
+        self.assertEqual(estimar_planchas(piezas, 1220, 2440, ancho_corte=3)['planchas'], 2)
+        with self.assertRaises(PiezaInvalida):
+            estimar_planchas([(1300, 2500, 1)], 1220, 2440)
+
+    def test_benchmark_500_piezas(self):
+        aleatorio = random.Random(11)
+        piezas = [(aleatorio.randint(80, 1200), aleatorio.randint(80, 1200), 1) for _ in range(500)]
+        inicio = time.perf_counter()
+        estimacion = estimar_planchas(piezas, 1220, 2440, ancho_corte=3)
+        self.assertLess(time.perf_counter() - inicio, 1)
+        area = sum(a * l for a, l, _ in piezas)
+        self.assertGreaterEqual(estimacion['planchas'], area / (1220 * 2440))
+        self.assertEqual(estimacion['piezas'], 500)
+
+    def test_cache_ignora_orden_y_giro_de_las_piezas(self):
+        with mock.patch.object(planchas, 'empaquetar_estantes', wraps=planchas.empaquetar_estantes) as empaquetar:
+            primera = estimar_planchas_cacheado([(300, 500, 2), (400, 400, 1)], 1220, 2440)
+            segunda = estimar_planchas_cacheado([(400, 400, 1), (500, 300, 1), (300, 500, 1)], 1220, 2440)
+            self.assertEqual(empaquetar.call_count, 1)
+            estimar_planchas_cacheado([(400, 400, 1)], 1220, 2440)
+            self.assertEqual(empaquetar.call_count, 2)
+        self.assertEqual(primera, segunda)
+
+    def test_api_agrega_kilos_a_la_cotizacion(self):
+        cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        plancha = crear_producto(
+            'PL-002', grosor=Decimal('2'), ancho=Decimal('1220'), largo=Decimal('2440'), precio_por_kg=Decimal('3000'),
+        )
+        cotizacion = Cotizacion.objects.create(usuario=cliente)
+        self.client.force_login(cliente)
+
+        url = reverse('estimar_planchas_api', args=[cotizacion.id])
+        cuerpo = {'producto': plancha.id, 'piezas': [{'ancho': 600, 'largo': 1000, 'cantidad': 8}]}
+        respuesta = self.client.post(url, json.dumps(cuerpo), content_type='application/json').json()
+        self.assertEqual((respuesta['planchas'], respuesta['unidad'], respuesta['cantidad']), (2, 'kg', 94.424))
+        detalle = cotizacion.detalles.get()
+        self.assertEqual((detalle.unidad, detalle.cantidad, detalle.cantidad_medida), ('kg', 2, Decimal('94.424')))
+        self.assertEqual(detalle.subtotal, Decimal('283272'))
+
+        cuerpo['piezas'] = [{'ancho': 1300, 'largo': 2500}]
+        response = self.client.post(url, json.dumps(cuerpo), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        # json.dumps escribe NaN e Infinity tal cual
+        for pieza in ({'ancho': float('nan'), 'largo': 500}, {'ancho': 500, 'largo': float('inf')},
+                      {'ancho': 500, 'largo': 500, 'cantidad': float('inf')}):
+            cuerpo['piezas'] = [pieza]
+            response = self.client.post(url, json.dumps(cuerpo), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class ExportacionesTests(TestCase):
+    """Exportaciones en flujo a CSV y XLSX y en segundo plano"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(self.admin)
+        self.activo = crear_producto('PL-001', nombre='Plancha <2mm> & "pulida"')
+        self.inactivo = crear_producto('PL-002', activo=False)
+
+    def _leer_xlsx(self, contenido):
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            self.assertIn('xl/styles.xml', libro.namelist())
+            hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        return [
+            [''.join(c.itertext()) for c in fila.findall('x:c', ns)]
+            for fila in hoja.findall('x:sheetData/x:row', ns)
+        ]
+
+    def test_xlsx_se_escribe_en_fragmentos(self):
+        filas = ([i, f'Fila {i}\x01', datetime.date(2026, 1, 1), None, True] for i in range(exportar.TAMANO_LOTE * 2 + 1))
+        fragmentos = list(exportar.filas_xlsx(['N', 'Texto', 'Fecha', 'Vacía', 'Sí'], filas))
+        self.assertGreater(len(fragmentos), 3)
+        filas = self._leer_xlsx(b''.join(fragmentos))
+        self.assertEqual(len(filas), exportar.TAMANO_LOTE * 2 + 2)
+        self.assertEqual(filas[0], ['N', 'Texto', 'Fecha', 'Vacía', 'Sí'])
+        # 2026-01-01 es el día 46023 de Excel
+        self.assertEqual(filas[1], ['0', 'Fila 0', '46023', '', '1'])
+
+    def test_exporta_productos_con_los_filtros_del_listado(self):
+        url = reverse('exportar_datos', args=['productos', 'csv'])
+        response = self.client.get(url, {'estado': 'activos'})
+        self.assertTrue(response.streaming)
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual([fila[0] for fila in filas], ['Código', 'PL-001'])
+        self.assertEqual(filas[1][1], 'Plancha <2mm> & "pulida"')
+
+        response = self.client.get(reverse('exportar_datos', args=['productos', 'xlsx']), {'q': 'PL-00'})
+        filas = self._leer_xlsx(b''.join(response.streaming_content))
+        self.assertEqual(sorted(fila[0] for fila in filas[1:]), ['PL-001', 'PL-002'])
+        self.assertEqual(filas[1][1] if filas[1][0] == 'PL-001' else filas[2][1], 'Plancha <2mm> & "pulida"')
+
+        self.assertEqual(self.client.get(reverse('exportar_datos', args=['pedidos', 'csv'])).status_code, 404)
+
+    def test_exporta_cotizaciones_linea_por_linea(self):
+        cotizacion = Cotizacion.objects.create(usuario=self.admin, estado='finalizada')
+        for producto in (self.activo, self.inactivo):
+            DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=2, precio_unitario=1000)
+        Cotizacion.objects.create(usuario=self.admin, estado='borrador')
+
+        response = self.client.get(reverse('exportar_datos', args=['cotizaciones', 'csv']), {'estado': 'finalizada'})
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(len(filas), 3)
+        self.assertEqual({fila[0] for fila in filas[1:]}, {cotizacion.numero_cotizacion})
+        self.assertEqual([fila[7] for fila in filas[1:]], ['PL-001', 'PL-002'])
+
+    def test_exportacion_grande_en_segundo_plano(self):
+        with tempfile.TemporaryDirectory() as privado, tempfile.TemporaryDirectory() as media, self.settings(
+            EXPORTACION_MAX_FILAS_DIRECTA=1, EXPORTACIONES_ROOT=privado, MEDIA_ROOT=media,
+        ):
+            response = self.client.get(reverse('exportar_datos', args=['productos', 'xlsx']), {'page': 3})
+            self.assertRedirects(response, reverse('lista_exportaciones'))
+            trabajo = ExportacionProgramada.objects.get()
+            self.assertEqual((trabajo.estado, trabajo.filas, trabajo.parametros), ('pendiente', 2, {}))
+
+            salida = StringIO()
+            call_command('procesar_exportaciones', stdout=salida)
+            self.assertIn('1 exportaciones generadas', salida.getvalue())
+            trabajo.refresh_from_db()
+            self.assertEqual(trabajo.estado, 'completada')
+            self.assertTrue(Notificacion.objects.filter(usuario=self.admin, objeto_id=trabajo.id).exists())
+            # Fuera de MEDIA_ROOT, sin URL pública y con un nombre no adivinable
+            self.assertTrue(trabajo.archivo.path.startswith(privado))
+            self.assertEqual(os.listdir(media), [])
+            with self.assertRaises(ValueError):
+                trabajo.archivo.url
+            self.assertRegex(os.path.basename(trabajo.archivo.name), r'^productos_\d{8}_\d{4}_[\w-]{16}\.xlsx$')
+            response = self.client.get(reverse('admin:tienda_exportacionprogramada_change', args=[trabajo.id]))
+            self.assertContains(response, trabajo.archivo.name)
+
+            response = self.client.get(reverse('descargar_exportacion', args=[trabajo.id]))
+            filas = self._leer_xlsx(b''.join(response.streaming_content))
+            self.assertEqual(len(filas), 3)
+
+            ExportacionProgramada.objects.filter(id=trabajo.id).update(
+                fecha_creacion=timezone.now() - datetime.timedelta(days=30)
+            )
+            ruta = trabajo.archivo.path
+            self.assertEqual(purgar_exportaciones(), 1)
+            self.assertFalse(os.path.exists(ruta))
+
+    def test_csv_sin_formulas_y_filtros_invalidos(self):
+        crear_producto('=HYPERLINK("http://x")')
+        response = self.client.get(reverse('exportar_datos', args=['productos', 'csv']))
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertIn('\'=HYPERLINK("http://x")', [fila[0] for fila in filas])
+        self.assertEqual(exportar.celda_xlsx('@SUM(A1)'), '<c t="inlineStr"><is><t xml:space="preserve">\'@SUM(A1)</t></is></c>')
+        self.assertEqual(exportar.celda_xlsx(-5), '<c><v>-5</v></c>')
+
+        response = self.client.get(reverse('exportar_datos', args=['movimientos', 'csv']), {'producto': 'abc'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_exportacion_interrumpida_se_reintenta(self):
+        trabajo = ExportacionProgramada.objects.create(usuario=self.admin, exportacion='productos', formato='csv')
+        hace_horas = timezone.now() - datetime.timedelta(hours=3)
+        ExportacionProgramada.objects.filter(id=trabajo.id).update(estado='procesando', fecha_inicio=hace_horas, intentos=1)
+        with tempfile.TemporaryDirectory() as privado, self.settings(EXPORTACIONES_ROOT=privado):
+            self.assertEqual(procesar_exportaciones(), 1)
+            trabajo.refresh_from_db()
+            self.assertEqual((trabajo.estado, trabajo.intentos), ('completada', 2))
+            trabajo.archivo.delete(save=False)
+
+        # Sin más intentos queda como fallida
+        ExportacionProgramada.objects.filter(id=trabajo.id).update(estado='procesando', fecha_inicio=hace_horas, intentos=3)
+        self.assertEqual(procesar_exportaciones(), 0)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'error')
+
+
+class PdfCotizacionesTests(TestCase):
+    """PDF de una cotización y por lote"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        producto = crear_producto('PL-001')
+        self.cotizaciones = []
+        for _ in range(3):
+            cotizacion = Cotizacion.objects.create(usuario=self.cliente, estado='finalizada')
+            DetalleCotizacion.objects.create(cotizacion=cotizacion, producto=producto, cantidad=2, precio_unitario=1000)
+            self.cotizaciones.append(cotizacion)
+
+    def test_el_cliente_descarga_su_cotizacion(self):
+        self.client.force_login(self.cliente)
+        response = self.client.get(reverse('descargar_cotizacion_pdf', args=[self.cotizaciones[0].id]))
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('descargar_cotizacion_pdf', args=[self.cotizaciones[0].id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_lote_en_zip_y_en_un_solo_pdf(self):
+        self.client.force_login(self.admin)
+        url = reverse('cotizaciones_pdf_lote')
+        ids = ','.join(str(c.id) for c in self.cotizaciones[:2])
+        with self.assertNumQueries(5):
+            # sesión, usuario, conteo, cotizaciones con su usuario y detalles con su producto
+            response = self.client.get(url, {'ids': ids})
+            contenido = b''.join(response.streaming_content)
+        with zipfile.ZipFile(BytesIO(contenido)) as archivo:
+            self.assertEqual(
+                archivo.namelist(), [f'Cotizacion_{c.numero_cotizacion}.pdf' for c in self.cotizaciones[:2]]
+            )
+            self.assertTrue(all(archivo.read(nombre).startswith(b'%PDF') for nombre in archivo.namelist()))
+
+        response = self.client.get(url, {'usuario': self.cliente.id, 'formato': 'pdf'})
+        pdf = b''.join(response.streaming_content)
+        self.assertGreaterEqual(pdf.count(b'/Type /Page\n'), 3)
+
+        with self.settings(PDF_LOTE_MAX=2):
+            self.assertRedirects(self.client.get(url), reverse('lista_exportaciones'))
+
+    def test_iva_con_la_tasa_de_la_cotizacion(self):
+        cotizacion = self.cotizaciones[0]
+        recalcular_cotizacion(cotizacion)
+        self.assertEqual((cotizacion.iva_porcentaje, cotizacion.iva), (Decimal('19'), Decimal('380')))
+        # Un cambio de tasa posterior no cambia lo ya cotizado
+        ConfiguracionSistema.objects.create(iva_porcentaje=Decimal('10'))
+        invalidar_configuracion()
+        self.addCleanup(invalidar_configuracion)
+        cotizacion = Cotizacion.objects.get(id=cotizacion.id)
+        self.assertEqual(datos_cotizacion(cotizacion)['etiqueta_iva'], 'IVA (19%)')
+        self.client.force_login(self.cliente)
+        self.assertContains(self.client.get(reverse('detalle_cotizacion', args=[cotizacion.id])), 'IVA (19%)')
+
+        borrador = Cotizacion.objects.create(usuario=self.cliente)
+        DetalleCotizacion.objects.create(cotizacion=borrador, producto=cotizacion.detalles.get().producto,
+                                         cantidad=1, precio_unitario=1000)
+        recalcular_cotizacion(borrador)
+        self.assertEqual((borrador.etiqueta_iva, borrador.iva), ('IVA (10%)', Decimal('100')))
+
+    def test_benchmark_con_pool_de_procesos(self):
+        salida = StringIO()
+        call_command('benchmark_pdf', cotizaciones=4, lineas=3, procesos=[1, 2], stdout=salida)
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertTrue(all('4 cotizaciones' in linea and 'cotizaciones/s' in linea for linea in lineas))
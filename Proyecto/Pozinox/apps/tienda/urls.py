@@ -9,6 +9,11 @@ urlpatterns = [
     
     # Panel Admin
     path('panel-admin/', views.panel_admin, name='panel_admin'),
+    path('panel-admin/ventas/', views.reporte_ventas, name='reporte_ventas'),
+    path('panel-admin/cotizaciones/pdf/', views.cotizaciones_pdf_lote, name='cotizaciones_pdf_lote'),
+    path('panel-admin/exportaciones/', views.lista_exportaciones, name='lista_exportaciones'),
+    path('panel-admin/exportaciones/<int:exportacion_id>/descargar/', views.descargar_exportacion, name='descargar_exportacion'),
+    path('panel-admin/exportaciones/<slug:nombre>/<slug:formato>/', views.exportar_datos, name='exportar_datos'),
     path('panel-admin/productos/', views.lista_productos_admin, name='lista_productos_admin'),
     path('panel-admin/productos/crear/', views.crear_producto, name='crear_producto'),
     path('panel-admin/productos/editar/<int:producto_id>/', views.editar_producto, name='editar_producto'),
@@ -25,6 +30,8 @@ urlpatterns = [
     path('cotizaciones/crear/', views.crear_cotizacion, name='crear_cotizacion'),
     path('cotizaciones/<int:cotizacion_id>/', views.detalle_cotizacion, name='detalle_cotizacion'),
     path('cotizaciones/<int:cotizacion_id>/agregar-producto/', views.agregar_producto_cotizacion, name='agregar_producto_cotizacion'),
+    path('cotizaciones/<int:cotizacion_id>/optimizar-cortes/', views.optimizar_cortes_api, name='optimizar_cortes_api'),
+    path('cotizaciones/<int:cotizacion_id>/estimar-planchas/', views.estimar_planchas_api, name='estimar_planchas_api'),
     path('cotizaciones/detalle/<int:detalle_id>/actualizar-cantidad/', views.actualizar_cantidad_producto, name='actualizar_cantidad_producto'),
     path('cotizaciones/detalle/<int:detalle_id>/eliminar/', views.eliminar_producto_cotizacion, name='eliminar_producto_cotizacion'),
     path('cotizaciones/<int:cotizacion_id>/finalizar/', views.finalizar_cotizacion, name='finalizar_cotizacion'),
@@ -0,0 +1,173 @@
+"""
+Reportes de ventas sobre agregados diarios de las cotizaciones pagadas
+
+Los agregados de un día se rehacen completos desde las cotizaciones cuando una
+cotización de ese día entra o sale del estado pagada, y un proceso nocturno
+repasa los últimos días. Los reportes solo leen VentaDiaria.
+"""
+import calendar
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CategoriaAcero, Cotizacion, DetalleCotizacion, Producto, VentaDiaria
+
+# Campo de DetalleCotizacion por el que se agrupa cada dimensión
+CAMPOS_DIMENSION = {
+    'producto': 'producto_id',
+    'categoria': 'producto__categoria_id',
+    'cliente': 'cotizacion__usuario_id',
+    'metodo_pago': 'cotizacion__metodo_pago',
+}
+
+# Espacio de nombres de los advisory locks de PostgreSQL (primer argumento)
+CLAVE_BLOQUEO = 4700
+
+TOTALES = {
+    'total_cotizaciones': Sum('cotizaciones'),
+    'total_unidades': Sum('unidades'),
+    'total_monto': Sum('monto'),
+}
+
+
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def bloquear_dias(desde, hasta):
+    """
+    Toma, hasta el fin de la transacción, un bloqueo por día del rango para que
+    dos reconstrucciones de un mismo día no se crucen (dos pagos del mismo día
+    confirmados a la vez). En PostgreSQL es un advisory lock por día; SQLite ya
+    admite un solo escritor a la vez.
+    """
+    conexion = connections[router.db_for_write(VentaDiaria)]
+    if conexion.vendor != 'postgresql':
+        return
+    with conexion.cursor() as cursor:
+        # En orden de fecha, para no interbloquearse con un rango que se solape
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, dia) FROM generate_series(%s, %s) AS dia',
+            [CLAVE_BLOQUEO, desde.toordinal(), hasta.toordinal()],
+        )
+
+
+def recalcular_ventas(desde, hasta=None):
+    """Rehace los agregados de los días `desde`..`hasta` con una consulta por dimensión"""
+    hasta = hasta or desde
+    with transaction.atomic():
+        # Se lee después del bloqueo para ver lo que confirmó quien lo tenía antes
+        bloquear_dias(desde, hasta)
+        lineas = DetalleCotizacion.objects.filter(
+            cotizacion__estado='pagada',
+            cotizacion__fecha_pago__gte=inicio_del_dia(desde),
+            cotizacion__fecha_pago__lt=inicio_del_dia(hasta + datetime.timedelta(days=1)),
+        ).annotate(dia=TruncDate('cotizacion__fecha_pago', tzinfo=timezone.get_current_timezone()))
+
+        filas = []
+        for dimension, campo in CAMPOS_DIMENSION.items():
+            agregados = lineas.values('dia', campo).annotate(
+                total_cotizaciones=Count('cotizacion', distinct=True),
+                total_unidades=Sum('cantidad'),
+                total_monto=Sum('subtotal'),
+            ).order_by()
+            filas.extend(
+                VentaDiaria(
+                    fecha=fila['dia'], dimension=dimension, clave=str(fila[campo] or ''),
+                    cotizaciones=fila['total_cotizaciones'], unidades=fila['total_unidades'],
+                    monto=fila['total_monto'],
+                )
+                for fila in agregados
+            )
+
+        VentaDiaria.objects.filter(fecha__range=(desde, hasta)).delete()
+        VentaDiaria.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def actualizar_ventas(dias=2):
+    """Repaso nocturno: rehace los últimos `dias` días hasta hoy"""
+    hoy = timezone.localdate()
+    return recalcular_ventas(hoy - datetime.timedelta(days=dias), hoy)
+
+
+def rango_periodo(anio, mes=None):
+    """Primer y último día de un año o de un mes"""
+    if mes:
+        return datetime.date(anio, mes, 1), datetime.date(anio, mes, calendar.monthrange(anio, mes)[1])
+    return datetime.date(anio, 1, 1), datetime.date(anio, 12, 31)
+
+
+def resumen_ventas(desde, hasta, dimension, limite=None):
+    """Ventas del período por clave de la dimensión, de mayor a menor monto"""
+    filas = VentaDiaria.objects.filter(dimension=dimension, fecha__range=(desde, hasta)).values('clave').annotate(
+        **TOTALES
+    ).order_by('-total_monto', 'clave')
+    return list(filas[:limite] if limite else filas)
+
+
+def serie_ventas(desde, hasta, por_mes=False):
+    """
+    Ventas por día (o por mes) del período. Cada cotización tiene un único
+    método de pago, así que esa dimensión suma cada venta una sola vez.
+    """
+    filas = VentaDiaria.objects.filter(dimension='metodo_pago', fecha__range=(desde, hasta)).annotate(
+        periodo=TruncMonth('fecha') if por_mes else F('fecha'),
+    )
+    return list(filas.values('periodo').annotate(**TOTALES).order_by('periodo'))
+
+
+def etiquetar(dimension, filas):
+    """Agrega a cada fila el nombre legible de su clave, con una consulta"""
+    claves = [fila['clave'] for fila in filas]
+    if dimension == 'metodo_pago':
+        nombres = dict(Cotizacion.METODOS_PAGO)
+    else:
+        ids = [int(clave) for clave in claves if clave]
+        if dimension == 'producto':
+            nombres = {str(p.id): str(p) for p in Producto.objects.filter(id__in=ids).only('codigo_producto', 'nombre')}
+        elif dimension == 'categoria':
+            categorias = CategoriaAcero.objects.filter(id__in=ids).values_list('id', 'nombre')
+            nombres = {str(pk): nombre for pk, nombre in categorias}
+        else:
+            nombres = {
+                str(u.id): u.get_full_name() or u.username
+                for u in User.objects.filter(id__in=ids).only('username', 'first_name', 'last_name')
+            }
+    for fila in filas:
+        fila['nombre'] = nombres.get(fila['clave'], fila['clave'] or 'Sin especificar')
+    return filas
+
+
+@receiver(post_init, sender=Cotizacion)
+def guardar_pago_original(sender, instance, **kwargs):
+    # __dict__ para no disparar consultas si el campo está diferido
+    instance._pagada_original = instance.__dict__.get('estado') == 'pagada'
+
+
+@receiver(post_save, sender=Cotizacion)
+def actualizar_ventas_al_pagar(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Rehace el día de la venta cuando la cotización entra o sale del estado pagada"""
+    if raw or (update_fields is not None and 'estado' not in update_fields):
+        return
+    pagada = instance.estado == 'pagada'
+    if pagada == instance._pagada_original:
+        return
+    instance._pagada_original = pagada
+    if instance.fecha_pago:
+        dia = timezone.localdate(instance.fecha_pago)
+        # Un error en el reporte no debe afectar al pago; el repaso nocturno lo corrige
+        transaction.on_commit(lambda: recalcular_ventas(dia), robust=True)
+
+
+@receiver(post_delete, sender=Cotizacion)
+def actualizar_ventas_al_eliminar(sender, instance, **kwargs):
+    if instance.estado == 'pagada' and instance.fecha_pago:
+        dia = timezone.localdate(instance.fecha_pago)
+        transaction.on_commit(lambda: recalcular_ventas(dia), robust=True)
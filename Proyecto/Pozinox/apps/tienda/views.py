@@ -2,24 +2,38 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, F
-from django.http import JsonResponse, HttpResponse
+from django.db import transaction
+from django.db.models import Q, Count
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.conf import settings
-from .models import Producto, CategoriaAcero, Cotizacion, DetalleCotizacion, TransferenciaBancaria
+from .models import (
+    Producto, CategoriaAcero, Cotizacion, DetalleCotizacion, ExportacionProgramada, TransferenciaBancaria, VentaDiaria,
+)
 from .forms import ProductoForm, CategoriaForm
+from .kpis import obtener_kpis
+from .exportaciones import programar_exportacion
+from .filtros import filtrar_cotizaciones_admin, filtrar_productos, filtrar_productos_admin
+from .cortes import MAX_CORTES, CorteInvalido, optimizar_cortes
+from .pdf import (
+    cargar_cotizaciones, datos_cotizacion, nombre_pdf, renderizar_combinado, renderizar_cotizacion, renderizar_lote,
+)
+from .planchas import PiezaInvalida, estimar_planchas_cacheado
+from .recomendaciones import productos_relacionados, recomendados_para
+from .ventas import etiquetar, rango_periodo, resumen_ventas, serie_ventas
+from .precios import PrecioNoDisponible, agregar_a_cotizacion, cambiar_cantidad, tarifa
+from apps.inventario.models import MovimientoInventario
+from apps.inventario.reservas import con_disponible, reservar_cotizacion
+from apps.usuarios.auditoria import registrar_actividad
+from apps.inventario.stock import StockInsuficiente, corregir_stock, registrar_movimiento
+from Pozinox.exportar import EXPORTACIONES, FORMATOS, obtener_exportacion, respuesta_exportacion, zip_en_flujo
 import mercadopago
 import os
 import json
 import logging
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-from io import BytesIO
+import tempfile
+from decimal import Decimal, InvalidOperation
 
 logger = logging.getLogger(__name__)
 
@@ -29,20 +43,17 @@ logger = logging.getLogger(__name__)
 def es_superusuario(user):
     return user.is_superuser
 
-def aplicar_filtros_productos(queryset, request):
-    """Aplicar filtros comunes a productos"""
-    categoria_id = request.GET.get('categoria')
-    busqueda = request.GET.get('q')
-    
-    if categoria_id:
-        queryset = queryset.filter(categoria_id=categoria_id)
-    if busqueda:
-        queryset = queryset.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda) |
-            Q(codigo_producto__icontains=busqueda)
-        )
-    return queryset
+# Campos que guarda la edición de productos; el stock solo cambia vía movimientos
+CAMPOS_EDITABLES_PRODUCTO = [
+    f.name for f in Producto._meta.concrete_fields
+    if not f.primary_key and f.name not in ('stock_actual', 'fecha_creacion')
+]
+
+def mensaje_sin_stock(error):
+    return (
+        f'No hay stock suficiente de {error.producto.nombre}: '
+        f'disponibles {error.disponible}, solicitadas {error.solicitado}.'
+    )
 
 def paginar_queryset(queryset, request, per_page=20):
     """Paginación común"""
@@ -134,7 +145,7 @@ Mensaje:
 
 def productos_publicos(request):
     """Vista pública de productos para todos los usuarios"""
-    productos = aplicar_filtros_productos(Producto.objects.filter(activo=True), request)
+    productos = con_disponible(filtrar_productos(Producto.objects.filter(activo=True), request.GET))
     context = {
         'productos': paginar_queryset(productos, request, 12),
         'categorias': CategoriaAcero.objects.filter(activa=True),
@@ -146,12 +157,10 @@ def productos_publicos(request):
 
 def detalle_producto(request, producto_id):
     """Vista de detalle de un producto específico"""
-    producto = get_object_or_404(Producto, id=producto_id, activo=True)
+    producto = get_object_or_404(con_disponible(Producto.objects.filter(activo=True)), id=producto_id)
     context = {
         'producto': producto,
-        'productos_relacionados': Producto.objects.filter(
-            categoria=producto.categoria, activo=True
-        ).exclude(id=producto.id)[:4],
+        'productos_relacionados': productos_relacionados(producto),
     }
     return render(request, 'tienda/detalle_producto.html', context)
 
@@ -160,29 +169,89 @@ def detalle_producto(request, producto_id):
 @user_passes_test(es_superusuario)
 def panel_admin(request):
     """Panel de administración para superusuarios"""
-    context = {
-        'total_productos': Producto.objects.count(),
-        'productos_activos': Producto.objects.filter(activo=True).count(),
-        'productos_stock_bajo': Producto.objects.filter(stock_actual__lte=F('stock_minimo')).count(),
-        'total_categorias': CategoriaAcero.objects.count(),
-    }
-    return render(request, 'tienda/panel_admin.html', context)
+    return render(request, 'tienda/panel_admin.html', obtener_kpis())
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def reporte_ventas(request):
+    """Reporte de ventas de un mes o un año, leído de los agregados diarios"""
+    hoy = timezone.localdate()
+    try:
+        anio = int(request.GET.get('anio') or hoy.year)
+        mes = int(request.GET['mes']) if request.GET.get('mes') else None
+        desde, hasta = rango_periodo(anio, mes)
+    except ValueError:
+        messages.error(request, 'Período inválido; se muestra el año en curso.')
+        anio, mes = hoy.year, None
+        desde, hasta = rango_periodo(anio)
+    dimension = request.GET.get('dimension', 'producto')
+    if dimension not in dict(VentaDiaria.DIMENSIONES):
+        dimension = 'producto'
+    
+    serie = serie_ventas(desde, hasta, por_mes=mes is None)
+    return render(request, 'tienda/reporte_ventas.html', {
+        'anio': anio,
+        'mes': mes,
+        'meses': range(1, 13),
+        'dimension': dimension,
+        'dimensiones': VentaDiaria.DIMENSIONES,
+        'filas': etiquetar(dimension, resumen_ventas(desde, hasta, dimension, limite=50)),
+        'serie': serie,
+        'totales': {
+            campo: sum(periodo[campo] for periodo in serie)
+            for campo in ('total_cotizaciones', 'total_unidades', 'total_monto')
+        },
+    })
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def lista_exportaciones(request):
+    """Exportaciones del usuario y formularios de las que no tienen listado propio"""
+    return render(request, 'tienda/admin/exportaciones.html', {
+        'exportaciones': ExportacionProgramada.objects.filter(usuario=request.user)[:50],
+        'estados': Cotizacion.ESTADOS_COTIZACION,
+        'metodos_pago': Cotizacion.METODOS_PAGO,
+        'tipos_movimiento': MovimientoInventario.TIPO_MOVIMIENTO,
+        'max_filas': settings.EXPORTACION_MAX_FILAS_DIRECTA,
+    })
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def exportar_datos(request, nombre, formato):
+    """
+    Descarga un listado con los mismos filtros de su pantalla. Si supera
+    EXPORTACION_MAX_FILAS_DIRECTA filas se genera en segundo plano.
+    """
+    if nombre not in EXPORTACIONES or formato not in FORMATOS:
+        raise Http404('Exportación no disponible')
+    exportacion = obtener_exportacion(nombre, request.GET)
+    total = exportacion.total()
+    registrar_actividad(request.user, 'exportar', f'{exportacion.titulo} ({formato.upper()}, {total} filas)')
+    if total > settings.EXPORTACION_MAX_FILAS_DIRECTA:
+        programar_exportacion(request.user, nombre, formato, request.GET, filas=total)
+        messages.info(
+            request, f'La exportación tiene {total} filas y se está generando; te avisaremos cuando esté lista.'
+        )
+        return redirect('lista_exportaciones')
+    return respuesta_exportacion(nombre, formato, exportacion)
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def descargar_exportacion(request, exportacion_id):
+    trabajo = get_object_or_404(ExportacionProgramada, id=exportacion_id, usuario=request.user, estado='completada')
+    return FileResponse(trabajo.archivo.open('rb'), as_attachment=True, filename=os.path.basename(trabajo.archivo.name))
 
 
 @login_required
 @user_passes_test(es_superusuario)
 def lista_productos_admin(request):
     """Lista de productos para administración"""
-    productos = Producto.objects.all().order_by('-fecha_creacion')
-    
-    # Aplicar filtros
+    productos = filtrar_productos_admin(request.GET)
     estado = request.GET.get('estado')
-    if estado == 'activos':
-        productos = productos.filter(activo=True)
-    elif estado == 'inactivos':
-        productos = productos.filter(activo=False)
-    
-    productos = aplicar_filtros_productos(productos, request)
     
     context = {
         'productos': paginar_queryset(productos, request, 20),
@@ -200,7 +269,17 @@ def crear_producto(request):
     """Crear nuevo producto"""
     form = ProductoForm(request.POST or None, request.FILES or None)
     if form.is_valid():
-        producto = form.save()
+        with transaction.atomic():
+            # El stock inicial entra por el libro de inventario
+            producto = form.save(commit=False)
+            stock_inicial = producto.stock_actual
+            producto.stock_actual = 0
+            producto.save()
+            if stock_inicial:
+                registrar_movimiento(
+                    producto, 'entrada', stock_inicial, request.user,
+                    motivo_entrada='inventario_inicial'
+                )
         messages.success(request, f'Producto "{producto.nombre}" creado exitosamente.')
         return redirect('lista_productos_admin')
     
@@ -217,9 +296,21 @@ def editar_producto(request, producto_id):
     form = ProductoForm(request.POST or None, request.FILES or None, instance=producto)
     
     if form.is_valid():
-        producto = form.save()
-        messages.success(request, f'Producto "{producto.nombre}" actualizado exitosamente.')
-        return redirect('lista_productos_admin')
+        # Solo lo que el administrador cambió respecto de lo que veía: las ventas
+        # y recepciones registradas mientras editaba se conservan
+        original = form.cleaned_data['stock_original']
+        diferencia = form.cleaned_data['stock_actual'] - original if original is not None else 0
+        try:
+            with transaction.atomic():
+                producto = form.save(commit=False)
+                producto.save(update_fields=CAMPOS_EDITABLES_PRODUCTO)
+                corregir_stock(producto, diferencia, request.user,
+                               observaciones='Ajuste desde el panel de productos')
+        except StockInsuficiente as e:
+            form.add_error('stock_actual', f'El ajuste dejaría el stock en negativo (stock vigente: {e.disponible}).')
+        else:
+            messages.success(request, f'Producto "{producto.nombre}" actualizado exitosamente.')
+            return redirect('lista_productos_admin')
     
     return render(request, 'tienda/admin/formulario_producto.html', {
         'form': form, 'producto': producto, 'titulo': 'Editar Producto'
@@ -325,7 +416,9 @@ def eliminar_categoria(request, categoria_id):
 @login_required
 def mis_cotizaciones(request):
     """Lista de cotizaciones del usuario actual"""
-    cotizaciones = Cotizacion.objects.filter(usuario=request.user).order_by('-fecha_creacion')
+    cotizaciones = Cotizacion.objects.filter(usuario=request.user).annotate(
+        num_detalles=Count('detalles')
+    ).order_by('-fecha_creacion')
     
     # Aplicar filtros
     estado = request.GET.get('estado')
@@ -358,6 +451,8 @@ def detalle_cotizacion(request, cotizacion_id):
     
     # Productos disponibles para agregar
     productos_en_cotizacion = detalles.values_list('producto_id', flat=True)
+    puede_editar = cotizacion.estado == 'borrador'
+    productos_sugeridos = recomendados_para(list(productos_en_cotizacion)) if puede_editar else []
     productos_disponibles = Producto.objects.filter(activo=True).exclude(
         id__in=productos_en_cotizacion
     )
@@ -377,11 +472,23 @@ def detalle_cotizacion(request, cotizacion_id):
         'cotizacion': cotizacion,
         'detalles': detalles,
         'productos_disponibles': productos_disponibles[:20],
+        'productos_sugeridos': productos_sugeridos,
         'categorias': CategoriaAcero.objects.filter(activa=True),
-        'puede_editar': cotizacion.estado == 'borrador',
+        'puede_editar': puede_editar,
     })
 
 
+def leer_cantidad(valor, unidad):
+    """Cantidad positiva del formulario: entera por unidad, con hasta 3 decimales por metro o kilo"""
+    try:
+        cantidad = Decimal(str(valor).replace(',', '.')).quantize(Decimal('0.001'))
+    except (InvalidOperation, ValueError):
+        return None
+    if cantidad <= 0 or (unidad == 'unidad' and cantidad != cantidad.to_integral_value()):
+        return None
+    return cantidad
+
+
 @login_required
 @require_POST
 def agregar_producto_cotizacion(request, cotizacion_id):
@@ -393,16 +500,22 @@ def agregar_producto_cotizacion(request, cotizacion_id):
         return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
     
     producto = get_object_or_404(Producto, id=request.POST.get('producto_id'), activo=True)
-    cantidad = int(request.POST.get('cantidad', 1))
+    unidad = request.POST.get('unidad', 'unidad')
+    cantidad = leer_cantidad(request.POST.get('cantidad', 1), unidad)
+    if cantidad is None:
+        messages.error(request, 'Ingrese una cantidad válida mayor a 0.')
+        return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
     
-    detalle, created = DetalleCotizacion.objects.get_or_create(
-        cotizacion=cotizacion, producto=producto,
-        defaults={'cantidad': cantidad, 'precio_unitario': producto.precio_por_unidad}
-    )
+    try:
+        _, creado = agregar_a_cotizacion(cotizacion, producto, unidad, cantidad)
+    except PrecioNoDisponible as e:
+        messages.error(request, str(e))
+        return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
+    except StockInsuficiente as e:
+        messages.error(request, mensaje_sin_stock(e))
+        return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
     
-    if not created:
-        detalle.cantidad += cantidad
-        detalle.save()
+    if not creado:
         messages.info(request, f'Se actualizó la cantidad de {producto.nombre} en la cotización.')
     else:
         messages.success(request, f'{producto.nombre} agregado a la cotización.')
@@ -410,6 +523,112 @@ def agregar_producto_cotizacion(request, cotizacion_id):
     return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
 
 
+@login_required
+@require_POST
+def optimizar_cortes_api(request, cotizacion_id):
+    """
+    Calcula las barras necesarias para una lista de cortes y las agrega a la cotización.
+    Cuerpo JSON: {"producto": id, "cortes": [{"largo": mm, "cantidad": n}, ...],
+    "ancho_corte": mm, "agregar": true}
+    """
+    cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id, usuario=request.user)
+    try:
+        datos = json.loads(request.body)
+        producto_id = int(datos['producto'])
+        pedidos = [(Decimal(str(c['largo'])), int(c.get('cantidad', 1))) for c in datos['cortes']]
+        ancho_corte = int(datos.get('ancho_corte', 0))
+        agregar = bool(datos.get('agregar', True))
+    except (ValueError, KeyError, TypeError, InvalidOperation):
+        return JsonResponse({'error': 'Formato de cortes inválido'}, status=400)
+    if sum(cantidad for _, cantidad in pedidos) > MAX_CORTES or any(cantidad <= 0 for _, cantidad in pedidos):
+        return JsonResponse({'error': f'Indique entre 1 y {MAX_CORTES} cortes'}, status=400)
+
+    producto = get_object_or_404(Producto, id=producto_id, activo=True)
+    if not producto.largo:
+        return JsonResponse({'error': f'{producto.nombre} no tiene un largo de barra definido'}, status=400)
+
+    try:
+        plan = optimizar_cortes(
+            [largo for largo, cantidad in pedidos for _ in range(cantidad)], producto.largo, max(ancho_corte, 0)
+        )
+    except CorteInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if agregar:
+        if cotizacion.estado != 'borrador':
+            return JsonResponse({'error': 'No se pueden agregar productos a una cotización finalizada'}, status=400)
+        try:
+            detalle, _ = agregar_a_cotizacion(cotizacion, producto, 'unidad', plan['barras'])
+        except PrecioNoDisponible as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except StockInsuficiente as e:
+            return JsonResponse({'error': mensaje_sin_stock(e)}, status=400)
+        plan.update({
+            'cantidad_en_cotizacion': detalle.cantidad,
+            'subtotal': float(detalle.subtotal),
+            'total_cotizacion': float(cotizacion.total),
+        })
+    return JsonResponse({'success': True, **plan})
+
+
+@login_required
+@require_POST
+def estimar_planchas_api(request, cotizacion_id):
+    """
+    Estima las planchas para una lista de piezas rectangulares y las agrega a la
+    cotización (por kilo si el producto se vende por peso).
+    Cuerpo JSON: {"producto": id, "piezas": [{"ancho": mm, "largo": mm, "cantidad": n}, ...],
+    "ancho_corte": mm, "agregar": true}
+    """
+    cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id, usuario=request.user)
+    try:
+        datos = json.loads(request.body)
+        producto_id = int(datos['producto'])
+        piezas = [
+            (Decimal(str(p['ancho'])), Decimal(str(p['largo'])), int(p.get('cantidad', 1))) for p in datos['piezas']
+        ]
+        # json acepta NaN e Infinity, que Decimal también admite
+        if not all(ancho.is_finite() and largo.is_finite() for ancho, largo, _ in piezas):
+            raise ValueError('Medida no finita')
+        ancho_corte = max(int(datos.get('ancho_corte', 0)), 0)
+        agregar = bool(datos.get('agregar', True))
+    except (ValueError, KeyError, TypeError, InvalidOperation, OverflowError):
+        return JsonResponse({'error': 'Formato de piezas inválido'}, status=400)
+
+    producto = get_object_or_404(Producto, id=producto_id, activo=True)
+    if not (producto.ancho and producto.largo):
+        return JsonResponse({'error': f'{producto.nombre} no tiene medidas de plancha definidas'}, status=400)
+
+    try:
+        estimacion = estimar_planchas_cacheado(piezas, producto.ancho, producto.largo, ancho_corte)
+    except PiezaInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        # Por kilo se cotiza el peso de las planchas completas
+        _, kilos_por_plancha = tarifa(producto, 'kg')
+        unidad, cantidad = 'kg', estimacion['planchas'] * kilos_por_plancha.quantize(Decimal('0.001'))
+    except PrecioNoDisponible:
+        unidad, cantidad = 'unidad', estimacion['planchas']
+    respuesta = {'success': True, **estimacion, 'unidad': unidad, 'cantidad': float(cantidad)}
+
+    if agregar:
+        if cotizacion.estado != 'borrador':
+            return JsonResponse({'error': 'No se pueden agregar productos a una cotización finalizada'}, status=400)
+        try:
+            detalle, _ = agregar_a_cotizacion(cotizacion, producto, unidad, cantidad)
+        except PrecioNoDisponible as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except StockInsuficiente as e:
+            return JsonResponse({'error': mensaje_sin_stock(e)}, status=400)
+        respuesta.update({
+            'cantidad_en_cotizacion': detalle.cantidad_legible,
+            'subtotal': float(detalle.subtotal),
+            'total_cotizacion': float(cotizacion.total),
+        })
+    return JsonResponse(respuesta)
+
+
 @login_required
 @require_POST
 def actualizar_cantidad_producto(request, detalle_id):
@@ -422,16 +641,21 @@ def actualizar_cantidad_producto(request, detalle_id):
     if cotizacion.estado != 'borrador':
         return JsonResponse({'error': 'No se puede editar una cotización finalizada'}, status=400)
     
-    cantidad = int(request.POST.get('cantidad', 1))
-    if cantidad <= 0:
+    cantidad = leer_cantidad(request.POST.get('cantidad', 1), detalle.unidad)
+    if cantidad is None:
         return JsonResponse({'error': 'La cantidad debe ser mayor a 0'}, status=400)
     
-    detalle.cantidad = cantidad
-    detalle.save()
+    try:
+        cambiar_cantidad(detalle, cantidad)
+    except StockInsuficiente as e:
+        return JsonResponse({'error': mensaje_sin_stock(e)}, status=400)
     
     return JsonResponse({
         'success': True,
+        'descuento': float(detalle.descuento),
         'subtotal': float(detalle.subtotal),
+        'subtotal_cotizacion': float(cotizacion.subtotal),
+        'iva_cotizacion': float(cotizacion.iva),
         'total_cotizacion': float(cotizacion.total)
     })
 
@@ -458,21 +682,30 @@ def eliminar_producto_cotizacion(request, detalle_id):
 
 
 @login_required
+@require_POST
 def finalizar_cotizacion(request, cotizacion_id):
     """Finalizar cotización y mostrar opciones de pago"""
     cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id, usuario=request.user)
     
-    if cotizacion.estado != 'borrador':
-        messages.error(request, 'Esta cotización ya fue finalizada.')
-        return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
-    if not cotizacion.detalles.exists():
-        messages.error(request, 'Debe agregar al menos un producto a la cotización.')
+    try:
+        with transaction.atomic():
+            # Bloqueada y revisada de nuevo: un doble envío no reserva dos veces
+            cotizacion = Cotizacion.objects.select_for_update().get(id=cotizacion.id, usuario=request.user)
+            if cotizacion.estado != 'borrador':
+                messages.error(request, 'Esta cotización ya fue finalizada.')
+                return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
+            if not cotizacion.detalles.exists():
+                messages.error(request, 'Debe agregar al menos un producto a la cotización.')
+                return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
+            # El stock queda reservado mientras se paga la cotización
+            reservar_cotizacion(cotizacion)
+            cotizacion.estado = 'finalizada'
+            cotizacion.fecha_finalizacion = timezone.now()
+            cotizacion.save()
+    except StockInsuficiente as e:
+        messages.error(request, mensaje_sin_stock(e))
         return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
     
-    cotizacion.estado = 'finalizada'
-    cotizacion.fecha_finalizacion = timezone.now()
-    cotizacion.save()
-    
     messages.success(request, 'Cotización finalizada. Seleccione un método de pago.')
     return redirect('seleccionar_pago', cotizacion_id=cotizacion.id)
 
@@ -537,18 +770,28 @@ def procesar_pago_mercadopago(request, cotizacion_id):
         # Crear items de la preferencia
         # Incluir los productos con sus precios sin IVA
         items = []
-        for detalle in cotizacion.detalles.all():
-            items.append({
-                "title": f"{detalle.producto.nombre} ({detalle.producto.codigo_producto})",
-                "quantity": detalle.cantidad,
-                "unit_price": float(detalle.precio_unitario),
-                "currency_id": "CLP"  # Peso chileno
-            })
+        for detalle in cotizacion.detalles.select_related('producto'):
+            if detalle.unidad == 'unidad' and not detalle.descuento:
+                items.append({
+                    "title": f"{detalle.producto.nombre} ({detalle.producto.codigo_producto})",
+                    "quantity": detalle.cantidad,
+                    "unit_price": float(detalle.precio_unitario),
+                    "currency_id": "CLP"  # Peso chileno
+                })
+            else:
+                # MercadoPago solo acepta cantidades enteras: metros, kilos y líneas con
+                # descuento van como una línea por su subtotal
+                items.append({
+                    "title": f"{detalle.producto.nombre} ({detalle.producto.codigo_producto}) - {detalle.cantidad_legible}",
+                    "quantity": 1,
+                    "unit_price": float(detalle.subtotal),
+                    "currency_id": "CLP"
+                })
         
         # Agregar el IVA como un item adicional si existe
         if cotizacion.iva and cotizacion.iva > 0:
             items.append({
-                "title": "IVA (19%)",
+                "title": cotizacion.etiqueta_iva,
                 "quantity": 1,
                 "unit_price": float(cotizacion.iva),
                 "currency_id": "CLP"
@@ -786,181 +1029,51 @@ def pago_pendiente(request, cotizacion_id):
 @login_required
 def descargar_cotizacion_pdf(request, cotizacion_id):
     """Generar y descargar PDF de la cotización"""
-    cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id, usuario=request.user)
-    detalles = cotizacion.detalles.all().select_related('producto')
-    
-    # Crear el buffer
-    buffer = BytesIO()
-    
-    # Crear el documento PDF
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
-    
-    # Contenedor para los elementos del PDF
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    
-    # Estilo personalizado para el título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Estilo para encabezados
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Estilo normal
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=12,
-    )
-    
-    # Título
-    elements.append(Paragraph('POZINOX', title_style))
-    elements.append(Paragraph('Tienda de Aceros', styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Información de la cotización
-    elements.append(Paragraph(f'COTIZACIÓN N° {cotizacion.numero_cotizacion}', heading_style))
-    
-    # Datos del cliente y cotización
-    info_data = [
-        ['Cliente:', f'{request.user.get_full_name() or request.user.username}'],
-        ['Email:', request.user.email],
-        ['Fecha:', cotizacion.fecha_creacion.strftime('%d/%m/%Y %H:%M')],
-        ['Estado:', cotizacion.get_estado_display()],
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#1e3a8a')),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    elements.append(info_table)
-    elements.append(Spacer(1, 20))
-    
-    # Tabla de productos
-    elements.append(Paragraph('DETALLE DE PRODUCTOS', heading_style))
-    
-    # Encabezados de tabla
-    table_data = [['Producto', 'Código', 'Cantidad', 'Precio Unit.', 'Subtotal']]
-    
-    # Datos de productos
-    for detalle in detalles:
-        table_data.append([
-            Paragraph(detalle.producto.nombre, normal_style),
-            detalle.producto.codigo_producto,
-            str(detalle.cantidad),
-            f'${detalle.precio_unitario:,.0f}',
-            f'${detalle.subtotal:,.0f}'
-        ])
-    
-    # Crear tabla
-    product_table = Table(table_data, colWidths=[2.5*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
-    product_table.setStyle(TableStyle([
-        # Encabezado
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Contenido
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-        ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-    ]))
-    
-    elements.append(product_table)
-    elements.append(Spacer(1, 20))
-    
-    # Totales
-    totales_data = [
-        ['Subtotal:', f'${cotizacion.subtotal:,.0f}'],
-        ['IVA (19%):', f'${cotizacion.iva:,.0f}'],
-        ['', ''],
-        ['TOTAL:', f'${cotizacion.total:,.0f}'],
-    ]
-    
-    totales_table = Table(totales_data, colWidths=[5*inch, 1.5*inch])
-    totales_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, 1), 'Helvetica'),
-        ('FONTNAME', (1, 0), (1, 1), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 3), (-1, 3), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 2), 11),
-        ('FONTSIZE', (0, 3), (-1, 3), 14),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('TEXTCOLOR', (0, 3), (-1, 3), colors.HexColor('#1e3a8a')),
-        ('LINEABOVE', (0, 3), (-1, 3), 2, colors.HexColor('#1e3a8a')),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-    
-    elements.append(totales_table)
-    elements.append(Spacer(1, 30))
-    
-    # Observaciones si existen
-    if cotizacion.observaciones:
-        elements.append(Paragraph('OBSERVACIONES:', heading_style))
-        elements.append(Paragraph(cotizacion.observaciones, normal_style))
-        elements.append(Spacer(1, 20))
-    
-    # Pie de página
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=TA_CENTER,
+    cotizacion = get_object_or_404(
+        Cotizacion.objects.select_related('usuario').prefetch_related('detalles__producto'),
+        id=cotizacion_id, usuario=request.user,
     )
-    
-    elements.append(Spacer(1, 30))
-    elements.append(Paragraph('_______________________________________________', footer_style))
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph('POZINOX - Tienda de Aceros', footer_style))
-    elements.append(Paragraph('www.pozinox.cl | info@pozinox.cl | +56 2 1234 5678', footer_style))
-    elements.append(Paragraph('Este documento es una cotización y no constituye una factura', footer_style))
-    
-    # Construir PDF
-    doc.build(elements)
-    
-    # Obtener el valor del buffer
-    pdf = buffer.getvalue()
-    buffer.close()
+    pdf = renderizar_cotizacion(datos_cotizacion(cotizacion))
     
     # Crear la respuesta HTTP
-    response = HttpResponse(content_type='application/pdf')
+    response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Cotizacion_{cotizacion.numero_cotizacion}.pdf"'
-    response.write(pdf)
-    
+    return response
+
+
+@login_required
+@user_passes_test(es_superusuario)
+def cotizaciones_pdf_lote(request):
+    """
+    PDF de varias cotizaciones (por `ids` o con los filtros de las exportaciones):
+    un ZIP con un PDF por cotización, enviado a medida que se generan, o un solo PDF.
+    """
+    cotizaciones = filtrar_cotizaciones_admin(request.GET).order_by('fecha_creacion', 'id')
+    if request.GET.get('ids'):
+        try:
+            ids = [int(valor) for valor in request.GET['ids'].split(',')]
+        except ValueError:
+            raise Http404('Cotizaciones inválidas')
+        cotizaciones = cotizaciones.filter(id__in=ids)
+    total = cotizaciones.count()
+    if not total or total > settings.PDF_LOTE_MAX:
+        messages.error(request, f'Seleccione entre 1 y {settings.PDF_LOTE_MAX} cotizaciones (hay {total}).')
+        return redirect('lista_exportaciones')
+
+    lista = cargar_cotizaciones(cotizaciones)
+    fecha = timezone.localtime().strftime('%Y%m%d_%H%M')
+    registrar_actividad(request.user, 'exportar', f'PDF de {total} cotizaciones')
+    if request.GET.get('formato') == 'pdf':
+        salida = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+        renderizar_combinado(lista, salida)
+        salida.seek(0)
+        return FileResponse(salida, as_attachment=True, filename=f'Cotizaciones_{fecha}.pdf', content_type='application/pdf')
+
+    pdfs = renderizar_lote(lista, procesos=settings.PDF_PROCESOS)
+    response = StreamingHttpResponse(
+        zip_en_flujo((nombre_pdf(datos), pdf) for datos, pdf in pdfs), content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="Cotizaciones_{fecha}.zip"'
     return response
 
 
@@ -1200,23 +1313,20 @@ def panel_verificacion_transferencias(request):
             messages.error(request, 'No tienes permisos para acceder a esta sección.')
             return redirect('home')
     
-    transferencias = TransferenciaBancaria.objects.filter(
-        estado__in=['pendiente', 'verificando']
-    ).order_by('-fecha_creacion')
+    transferencias = TransferenciaBancaria.objects.por_verificar().para_panel().order_by('-fecha_creacion')
     
     # Filtros
     estado = request.GET.get('estado')
     if estado:
         transferencias = transferencias.filter(estado=estado)
-    
-    # Paginación
-    paginator = Paginator(transferencias, 10)
-    page_number = request.GET.get('page')
-    transferencias_paginadas = paginator.get_page(page_number)
+    busqueda = request.GET.get('q')
+    if busqueda:
+        transferencias = transferencias.filter(cotizacion__numero_cotizacion__icontains=busqueda)
     
     context = {
-        'transferencias': transferencias_paginadas,
+        'transferencias': paginar_queryset(transferencias, request, 10),
         'estado_actual': estado,
+        'busqueda': busqueda,
     }
     return render(request, 'tienda/transferencias/panel_verificacion.html', context)
 
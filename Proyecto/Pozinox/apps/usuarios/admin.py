@@ -42,6 +42,10 @@ class LogActividadAdmin(admin.ModelAdmin):
     list_filter = ['tipo_actividad', 'fecha_actividad']
     search_fields = ['usuario__username', 'descripcion']
     readonly_fields = ['fecha_actividad']
+    list_select_related = ['usuario']
+    date_hierarchy = 'fecha_actividad'
+    # Sin COUNT(*) de toda la tabla en cada página
+    show_full_result_count = False
 
 
 @admin.register(Notificacion)
@@ -5,3 +5,10 @@ class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.usuarios'
     verbose_name = 'Gestión de Usuarios'
+
+    def ready(self):
+        # Invalidación de la configuración cacheada al guardarla
+        from . import configuracion  # noqa: F401
+        # Registro de actividad: login/logout y cambios de los modelos auditados
+        from . import auditoria
+        auditoria.conectar_modelos()
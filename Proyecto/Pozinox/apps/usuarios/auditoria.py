@@ -0,0 +1,281 @@
+"""
+Registro de actividad (LogActividad) sin escrituras en el camino de la petición
+
+Los eventos se acumulan en un buffer del proceso y un hilo en segundo plano los
+escribe con bulk_create cuando el lote se llena o pasa el intervalo; al terminar
+el proceso se vacía lo pendiente. El middleware deja disponible la petición en
+curso para que las señales sepan quién hizo el cambio.
+
+En PostgreSQL la tabla está particionada por mes: la retención se aplica
+descartando particiones completas en vez de borrar filas.
+"""
+import atexit
+import datetime
+import ipaddress
+import logging
+import os
+import threading
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import LogActividad
+
+logger = logging.getLogger(__name__)
+
+TABLA = LogActividad._meta.db_table
+TAMANO_LOTE_BORRADO = 5000
+# Guardados que no son una edición del usuario (el login actualiza last_login)
+CAMPOS_IGNORADOS = {'last_login'}
+
+# Petición en curso, para atribuir los cambios que registran las señales
+_peticion = ContextVar('auditoria_peticion', default=None)
+
+
+class BufferActividad:
+    """Eventos pendientes de escribir; seguro entre hilos"""
+
+    def __init__(self, asincrono=True):
+        self.asincrono = asincrono
+        self.pendientes = []
+        self.descartados = 0
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._pid = None
+
+    def agregar(self, registro):
+        with self._lock:
+            if len(self.pendientes) >= settings.AUDITORIA_MAX_PENDIENTES:
+                # Si la base no responde no se acumula memoria sin límite
+                self.descartados += 1
+                return
+            self.pendientes.append(registro)
+            lleno = len(self.pendientes) >= settings.AUDITORIA_LOTE
+        if not self.asincrono:
+            if lleno:
+                self.vaciar()
+            return
+        self._asegurar_hilo()
+        if lleno:
+            self._despertar.set()
+
+    def vaciar(self):
+        """Escribe lo pendiente en el hilo que llama; devuelve los eventos escritos"""
+        with self._lock:
+            lote, self.pendientes = self.pendientes, []
+        if not lote:
+            return 0
+        try:
+            self.escribir(lote)
+        except Exception:
+            logger.exception(f'No se pudieron escribir {len(lote)} registros de actividad')
+            return 0
+        return len(lote)
+
+    def escribir(self, lote):
+        try:
+            with transaction.atomic():
+                LogActividad.objects.bulk_create(lote, batch_size=settings.AUDITORIA_LOTE)
+        except IntegrityError:
+            # Usuarios eliminados mientras sus eventos esperaban en el buffer
+            vigentes = set(User.objects.filter(id__in={r.usuario_id for r in lote}).values_list('id', flat=True))
+            LogActividad.objects.bulk_create(
+                [r for r in lote if r.usuario_id in vigentes], batch_size=settings.AUDITORIA_LOTE,
+            )
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo del proceso padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(target=self._ejecutar, name='auditoria', daemon=True)
+                self._hilo.start()
+
+    def _ejecutar(self):
+        while True:
+            self._despertar.wait(settings.AUDITORIA_INTERVALO)
+            self._despertar.clear()
+            self.vaciar()
+            # Conexiones de este hilo: no quedan abiertas entre escrituras
+            connections.close_all()
+
+
+registro = BufferActividad()
+atexit.register(registro.vaciar)
+
+
+def ip_valida(valor):
+    try:
+        return str(ipaddress.ip_address((valor or '').strip()))
+    except ValueError:
+        return None
+
+
+def ip_cliente(request):
+    """
+    IP del cliente. X-Real-IP lo fija nginx con la dirección que ve, pero solo se
+    acepta si la petición llegó desde una red privada (el proxy); X-Forwarded-For
+    no se usa porque su primer valor lo escribe el cliente. Un valor que no es una
+    IP se guarda como None: la columna es inet en PostgreSQL.
+    """
+    remota = ip_valida(request.META.get('REMOTE_ADDR'))
+    if remota and ipaddress.ip_address(remota).is_private:
+        return ip_valida(request.META.get('HTTP_X_REAL_IP')) or remota
+    return remota
+
+
+def registrar_actividad(usuario, tipo, descripcion, instancia=None, request=None):
+    """Encola un evento de actividad; no escribe en la base de datos"""
+    if not settings.AUDITORIA_ACTIVA or usuario is None or not usuario.is_authenticated:
+        return
+    request = request or _peticion.get()
+    registro.agregar(LogActividad(
+        usuario_id=usuario.pk,
+        tipo_actividad=tipo,
+        descripcion=descripcion[:1000],
+        modelo_afectado=instancia._meta.label if instancia is not None else '',
+        objeto_id=instancia.pk if instancia is not None and isinstance(instancia.pk, int) else None,
+        ip_address=ip_cliente(request) if request else None,
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500] if request else '',
+        fecha_actividad=timezone.now(),
+    ))
+
+
+class AuditoriaMiddleware:
+    """Deja la petición disponible para las señales de auditoría"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _peticion.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _peticion.reset(token)
+
+
+@receiver(user_logged_in)
+def registrar_login(sender, request, user, **kwargs):
+    registrar_actividad(user, 'login', 'Inicio de sesión', request=request)
+
+
+@receiver(user_logged_out)
+def registrar_logout(sender, request, user, **kwargs):
+    registrar_actividad(user, 'logout', 'Cierre de sesión', request=request)
+
+
+def registrar_cambio(sender, instance, created=None, raw=False, update_fields=None, **kwargs):
+    """Alta, edición o baja de un modelo auditado hecha desde una petición"""
+    request = _peticion.get()
+    if raw or request is None or (update_fields and set(update_fields) <= CAMPOS_IGNORADOS):
+        return
+    tipo = 'eliminar' if created is None else 'crear' if created else 'editar'
+    registrar_actividad(
+        getattr(request, 'user', None), tipo, f'{sender._meta.verbose_name.capitalize()}: {instance}', instance,
+    )
+
+
+def conectar_modelos():
+    for etiqueta in settings.AUDITORIA_MODELOS:
+        modelo = apps.get_model(etiqueta)
+        post_save.connect(registrar_cambio, sender=modelo, dispatch_uid=f'auditoria_guardar_{etiqueta}')
+        post_delete.connect(registrar_cambio, sender=modelo, dispatch_uid=f'auditoria_eliminar_{etiqueta}')
+
+
+# Retención por mes
+
+def inicio_mes(fecha, desplazamiento=0):
+    """Primer instante (local) del mes de `fecha` movido `desplazamiento` meses"""
+    indice = fecha.year * 12 + fecha.month - 1 + desplazamiento
+    return timezone.make_aware(datetime.datetime(indice // 12, indice % 12 + 1, 1))
+
+
+def particionada():
+    """Si la tabla es particionada (solo en PostgreSQL, tras la migración)"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TABLA])
+        fila = cursor.fetchone()
+    return fila is not None and fila[0] == 'p'
+
+
+def particiones():
+    """Particiones mensuales existentes: {nombre: inicio del mes}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s",
+            [TABLA],
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+    return {
+        nombre: timezone.make_aware(datetime.datetime.strptime(nombre[-6:], '%Y%m'))
+        for nombre in nombres if nombre[-6:].isdigit()
+    }
+
+
+def crear_particion(inicio):
+    """
+    Crea la partición del mes que empieza en `inicio`. Las filas de ese mes que
+    hubieran caído en la partición por defecto se trasladan a la nueva.
+    """
+    nombre = f'{TABLA}_{inicio:%Y%m}'
+    fin = inicio_mes(inicio, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {TABLA}_default WHERE fecha_actividad >= %s AND fecha_actividad < %s '
+            f'RETURNING *) INSERT INTO {nombre} SELECT * FROM movidas',
+            [inicio, fin],
+        )
+        cursor.execute(f'ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)', [inicio, fin])
+    return nombre
+
+
+def purgar_actividad(meses=None, ahora=None):
+    """
+    Aplica la retención de AUDITORIA_MESES_RETENCION meses y, en PostgreSQL,
+    crea por adelantado las particiones del mes actual y el siguiente.
+    Devuelve los meses (particiones) o filas eliminados.
+    """
+    meses = settings.AUDITORIA_MESES_RETENCION if meses is None else meses
+    ahora = timezone.localtime(ahora or timezone.now())
+    limite = inicio_mes(ahora, -meses)
+
+    if not particionada():
+        total = 0
+        antiguos = LogActividad.objects.filter(fecha_actividad__lt=limite)
+        while True:
+            ids = list(antiguos.order_by().values_list('id', flat=True)[:TAMANO_LOTE_BORRADO])
+            if not ids:
+                return total
+            LogActividad.objects.filter(id__in=ids).delete()
+            total += len(ids)
+
+    existentes = particiones()
+    for desplazamiento in (0, 1):
+        inicio = inicio_mes(ahora, desplazamiento)
+        if inicio not in existentes.values():
+            crear_particion(inicio)
+
+    eliminadas = 0
+    with connection.cursor() as cursor:
+        for nombre, inicio in sorted(existentes.items(), key=lambda item: item[1]):
+            if inicio < limite:
+                cursor.execute(f'DROP TABLE {nombre}')
+                eliminadas += 1
+        # Lo anterior al límite que haya quedado en la partición por defecto
+        cursor.execute(f'DELETE FROM {TABLA}_default WHERE fecha_actividad < %s', [limite])
+    return eliminadas
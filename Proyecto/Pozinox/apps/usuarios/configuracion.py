@@ -0,0 +1,42 @@
+"""
+Configuración del sistema cacheada en memoria del proceso
+
+Cada proceso guarda la configuración junto a la versión con que la leyó. La
+versión vive en la caché compartida y cambia al guardar la configuración, de
+modo que los demás procesos la recargan en su siguiente lectura sin consultar
+la base de datos mientras no cambie.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Pozinox.cache_proceso import CacheProceso
+from .models import ConfiguracionSistema
+
+CACHE_KEY_VERSION = 'usuarios:configuracion_version'
+
+_configuracion = CacheProceso(
+    CACHE_KEY_VERSION, lambda: ConfiguracionSistema.objects.first() or ConfiguracionSistema()
+)
+
+
+def obtener_configuracion():
+    """
+    Configuración vigente (sin guardar, con valores por defecto, si no existe).
+    Es compartida por el proceso: no se debe modificar la instancia devuelta.
+    """
+    return _configuracion.obtener()
+
+
+def tasa_iva():
+    """IVA configurado como fracción (0.19 para un 19%)"""
+    return obtener_configuracion().tasa_iva
+
+
+def invalidar_configuracion():
+    """Obliga a todos los procesos a releer la configuración"""
+    _configuracion.invalidar()
+
+
+@receiver([post_save, post_delete], sender=ConfiguracionSistema)
+def invalidar_configuracion_al_cambiar(sender, **kwargs):
+    _configuracion.invalidar_al_confirmar()
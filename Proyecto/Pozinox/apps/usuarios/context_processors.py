@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .configuracion import obtener_configuracion
+
+
+def configuracion(request):
+    """Configuración del sistema en las plantillas, leída solo si se usa"""
+    return {'configuracion': SimpleLazyObject(obtener_configuracion)}
@@ -0,0 +1,25 @@
+"""
+Exportación del listado de usuarios
+"""
+from Pozinox.exportar import Exportacion
+from .filtros import filtrar_usuarios_admin
+from .models import PerfilUsuario
+
+
+def exportar_usuarios(parametros):
+    usuarios = filtrar_usuarios_admin(parametros).select_related('perfil')
+    tipos = dict(PerfilUsuario.TIPO_USUARIO)
+
+    def fila(usuario):
+        perfil = getattr(usuario, 'perfil', None)
+        return [
+            usuario.username, usuario.first_name, usuario.last_name, usuario.email,
+            tipos.get(perfil.tipo_usuario, '') if perfil else '',
+            perfil.telefono if perfil else '', perfil.comuna if perfil else '', perfil.ciudad if perfil else '',
+            usuario.is_active, usuario.is_superuser, usuario.date_joined, usuario.last_login,
+        ]
+
+    return Exportacion('Usuarios', [
+        'Usuario', 'Nombre', 'Apellido', 'Email', 'Tipo', 'Teléfono', 'Comuna', 'Ciudad',
+        'Activo', 'Superusuario', 'Fecha de registro', 'Último acceso',
+    ], usuarios, fila)
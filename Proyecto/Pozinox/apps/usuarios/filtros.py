@@ -0,0 +1,31 @@
+"""
+Filtros del listado de usuarios, compartidos por la vista y la exportación
+"""
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+
+def filtrar_usuarios_admin(parametros):
+    """Usuarios del listado de administración (tipo, estado y búsqueda)"""
+    usuarios = User.objects.all().order_by('-date_joined')
+
+    tipo_usuario = parametros.get('tipo')
+    estado = parametros.get('estado')
+    busqueda = parametros.get('q')
+
+    if tipo_usuario:
+        usuarios = usuarios.filter(perfil__tipo_usuario=tipo_usuario)
+
+    if estado == 'activos':
+        usuarios = usuarios.filter(is_active=True)
+    elif estado == 'inactivos':
+        usuarios = usuarios.filter(is_active=False)
+
+    if busqueda:
+        usuarios = usuarios.filter(
+            Q(username__icontains=busqueda) |
+            Q(first_name__icontains=busqueda) |
+            Q(last_name__icontains=busqueda) |
+            Q(email__icontains=busqueda)
+        )
+    return usuarios
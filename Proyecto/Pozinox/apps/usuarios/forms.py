@@ -320,6 +320,9 @@ class UsuarioForm(forms.ModelForm):
         label='Confirmar Contraseña'
     )
     
+    # Campos del formulario que se guardan en PerfilUsuario
+    CAMPOS_PERFIL = ['tipo_usuario', 'telefono', 'direccion', 'comuna', 'ciudad']
+    
     # Campos del perfil
     tipo_usuario = forms.ChoiceField(
         choices=PerfilUsuario.TIPO_USUARIO,
@@ -474,19 +477,25 @@ class UsuarioForm(forms.ModelForm):
             user.set_password(password)
         
         if commit:
-            user.save()
-            
-            # Actualizar o crear perfil
-            try:
-                perfil = user.perfil
-            except PerfilUsuario.DoesNotExist:
-                perfil = PerfilUsuario.objects.create(user=user)
+            datos_perfil = {campo: self.cleaned_data[campo] for campo in self.CAMPOS_PERFIL}
             
-            perfil.tipo_usuario = self.cleaned_data['tipo_usuario']
-            perfil.telefono = self.cleaned_data['telefono']
-            perfil.direccion = self.cleaned_data['direccion']
-            perfil.comuna = self.cleaned_data['comuna']
-            perfil.ciudad = self.cleaned_data['ciudad']
-            perfil.save()
+            if user.pk is None:
+                # El perfil se crea junto al usuario con estos datos
+                user._perfil_inicial = datos_perfil
+                user.save()
+            else:
+                user.save()
+                
+                # Actualizar o crear perfil, guardando solo los campos modificados
+                try:
+                    perfil = user.perfil
+                except PerfilUsuario.DoesNotExist:
+                    perfil = PerfilUsuario.objects.create(user=user, **datos_perfil)
+                
+                cambios = [campo for campo, valor in datos_perfil.items() if getattr(perfil, campo) != valor]
+                if cambios:
+                    for campo in cambios:
+                        setattr(perfil, campo, datos_perfil[campo])
+                    perfil.save(update_fields=cambios + ['fecha_actualizacion'])
         
         return user
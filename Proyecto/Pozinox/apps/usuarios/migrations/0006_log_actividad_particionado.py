@@ -0,0 +1,102 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:27
+
+import datetime
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLA = 'usuarios_logactividad'
+
+
+def siguiente_mes(inicio):
+    return timezone.make_aware(datetime.datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1))
+
+
+def particionar(apps, schema_editor):
+    """
+    En PostgreSQL la tabla pasa a estar particionada por mes (fecha_actividad),
+    con una partición por cada mes con datos, el actual, el siguiente y una por
+    defecto. La clave primaria debe incluir la columna de partición.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ejecutar = schema_editor.execute
+    ejecutar(f'ALTER TABLE {TABLA} RENAME TO {TABLA}_anterior')
+    # Se suelta la secuencia de id (identity o serial) para recrearla en la tabla nueva
+    ejecutar(f'ALTER TABLE {TABLA}_anterior ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    ejecutar(f'ALTER TABLE {TABLA}_anterior ALTER COLUMN id DROP DEFAULT')
+    ejecutar(
+        f'CREATE TABLE {TABLA} (LIKE {TABLA}_anterior INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (fecha_actividad)'
+    )
+    ejecutar(f'CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(%s, fecha_actividad AT TIME ZONE %s) FROM {TABLA}_anterior',
+            ['month', settings.TIME_ZONE],
+        )
+        meses = {timezone.make_aware(fila[0]) for fila in cursor.fetchall()}
+    ahora = timezone.localtime()
+    actual = timezone.make_aware(datetime.datetime(ahora.year, ahora.month, 1))
+    meses |= {actual, siguiente_mes(actual)}
+    for inicio in sorted(meses):
+        ejecutar(
+            f'CREATE TABLE {TABLA}_{inicio:%Y%m} PARTITION OF {TABLA} FOR VALUES FROM (%s) TO (%s)',
+            [inicio, siguiente_mes(inicio)],
+        )
+
+    ejecutar(f'INSERT INTO {TABLA} SELECT * FROM {TABLA}_anterior')
+    ejecutar(f'DROP TABLE {TABLA}_anterior')
+    ejecutar(f'CREATE SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id')
+    ejecutar(f"SELECT setval('{TABLA}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLA}), 0) + 1, false)")
+    ejecutar(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{TABLA}_id_seq')")
+    ejecutar(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, fecha_actividad)')
+    ejecutar(
+        f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_usuario_id_fk FOREIGN KEY (usuario_id) '
+        f'REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def desparticionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ejecutar = schema_editor.execute
+    ejecutar(f'CREATE TABLE {TABLA}_anterior (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    ejecutar(f'INSERT INTO {TABLA}_anterior SELECT * FROM {TABLA}')
+    ejecutar(f'ALTER SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}_anterior.id')
+    ejecutar(f'DROP TABLE {TABLA}')
+    ejecutar(f'ALTER TABLE {TABLA}_anterior RENAME TO {TABLA}')
+    ejecutar(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id)')
+    ejecutar(
+        f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_usuario_id_fk FOREIGN KEY (usuario_id) '
+        f'REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    ejecutar(f'CREATE INDEX {TABLA}_usuario_id_idx ON {TABLA} (usuario_id)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_passwordresettoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logactividad',
+            name='fecha_actividad',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(particionar, desparticionar),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['fecha_actividad'], name='log_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['usuario', 'fecha_actividad'], name='log_usuario_fecha_idx'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 import uuid
+from decimal import Decimal
 from datetime import timedelta
 
 
@@ -76,6 +77,11 @@ class PerfilUsuario(models.Model):
         self.save()
 
 
+def formato_iva(porcentaje):
+    """Rótulo del IVA para un porcentaje: 'IVA (19%)', 'IVA (10.5%)'"""
+    return f"IVA ({Decimal(str(porcentaje)).normalize():f}%)"
+
+
 class ConfiguracionSistema(models.Model):
     """Configuraciones generales del sistema"""
     nombre_empresa = models.CharField(max_length=200, default="Pozinox")
@@ -107,6 +113,12 @@ class ConfiguracionSistema(models.Model):
     
     def __str__(self):
         return f"Configuración - {self.nombre_empresa}"
+
+    @property
+    def tasa_iva(self):
+        """IVA como fracción del subtotal"""
+        # El valor por defecto de una configuración sin guardar es float
+        return Decimal(str(self.iva_porcentaje)) / 100
     
     def save(self, *args, **kwargs):
         # Asegurar que solo haya una configuración
@@ -135,12 +147,17 @@ class LogActividad(models.Model):
     objeto_id = models.PositiveIntegerField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    fecha_actividad = models.DateTimeField(auto_now_add=True)
+    # Momento del evento, no de su escritura (se escriben por lotes)
+    fecha_actividad = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name = 'Log de Actividad'
         verbose_name_plural = 'Logs de Actividad'
         ordering = ['-fecha_actividad']
+        indexes = [
+            models.Index(fields=['fecha_actividad'], name='log_fecha_idx'),
+            models.Index(fields=['usuario', 'fecha_actividad'], name='log_usuario_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.get_tipo_actividad_display()} - {self.fecha_actividad}"
@@ -186,16 +203,51 @@ class Notificacion(models.Model):
             self.save()
 
 
-# Señales para crear automáticamente el perfil cuando se crea un usuario
+# Campos de User que se reflejan en el perfil (campo de User -> campo de PerfilUsuario)
+CAMPOS_SINCRONIZADOS_PERFIL = {
+    'is_active': 'activo',
+}
+
+
+def _valores_sincronizados(user):
+    # Se lee __dict__ para no disparar consultas sobre campos diferidos
+    return {campo: user.__dict__.get(campo) for campo in CAMPOS_SINCRONIZADOS_PERFIL}
+
+
+@receiver(post_init, sender=User)
+def guardar_valores_originales(sender, instance, **kwargs):
+    instance._valores_perfil_originales = _valores_sincronizados(instance)
+
+
+# Señal que crea el perfil una sola vez y luego propaga solo los campos que cambian
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def sincronizar_perfil_usuario(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+
     if created:
-        PerfilUsuario.objects.create(user=instance)
+        # Datos iniciales opcionales asignados antes del primer save (user._perfil_inicial)
+        datos = dict(getattr(instance, '_perfil_inicial', {}))
+        datos.setdefault('activo', instance.is_active)
+        PerfilUsuario.objects.create(user=instance, **datos)
+    else:
+        originales = getattr(instance, '_valores_perfil_originales', {})
+        cambios = {}
+        for campo, campo_perfil in CAMPOS_SINCRONIZADOS_PERFIL.items():
+            if update_fields is not None and campo not in update_fields:
+                continue
+            if campo in instance.__dict__ and instance.__dict__[campo] != originales.get(campo):
+                cambios[campo_perfil] = instance.__dict__[campo]
 
+        if cambios:
+            cambios['fecha_actualizacion'] = timezone.now()
+            PerfilUsuario.objects.filter(user=instance).update(**cambios)
+            # Mantener coherente el perfil ya cargado en memoria
+            if User.perfil.is_cached(instance):
+                for campo_perfil, valor in cambios.items():
+                    setattr(instance.perfil, campo_perfil, valor)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.perfil.save()
+    instance._valores_perfil_originales = _valores_sincronizados(instance)
 
 
 class EmailVerificationToken(models.Model):
@@ -1,2 +1,288 @@
-from django.test import TestCase
+import datetime
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.tienda.models import CategoriaAcero, Cotizacion
+from . import auditoria
+from .configuracion import CACHE_KEY_VERSION, invalidar_configuracion, obtener_configuracion, tasa_iva
+from .models import ConfiguracionSistema, LogActividad, PerfilUsuario, formato_iva
+
+
+class SesionYUsuarioCacheadoTests(TestCase):
+    """Consultas por página autenticada con sesión en caché y perfil precargado"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.client.force_login(self.user)
+
+    def test_perfil_view_en_una_consulta(self):
+        # Solo la carga de usuario + perfil; la sesión sale de la caché
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('perfil'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cliente')
+
+    def test_mis_cotizaciones_no_depende_de_las_filas(self):
+        for _ in range(5):
+            Cotizacion.objects.create(usuario=self.user)
+        # usuario + perfil, conteo del paginador y página de cotizaciones
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('mis_cotizaciones'))
+        self.assertEqual(response.status_code, 200)
+
+
+class SincronizacionPerfilTests(TestCase):
+    """El perfil se crea una vez y solo se actualiza cuando cambia un campo sincronizado"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _consultas(self, contexto, tabla, tipo=None):
+        return [
+            q['sql'] for q in contexto.captured_queries
+            if tabla in q['sql'] and (tipo is None or q['sql'].startswith(tipo))
+        ]
+
+    def test_login_hace_un_solo_update(self):
+        User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.post(reverse('login'), {
+                'username': 'cliente', 'password': 'clave-segura-123',
+            })
+        self.assertEqual(response.status_code, 302)
+        # Solo last_login; el perfil no se toca
+        self.assertEqual(len(self._consultas(contexto, '"auth_user"', 'UPDATE')), 1)
+        self.assertEqual(self._consultas(contexto, 'usuarios_perfilusuario'), [])
+
+    def test_registro_crea_el_perfil_con_un_insert(self):
+        session = self.client.session
+        session['email_verificado'] = 'nuevo@example.com'
+        session.save()
+        datos = {
+            'username': 'nuevo', 'email': 'nuevo@example.com',
+            'first_name': 'Nuevo', 'last_name': 'Cliente',
+            'password1': 'Clave-Segura-123', 'password2': 'Clave-Segura-123',
+            'telefono': '+56912345678', 'direccion': 'Calle 1', 'comuna': 'Santiago', 'ciudad': 'Santiago',
+        }
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.post(reverse('registro'), datos)
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        consultas_perfil = self._consultas(contexto, 'usuarios_perfilusuario')
+        self.assertEqual(len(consultas_perfil), 1)
+        self.assertTrue(consultas_perfil[0].startswith('INSERT'))
+        perfil = User.objects.get(username='nuevo').perfil
+        self.assertTrue(perfil.email_verificado)
+        self.assertEqual(perfil.telefono, '+56912345678')
+
+    def test_solo_se_propagan_campos_modificados(self):
+        user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        user.first_name = 'Otro'
+        with self.assertNumQueries(1):
+            user.save()
+        user.is_active = False
+        with self.assertNumQueries(2):
+            user.save()
+        self.assertFalse(PerfilUsuario.objects.get(user=user).activo)
+
+
+class ConfiguracionCacheadaTests(TestCase):
+    """La configuración se lee una vez por proceso y se recarga al cambiar su versión"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+
+    def tearDown(self):
+        # La fila desaparece con el rollback del test, la copia en memoria no
+        invalidar_configuracion()
+
+    def test_totales_sin_consultar_la_configuracion(self):
+        obtener_configuracion()
+        cotizacion = Cotizacion.objects.create(usuario=self.user)
+        with CaptureQueriesContext(connection) as contexto:
+            cotizacion.calcular_totales()
+        self.assertFalse(any('usuarios_configuracionsistema' in q['sql'] for q in contexto.captured_queries))
+
+    def test_guardar_cambia_el_iva_de_las_cotizaciones(self):
+        cotizacion = Cotizacion.objects.create(usuario=self.user, subtotal=Decimal('1000'))
+        cotizacion.calcular_totales()
+        self.assertEqual(formato_iva(obtener_configuracion().iva_porcentaje), 'IVA (19%)')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfiguracionSistema.objects.create(iva_porcentaje=Decimal('10.5'))
+        self.assertEqual(formato_iva(obtener_configuracion().iva_porcentaje), 'IVA (10.5%)')
+        self.assertEqual(tasa_iva(), Decimal('0.105'))
+
+    def test_otro_proceso_invalida_con_la_version(self):
+        config = ConfiguracionSistema.objects.create(iva_porcentaje=Decimal('19'))
+        obtener_configuracion()
+        # Cambio hecho por otro proceso: la fila cambia sin pasar por este
+        ConfiguracionSistema.objects.filter(pk=config.pk).update(iva_porcentaje=Decimal('16'))
+        self.assertEqual(tasa_iva(), Decimal('0.19'))
+        cache.set(CACHE_KEY_VERSION, 'nueva-version')
+        with self.assertNumQueries(1):
+            self.assertEqual(tasa_iva(), Decimal('0.16'))
+        with self.assertNumQueries(0):
+            tasa_iva()
+
+
+@override_settings(AUDITORIA_ACTIVA=True)
+class AuditoriaTests(TestCase):
+    """Eventos capturados en el buffer y escritos por lotes"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.buffer = auditoria.BufferActividad(asincrono=False)
+        parche = mock.patch.object(auditoria, 'registro', self.buffer)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_login_y_cambios_se_escriben_al_vaciar(self):
+        self.client.post(
+            reverse('login'), {'username': 'admin', 'password': 'clave-segura-123'}, REMOTE_ADDR='10.0.0.7',
+        )
+        self.client.post(reverse('crear_categoria'), {'nombre': 'Planchas', 'descripcion': '', 'activa': 'on'})
+        # Nada se escribe durante las peticiones
+        self.assertFalse(LogActividad.objects.exists())
+        self.assertEqual(len(self.buffer.pendientes), 2)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.buffer.vaciar(), 2)
+        # Un solo INSERT para todo el lote
+        self.assertEqual(sum('INSERT' in q['sql'] for q in consultas.captured_queries), 1)
+        login, creacion = LogActividad.objects.order_by('fecha_actividad')
+        self.assertEqual((login.tipo_actividad, login.ip_address), ('login', '10.0.0.7'))
+        categoria = CategoriaAcero.objects.get()
+        self.assertEqual(creacion.tipo_actividad, 'crear')
+        self.assertEqual((creacion.modelo_afectado, creacion.objeto_id), ('tienda.CategoriaAcero', categoria.id))
+
+    def test_cambios_fuera_de_una_peticion_no_se_registran(self):
+        CategoriaAcero.objects.create(nombre='Tubos')
+        # El último acceso del login no cuenta como edición del usuario
+        self.client.force_login(self.admin)
+        self.client.get(reverse('exportar_datos', args=['productos', 'csv']))
+        self.assertEqual([r.tipo_actividad for r in self.buffer.pendientes], ['login', 'exportar'])
+
+    def test_ip_del_proxy_y_valores_invalidos(self):
+        peticion = RequestFactory().get('/', REMOTE_ADDR='172.18.0.5', HTTP_X_REAL_IP='200.1.2.3',
+                                        HTTP_X_FORWARDED_FOR='1.1.1.1, 200.1.2.3')
+        self.assertEqual(auditoria.ip_cliente(peticion), '200.1.2.3')
+        # Sin pasar por el proxy la cabecera la escribe el cliente
+        peticion = RequestFactory().get('/', REMOTE_ADDR='200.9.9.9', HTTP_X_REAL_IP='1.1.1.1')
+        self.assertEqual(auditoria.ip_cliente(peticion), '200.9.9.9')
+        peticion = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_REAL_IP='<script>')
+        self.assertEqual(auditoria.ip_cliente(peticion), '10.0.0.2')
+        peticion = RequestFactory().get('/', REMOTE_ADDR='no-es-ip')
+        self.assertIsNone(auditoria.ip_cliente(peticion))
+
+        auditoria.registrar_actividad(self.admin, 'ver', 'Evento', request=peticion)
+        self.assertEqual(self.buffer.vaciar(), 1)
+
+    def test_lote_lleno_se_escribe_sin_esperar(self):
+        with self.settings(AUDITORIA_LOTE=3):
+            for numero in range(3):
+                auditoria.registrar_actividad(self.admin, 'ver', f'Evento {numero}')
+        self.assertEqual(LogActividad.objects.count(), 3)
+        self.assertEqual(self.buffer.pendientes, [])
+
+
+
+@override_settings(AUDITORIA_ACTIVA=True)
+class AuditoriaUsuarioEliminadoTests(TransactionTestCase):
+    """La clave foránea se comprueba al confirmar, por eso fuera de la transacción del test"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.buffer = auditoria.BufferActividad(asincrono=False)
+
+    def test_eventos_de_usuarios_eliminados_se_descartan(self):
+        otro = User.objects.create_user('otro', 'otro@example.com', 'clave-segura-123')
+        with mock.patch.object(auditoria, 'registro', self.buffer):
+            auditoria.registrar_actividad(self.admin, 'ver', 'Evento')
+            auditoria.registrar_actividad(otro, 'ver', 'Evento')
+        otro.delete()
+        self.assertEqual(self.buffer.vaciar(), 2)
+        self.assertEqual(list(LogActividad.objects.values_list('usuario_id', flat=True)), [self.admin.id])
+
+
+@override_settings(AUDITORIA_LOTE=2, AUDITORIA_INTERVALO=0.05)
+class BufferActividadHiloTests(TestCase):
+    """El hilo escribe al llenarse el lote o al pasar el intervalo"""
+
+    def buffer_con_escrituras(self):
+        buffer = auditoria.BufferActividad()
+        escrito = threading.Event()
+        lotes = []
+
+        def escribir(lote):
+            lotes.append(lote)
+            escrito.set()
+        buffer.escribir = escribir
+        return buffer, lotes, escrito
+
+    def test_vacia_por_intervalo(self):
+        buffer, lotes, escrito = self.buffer_con_escrituras()
+        buffer.agregar('evento')
+        self.assertTrue(escrito.wait(2))
+        self.assertEqual(lotes, [['evento']])
+
+    @override_settings(AUDITORIA_INTERVALO=60)
+    def test_vacia_al_llenarse_el_lote(self):
+        buffer, lotes, escrito = self.buffer_con_escrituras()
+        buffer.agregar('a')
+        buffer.agregar('b')
+        self.assertTrue(escrito.wait(2))
+        self.assertEqual(lotes, [['a', 'b']])
+
+    @override_settings(AUDITORIA_MAX_PENDIENTES=1, AUDITORIA_INTERVALO=60)
+    def test_descarta_sobre_el_maximo(self):
+        buffer = auditoria.BufferActividad(asincrono=False)
+        buffer.agregar('a')
+        buffer.agregar('b')
+        self.assertEqual((buffer.pendientes, buffer.descartados), (['a'], 1))
+
+
+class RetencionActividadTests(TestCase):
+    """Retención mensual del registro de actividad"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        self.ahora = timezone.localtime()
+
+    def crear_log(self, meses_atras):
+        fecha = auditoria.inicio_mes(self.ahora, -meses_atras) + datetime.timedelta(days=3)
+        return LogActividad.objects.create(
+            usuario=self.usuario, tipo_actividad='ver', descripcion='Evento', fecha_actividad=fecha,
+        )
+
+    def test_elimina_lo_anterior_a_la_retencion(self):
+        reciente = self.crear_log(1)
+        self.crear_log(14)
+        self.crear_log(13)
+        auditoria.purgar_actividad(meses=12, ahora=self.ahora)
+        self.assertEqual(list(LogActividad.objects.all()), [reciente])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Particiones solo en PostgreSQL')
+    def test_descarta_particiones_vencidas(self):
+        self.assertTrue(auditoria.particionada())
+        antigua = self.crear_log(14)
+        # El mes antiguo cae en la partición por defecto hasta que se crea la suya
+        auditoria.crear_particion(auditoria.inicio_mes(antigua.fecha_actividad))
+        self.crear_log(13)
+        reciente = self.crear_log(0)
+
+        self.assertEqual(auditoria.purgar_actividad(meses=12, ahora=self.ahora), 1)
+        self.assertEqual(list(LogActividad.objects.all()), [reciente])
+        meses = set(auditoria.particiones().values())
+        self.assertIn(auditoria.inicio_mes(self.ahora, 1), meses)
+        self.assertNotIn(auditoria.inicio_mes(self.ahora, -14), meses)
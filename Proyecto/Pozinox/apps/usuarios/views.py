@@ -12,6 +12,7 @@ from django.conf import settings
 from django.http import JsonResponse
 from django.urls import reverse
 from .models import PerfilUsuario, EmailVerificationToken, PasswordResetToken
+from .filtros import filtrar_usuarios_admin
 from .forms import LoginForm, RegistroForm, UsuarioForm, PasswordResetRequestForm, PasswordResetForm, PerfilEditForm
 
 
@@ -61,25 +62,24 @@ def registro_view(request):
                 messages.error(request, 'Debes verificar tu correo electrónico antes de completar el registro.')
                 return render(request, 'usuarios/registro.html', {'form': form, 'email_verificado': request.session.get('email_verificado')})
             
-            # Crear usuario
-            user = User.objects.create_user(
-                username=form.cleaned_data['username'],
-                email=email,
-                password=form.cleaned_data['password1'],
+            # Crear usuario; el perfil se crea en el mismo save con sus datos iniciales
+            user = User(
+                username=User.normalize_username(form.cleaned_data['username']),
+                email=User.objects.normalize_email(email),
                 first_name=form.cleaned_data.get('first_name', ''),
                 last_name=form.cleaned_data.get('last_name', ''),
             )
-            
-            # Actualizar perfil
-            perfil = user.perfil
-            perfil.tipo_usuario = 'cliente'  # Todos los usuarios son clientes
-            perfil.telefono = form.cleaned_data.get('telefono', '')
-            perfil.direccion = form.cleaned_data.get('direccion', '')
-            perfil.comuna = form.cleaned_data.get('comuna', '')
-            perfil.ciudad = form.cleaned_data.get('ciudad', '')
-            perfil.email_verificado = True  # Ya verificado
-            perfil.fecha_verificacion_email = timezone.now()
-            perfil.save()
+            user.set_password(form.cleaned_data['password1'])
+            user._perfil_inicial = {
+                'tipo_usuario': 'cliente',  # Todos los usuarios son clientes
+                'telefono': form.cleaned_data.get('telefono', ''),
+                'direccion': form.cleaned_data.get('direccion', ''),
+                'comuna': form.cleaned_data.get('comuna', ''),
+                'ciudad': form.cleaned_data.get('ciudad', ''),
+                'email_verificado': True,  # Ya verificado
+                'fecha_verificacion_email': timezone.now(),
+            }
+            user.save()
             
             # Limpiar sesión
             if 'email_verificado' in request.session:
@@ -144,31 +144,12 @@ def es_superusuario(user):
 def lista_usuarios_admin(request):
     """Lista de usuarios para administración"""
     from django.core.paginator import Paginator
-    from django.db.models import Q
     
-    usuarios = User.objects.all().order_by('-date_joined')
-    
-    # Filtros
+    usuarios = filtrar_usuarios_admin(request.GET)
     tipo_usuario = request.GET.get('tipo')
     estado = request.GET.get('estado')
     busqueda = request.GET.get('q')
     
-    if tipo_usuario:
-        usuarios = usuarios.filter(perfil__tipo_usuario=tipo_usuario)
-    
-    if estado == 'activos':
-        usuarios = usuarios.filter(is_active=True)
-    elif estado == 'inactivos':
-        usuarios = usuarios.filter(is_active=False)
-    
-    if busqueda:
-        usuarios = usuarios.filter(
-            Q(username__icontains=busqueda) |
-            Q(first_name__icontains=busqueda) |
-            Q(last_name__icontains=busqueda) |
-            Q(email__icontains=busqueda)
-        )
-    
     # Paginación
     paginator = Paginator(usuarios, 20)
     page_number = request.GET.get('page')